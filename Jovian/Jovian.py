@@ -32,12 +32,14 @@ import sys
 
 import snakemake
 import yaml
+from snakemake.resources import DefaultResources
 
 from Jovian import __home_env_configuration__, __package_name__, __version__
 from Jovian.functions import MyHelpFormatter, color
 from Jovian.runconfigs import WriteConfigs
 from Jovian.samplesheet import WriteSampleSheet
 from Jovian.update import update
+from Jovian.workflow.directories import datadir, scf_classified
 from Jovian.workflow.scripts.installer import main as installer_main
 
 yaml.warnings({"YAMLLoadWarning": False})
@@ -242,6 +244,210 @@ def get_args(givenargs):
         help="Minimum contig length to be analysed and included in the final output (default: 250)",
     )
 
+    optional_args.add_argument(
+        "--cram",
+        action="store_true",
+        help="Store the per-sample scaffold alignments as reference-compressed CRAM instead of BAM files (default: False)",
+    )
+
+    optional_args.add_argument(
+        "--snp-shards",
+        default=1,
+        type=int,
+        metavar="N",
+        help="Split the SNP calling of each sample into N coverage-balanced region shards that run as separate jobs (default: 1, i.e. no sharding)",
+    )
+
+    optional_args.add_argument(
+        "--snp-max-depth",
+        default=0,
+        type=int,
+        metavar="N",
+        help="Cap the per-position depth of the alignment used for SNP calling at N reads with a seeded random selection, the full alignment is kept for everything else (default: 0, i.e. no cap)",
+    )
+
+    optional_args.add_argument(
+        "--igv-max-depth",
+        default=500,
+        type=int,
+        metavar="N",
+        help="Cap the per-position depth of the downsampled alignment shown in the IGV report at N reads, the full alignment can still be loaded on request (default: 500)",
+    )
+
+    optional_args.add_argument(
+        "--blast-batch-size",
+        default=0,
+        type=int,
+        metavar="N",
+        help="Pool the scaffolds of all samples and classify these with BLAST in batches of at most N bases, instead of one BLAST job per sample (default: 0, i.e. one BLAST job per sample)",
+    )
+
+    optional_args.add_argument(
+        "--blast-chunks",
+        default=1,
+        type=int,
+        metavar="N",
+        help="Split the scaffolds of each sample into N length-balanced chunks that are classified with BLAST as separate jobs, ignored when --blast-batch-size is used (default: 1, i.e. no chunking)",
+    )
+
+    optional_args.add_argument(
+        "--blast-db-shards",
+        default=1,
+        type=int,
+        metavar="N",
+        help="Split every BLAST search over N groups of database volumes that are searched as separate jobs, with e-values approximately normalised to the full database size (default: 1, i.e. the whole database in one job)",
+    )
+
+    optional_args.add_argument(
+        "--blast-tier1-db",
+        default=None,
+        type=os.path.abspath,
+        metavar="Path",
+        help="Classify the scaffolds against this (small, targeted) BLAST database first, e.g. the viral RefSeq genomes set up by --install-databases, and only search the unresolved scaffolds against nt (default: no tiered classification)",
+    )
+
+    optional_args.add_argument(
+        "--blast-tier1-min-bitscore",
+        default=200,
+        type=float,
+        metavar="N",
+        help="Minimum bitscore of a tier one hit to resolve a scaffold, see --blast-tier1-db (default: 200)",
+    )
+
+    optional_args.add_argument(
+        "--blast-tier1-min-qcov",
+        default=80,
+        type=float,
+        metavar="PCT",
+        help="Minimum percentage of the scaffold length covered by a tier one hit to resolve a scaffold, see --blast-tier1-db (default: 80)",
+    )
+
+    optional_args.add_argument(
+        "--blast-cluster",
+        action="store_true",
+        help="Cluster near-identical scaffolds of all samples before classification, only the cluster representatives are searched with BLAST and their hits are propagated to the other cluster members (default: False)",
+    )
+
+    optional_args.add_argument(
+        "--blast-cluster-identity",
+        default=99,
+        type=float,
+        metavar="PCT",
+        help="Minimum (estimated) identity of a scaffold to its cluster representative, see --blast-cluster (default: 99)",
+    )
+
+    optional_args.add_argument(
+        "--blast-cluster-coverage",
+        default=95,
+        type=float,
+        metavar="PCT",
+        help="Minimum percentage of the scaffold length covered by its cluster representative, see --blast-cluster (default: 95)",
+    )
+
+    optional_args.add_argument(
+        "--blast-nodes",
+        default="",
+        type=str,
+        metavar="LIST",
+        help="Comma-separated list of grid nodes the BLAST searches against nt are pinned to, so these nodes can reuse the database in their page cache (default: any node)",
+    )
+
+    optional_args.add_argument(
+        "--blast-node-constraint",
+        default="",
+        type=str,
+        metavar="FEATURE",
+        help="Only run the BLAST searches against nt on grid nodes with this feature/resource, e.g. nodes with enough RAM to cache the database (default: any node)",
+    )
+
+    optional_args.add_argument(
+        "--blast-node-mem",
+        default=0,
+        type=float,
+        metavar="GB",
+        help="RAM of the nodes set with --blast-nodes or --blast-node-constraint, the memory request of the BLAST searches is raised so that only as many run on a node as fit next to the database in RAM (default: 0, i.e. not adjusted)",
+    )
+
+    optional_args.add_argument(
+        "--blast-cache",
+        default=None,
+        type=os.path.abspath,
+        metavar="DIR",
+        help="Persistent cache of BLAST results, scaffolds that were classified in a previous run (with the same BLAST database and settings) are not searched again. Concurrent jobs share the cache, so DIR has to be on a filesystem with working POSIX (fcntl) locks, which some NFS mounts lack (default: no cache)",
+    )
+
+    optional_args.add_argument(
+        "--blast-cache-size",
+        default=50,
+        type=float,
+        metavar="GB",
+        help="Maximum size of the BLAST cache, the least recently used results are evicted when it grows larger (default: 50)",
+    )
+
+    optional_args.add_argument(
+        "--lca-min-bitscore",
+        default=100,
+        type=float,
+        metavar="N",
+        help="Minimum bitscore of a BLAST hit to be used in the lowest common ancestor (LCA) analysis (default: 100)",
+    )
+
+    optional_args.add_argument(
+        "--lca-quantile",
+        default=0.97,
+        type=float,
+        metavar="Q",
+        help="Only the BLAST hits of a scaffold with a bitscore of at least this quantile of its bitscores are used in the LCA analysis (default: 0.97)",
+    )
+
+    optional_args.add_argument(
+        "--reannotate",
+        action="store_true",
+        default=False,
+        help="Redo the LCA analysis and everything downstream of it (lineages, aggregate tables, heatmaps, etc.) of an earlier run in --output from its stored BLAST hits, "
+        + "e.g. with another --lca-min-bitscore, --lca-quantile or --new-taxdump-db. Use the same --input as the earlier run, nothing upstream of the LCA analysis is redone (default: False)",
+    )
+
+    optional_args.add_argument(
+        "--blast-delta-db",
+        default=None,
+        type=os.path.abspath,
+        metavar="Path",
+        help="With --reannotate, only search the scaffolds of the earlier run against this BLAST database of the sequences added to nt since the snapshot that run was classified against, "
+        + "e.g. made by --install-databases, and merge these hits into its stored hits (default: no incremental reclassification)",
+    )
+
+    optional_args.add_argument(
+        "--merge-batch-size",
+        default=0,
+        type=int,
+        metavar="N",
+        help="Merge the scaffold metrics, classifications and host information into the per-sample tables for N samples per job, instead of one job per sample (default: 0, i.e. one job per sample)",
+    )
+
+    optional_args.add_argument(
+        "--db-stage-dir",
+        default=None,
+        type=os.path.abspath,
+        metavar="DIR",
+        help="Node-local scratch folder, e.g. on a local SSD, to which the nt, background, mgkit and new_taxdump databases are copied (and checksum-verified) on first use on a node, jobs then read the local copies instead of the shared filesystem. Its parent folder has to exist on every node (default: no staging)",
+    )
+
+    optional_args.add_argument(
+        "--db-stage-size",
+        default=0,
+        type=float,
+        metavar="GB",
+        help="Maximum size of all database copies in --db-stage-dir, the least recently used copies that are not in use are evicted when a database does not fit (default: 0, i.e. only limited by the free space)",
+    )
+
+    optional_args.add_argument(
+        "--db-stage-warm",
+        action="store_true",
+        default=False,
+        help="Read the database copies in --db-stage-dir once after a (re)boot of a node to pre-warm its page cache (default: False)",
+    )
+
     if len(givenargs) < 1:
         print(f"{arg.prog} was called but no arguments were given, please try again \n\tUse '{arg.prog} -h' to see the help document")
         sys.exit(1)
@@ -254,6 +460,9 @@ def get_args(givenargs):
         if not flags.input:
             print(f"{arg.prog} was called but no input directory was given, please try again \n\tUse '{arg.prog} -h' to see the help document")
             sys.exit(1)
+        if flags.blast_delta_db and not flags.reannotate:
+            print(f"{arg.prog} was called with --blast-delta-db but without --reannotate, please try again \n\tUse '{arg.prog} -h' to see the help document")
+            sys.exit(1)
 
     return flags
 
@@ -295,8 +504,15 @@ def database_installer_wrapper() -> None:
         f"Select the timestamp of the NT database you want to use from the list below. \n{timestamp_options}\nEnter timestamp here: "
     ).strip()
 
+    # ask users to (optionally) provide the NT database of the previous snapshot, to set up incremental reclassification of earlier runs
+    previous_nt = input(
+        "Optionally, provide the path of the NT database of a previous snapshot (e.g. /path/to/nt/nt) to set up the incremental reclassification of earlier runs, or leave empty: "
+    ).strip()
+
     try:
         installer_argv = ["--basepath", basepath, "--timestamp", timestamp]
+        if previous_nt:
+            installer_argv += ["--previous-nt", os.path.abspath(previous_nt)]
         # below the databases are installed with interactive input prompts for the basepath and timestamp variables,
         # the installer script sets up __home_env_configuration__ file to point to the newly installed databases
         installer_main(installer_argv)
@@ -322,6 +538,16 @@ def CheckInputFiles(indir):
     return any((i in allowedextensions for i in foundfiles))
 
 
+def CheckStoredHits(samplesheet):
+    """
+    Return the samples in the samplesheet without stored BLAST hits to re-annotate, i.e. without a hit table or the BLAST output it is made from
+    """
+    with open(samplesheet, "r", encoding="utf-8") as sheetfile:
+        samples = yaml.safe_load(sheetfile) or {}
+    classified = os.path.join(datadir, scf_classified)
+    return [sample for sample in samples if not any(os.path.exists(f"{classified}{sample}{ext}") for ext in ["_hits.npz", ".blastn"])]
+
+
 def main():
     """
     Jovian starting point
@@ -365,6 +591,17 @@ Please check the input directory and try again. Exiting...
 
     samplesheet = WriteSampleSheet(inpath)
 
+    if flags.reannotate:
+        missing_hits = CheckStoredHits(samplesheet)
+        if missing_hits:
+            print(
+                f"""
+{color.RED + color.BOLD}No stored BLAST hits were found in "{outpath}" for the sample(s): {", ".join(missing_hits)}{color.END}
+Re-annotation requires the output directory of an earlier (finished) run on the same input directory. Exiting...
+                """
+            )
+            sys.exit(1)
+
     paramfile, _conffile, _paramdict, confdict = WriteConfigs(
         samplesheet,
         flags.threads,
@@ -374,6 +611,32 @@ Please check the input directory and try again. Exiting...
         flags.minphredscore,
         flags.minreadlength,
         flags.mincontiglength,
+        flags.cram,
+        flags.snp_shards,
+        flags.snp_max_depth,
+        flags.igv_max_depth,
+        flags.blast_batch_size,
+        flags.blast_chunks,
+        flags.blast_db_shards,
+        flags.blast_tier1_db,
+        flags.blast_tier1_min_bitscore,
+        flags.blast_tier1_min_qcov,
+        flags.blast_cluster,
+        flags.blast_cluster_identity,
+        flags.blast_cluster_coverage,
+        flags.blast_nodes,
+        flags.blast_node_constraint,
+        flags.blast_node_mem,
+        flags.blast_cache,
+        flags.blast_cache_size,
+        flags.lca_min_bitscore,
+        flags.lca_quantile,
+        flags.reannotate,
+        flags.blast_delta_db,
+        flags.merge_batch_size,
+        flags.db_stage_dir,
+        flags.db_stage_size,
+        flags.db_stage_warm,
         flags.conda,
         flags.background,
         flags.blast_db,
@@ -386,6 +649,19 @@ Please check the input directory and try again. Exiting...
         inpath,
     )
 
+    # ? When re-annotating, force the LCA analysis and thereby everything downstream of it. Only these rules, the hit tables (for runs made before these were stored)
+    # ? and their merges with delta databases (of which that of the --blast-delta-db is new) are considered, so nothing upstream is redone, e.g. because of changed code or parameters or removed intermediate files
+    rerun_args = {}
+    if flags.reannotate:
+        forced_rules = ["lca_classification"]
+        hit_table_rules = ["blast_hit_table", "Scaffold_classification_delta", "blast_hit_table_delta", "hit_table_manifest"]
+        downstream_rules = ["Krona", "merge_all_metrics_into_single_tsv", "concat_files", "quantify_output", "draw_heatmaps", "all"]
+        rerun_args = {
+            "forcerun": forced_rules,
+            "allowed_rules": forced_rules + hit_table_rules + downstream_rules,
+            "rerun_triggers": ["mtime"],
+        }
+
     # Snakemake command and params for "local" execution
     if flags.local is True:
         status = snakemake.snakemake(
@@ -403,6 +679,7 @@ Please check the input directory and try again. Exiting...
             printreason=confdict["printreason"],
             configfiles=[paramfile],
             restart_times=3,
+            **rerun_args,
         )
     # Snakemake command and params for "grid" execution
     if flags.local is False and flags.slurm is False:
@@ -419,11 +696,13 @@ Please check the input directory and try again. Exiting...
             latency_wait=confdict["latency-wait"],
             drmaa=confdict["drmaa"],
             drmaa_log_dir=confdict["drmaa-log-dir"],
+            default_resources=DefaultResources(confdict["default-resources"]),
             dryrun=confdict["dryrun"],
             printshellcmds=confdict["printshellcmds"],
             printreason=confdict["printreason"],
             configfiles=[paramfile],
             restart_times=3,
+            **rerun_args,
         )
 
     # Snakemake command and params for "grid" execution but using SLURM instead of DRMAA
@@ -441,11 +720,13 @@ Please check the input directory and try again. Exiting...
             latency_wait=confdict["latency-wait"],
             cluster=confdict["cluster"],
             cluster_status=confdict["cluster-status"],
+            default_resources=DefaultResources(confdict["default-resources"]),
             dryrun=confdict["dryrun"],
             printshellcmds=confdict["printshellcmds"],
             printreason=confdict["printreason"],
             configfiles=[paramfile],
             restart_times=3,
+            **rerun_args,
         )
 
     # Snakemake command for making the snakemake report only
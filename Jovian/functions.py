@@ -135,10 +135,11 @@ class DefaultConfig:
             "printshellcmds": False,  # ? For debugging only
             "printreason": False,  # ? For debugging only
             "jobname": "Jovian_{name}.{jobid}",
-            "drmaa": ' -q PLACEHOLDER -n {threads} -R "span[hosts=1]" -M {resources.mem_mb}',  # ? PLACEHOLDER will be replaced by queuename supplied in CLI; default = "bio"
+            "drmaa": ' -q PLACEHOLDER -n {threads} -R "span[hosts=1]" -M {resources.mem_mb} {resources.affinity_drmaa}',  # ? PLACEHOLDER will be replaced by queuename supplied in CLI; default = "bio"
             "drmaa-log-dir": "logs/drmaa",
-            "cluster": "sbatch -p PLACEHOLDER --parsable -N1 -n1 -c{threads} --mem={resources.mem_mb} -D . -o logs/SLURM/Jovian_{name}-{jobid}.out -e logs/SLURM/Jovian_{name}-{jobid}.err",  # ? PLACEHOLDER will be replaced by queuename supplied in CLI; default = "bio"
+            "cluster": "sbatch -p PLACEHOLDER --parsable -N1 -n1 -c{threads} --mem={resources.mem_mb} -D . -o logs/SLURM/Jovian_{name}-{jobid}.out -e logs/SLURM/Jovian_{name}-{jobid}.err {resources.affinity_slurm}",  # ? PLACEHOLDER will be replaced by queuename supplied in CLI; default = "bio"
             "cluster-status": f"{__package_dir__}/workflow/scripts/slurm-cluster-status.py",
+            "default-resources": ["affinity_drmaa=''", "affinity_slurm=''"],  # ? Node placement of the BLAST searches, see `blast_search_resources()` in the Snakefile; empty for all other rules
         },
     }
     params = {
@@ -150,12 +151,15 @@ class DefaultConfig:
             "MultiQC": 1,
             "align_to_scaffolds_RmDup_FragLength": 4,
             "SNP_calling": 12,
-            "ORF_analysis": 1,
+            "SNP_calling_shard": 4,
+            "ORF_analysis": 4,
             "Contig_metrics": 1,
             "GC_content": 1,
             "Scaffold_classification": 12,
             "mgkit_lca": 1,
             "data_wrangling": 1,
+            "concat_files": 4,
+            "merge_batch": 4,
             "krona": 1,
         },
         "computing_execution": "grid",
@@ -170,6 +174,49 @@ class DefaultConfig:
             "min_contig_len": 250,  # ? this is overwritten by the value supplied in the wrapper CLI
             "kmersizes": "21,33,55,77",
         },
+        "Alignment": {
+            "cram": False,  # ? this is overwritten by the value supplied in the wrapper CLI
+        },
+        "SNP_calling": {
+            "shards": 1,  # ? this is overwritten by the value supplied in the wrapper CLI; 1 means no scatter/gather
+            "max_depth": 0,  # ? this is overwritten by the value supplied in the wrapper CLI; 0 means no depth-capping
+            "seed": 42,
+        },
+        "IGV": {
+            "max_depth": 500,  # ? this is overwritten by the value supplied in the wrapper CLI
+        },
+        "Classification": {
+            "batch_size": 0,  # ? this is overwritten by the value supplied in the wrapper CLI; 0 means one BLAST job per sample
+            "chunks": 1,  # ? this is overwritten by the value supplied in the wrapper CLI; 1 means one BLAST job per sample
+            "db_shards": 1,  # ? this is overwritten by the value supplied in the wrapper CLI; 1 means the whole database is searched in one job
+            "tier1_db": "",  # ? this is overwritten by the value supplied in the wrapper CLI; empty means no tiered classification
+            "tier1_min_bitscore": 200,  # ? this is overwritten by the value supplied in the wrapper CLI
+            "tier1_min_qcov": 80,  # ? this is overwritten by the value supplied in the wrapper CLI
+            "cluster": False,  # ? this is overwritten by the value supplied in the wrapper CLI
+            "cluster_min_identity": 99,  # ? this is overwritten by the value supplied in the wrapper CLI
+            "cluster_min_coverage": 95,  # ? this is overwritten by the value supplied in the wrapper CLI
+            "affinity": {
+                "nodes": "",  # ? this is overwritten by the value supplied in the wrapper CLI; empty means BLAST jobs can run on any node
+                "constraint": "",  # ? this is overwritten by the value supplied in the wrapper CLI
+                "node_mem_gb": 0,  # ? this is overwritten by the value supplied in the wrapper CLI; 0 means the memory request of BLAST jobs is not adjusted
+            },
+            "cache_dir": "",  # ? this is overwritten by the value supplied in the wrapper CLI; empty means no BLAST cache
+            "cache_max_size_gb": 50,  # ? this is overwritten by the value supplied in the wrapper CLI
+            "delta_db": "",  # ? this is overwritten by the value supplied in the wrapper CLI; empty means no incremental reclassification
+        },
+        "LCA": {
+            "min_bitscore": 100,  # ? this is overwritten by the value supplied in the wrapper CLI
+            "quantile": 0.97,  # ? this is overwritten by the value supplied in the wrapper CLI
+            "reannotate": False,  # ? this is overwritten by the value supplied in the wrapper CLI; True means only the LCA and everything downstream of it are redone
+        },
+        "Merge": {
+            "batch_size": 0,  # ? this is overwritten by the value supplied in the wrapper CLI; 0 means one job per sample
+        },
+        "Staging": {
+            "dir": "",  # ? this is overwritten by the value supplied in the wrapper CLI; empty means the databases are used from their original location
+            "max_size_gb": 0,  # ? this is overwritten by the value supplied in the wrapper CLI; 0 means only limited by the free space on the scratch disk
+            "warm": False,  # ? this is overwritten by the value supplied in the wrapper CLI
+        },
         "db": {  # ? These are set either by the defaults listed below or the user-specified path, see WriteConfigs()
             "background": "",
             "blast_nt": "",
@@ -141,6 +141,32 @@ def WriteConfigs(
     minphredscore,
     minreadlength,
     mincontiglength,
+    cram,
+    snp_shards,
+    snp_max_depth,
+    igv_max_depth,
+    blast_batch_size,
+    blast_chunks,
+    blast_db_shards,
+    blast_tier1_db,
+    blast_tier1_min_bitscore,
+    blast_tier1_min_qcov,
+    blast_cluster,
+    blast_cluster_identity,
+    blast_cluster_coverage,
+    blast_nodes,
+    blast_node_constraint,
+    blast_node_mem,
+    blast_cache,
+    blast_cache_size,
+    lca_min_bitscore,
+    lca_quantile,
+    reannotate,
+    blast_delta_db,
+    merge_batch_size,
+    db_stage_dir,
+    db_stage_size,
+    db_stage_warm,
     conda,
     background,
     blast_nt,
@@ -199,6 +225,19 @@ def WriteConfigs(
             f"--bind {os.path.dirname(DefaultConfig.params['db']['virus_host_db'])}:{os.path.dirname(DefaultConfig.params['db']['virus_host_db'])} "
             f"--bind {os.path.dirname(DefaultConfig.params['db']['new_taxdump_db'])}:{os.path.dirname(DefaultConfig.params['db']['new_taxdump_db'])}"
         )
+        if DefaultConfig.params["Classification"]["tier1_db"]:
+            tier1_db_folder = os.path.dirname(DefaultConfig.params["Classification"]["tier1_db"])
+            singularity_mount_points += f" --bind {tier1_db_folder}:{tier1_db_folder}"
+        if DefaultConfig.params["Classification"]["delta_db"]:
+            delta_db_folder = os.path.dirname(DefaultConfig.params["Classification"]["delta_db"])
+            singularity_mount_points += f" --bind {delta_db_folder}:{delta_db_folder}"
+        if DefaultConfig.params["Classification"]["cache_dir"]:
+            os.makedirs(DefaultConfig.params["Classification"]["cache_dir"], exist_ok=True)  # ? Singularity can only bind existing folders
+            singularity_mount_points += f" --bind {DefaultConfig.params['Classification']['cache_dir']}:{DefaultConfig.params['Classification']['cache_dir']}"
+        if DefaultConfig.params["Staging"]["dir"]:
+            # ? The scratch folder itself is made by the jobs, its parent has to exist on every node
+            stage_parent_folder = os.path.dirname(DefaultConfig.params["Staging"]["dir"])
+            singularity_mount_points += f" --bind {stage_parent_folder}:{stage_parent_folder}"
         return singularity_mount_points
 
     # ? Make folder to store config and param files
@@ -210,6 +249,32 @@ def WriteConfigs(
     parameter_dict["QC"]["min_phred_score"] = minphredscore  # ? Based on user supplied value
     parameter_dict["QC"]["min_read_length"] = minreadlength  # ? Based on user supplied value
     parameter_dict["Assembly"]["min_contig_len"] = mincontiglength  # ? Based on user supplied value
+    parameter_dict["Alignment"]["cram"] = cram  # ? Based on user supplied value
+    parameter_dict["SNP_calling"]["shards"] = snp_shards  # ? Based on user supplied value
+    parameter_dict["SNP_calling"]["max_depth"] = snp_max_depth  # ? Based on user supplied value
+    parameter_dict["IGV"]["max_depth"] = igv_max_depth  # ? Based on user supplied value
+    parameter_dict["Classification"]["batch_size"] = blast_batch_size  # ? Based on user supplied value
+    parameter_dict["Classification"]["chunks"] = blast_chunks  # ? Based on user supplied value
+    parameter_dict["Classification"]["db_shards"] = blast_db_shards  # ? Based on user supplied value
+    parameter_dict["Classification"]["tier1_db"] = blast_tier1_db or ""  # ? Based on user supplied value
+    parameter_dict["Classification"]["tier1_min_bitscore"] = blast_tier1_min_bitscore  # ? Based on user supplied value
+    parameter_dict["Classification"]["tier1_min_qcov"] = blast_tier1_min_qcov  # ? Based on user supplied value
+    parameter_dict["Classification"]["cluster"] = blast_cluster  # ? Based on user supplied value
+    parameter_dict["Classification"]["cluster_min_identity"] = blast_cluster_identity  # ? Based on user supplied value
+    parameter_dict["Classification"]["cluster_min_coverage"] = blast_cluster_coverage  # ? Based on user supplied value
+    parameter_dict["Classification"]["affinity"]["nodes"] = blast_nodes  # ? Based on user supplied value
+    parameter_dict["Classification"]["affinity"]["constraint"] = blast_node_constraint  # ? Based on user supplied value
+    parameter_dict["Classification"]["affinity"]["node_mem_gb"] = blast_node_mem  # ? Based on user supplied value
+    parameter_dict["Classification"]["cache_dir"] = blast_cache or ""  # ? Based on user supplied value
+    parameter_dict["Classification"]["cache_max_size_gb"] = blast_cache_size  # ? Based on user supplied value
+    parameter_dict["LCA"]["min_bitscore"] = lca_min_bitscore  # ? Based on user supplied value
+    parameter_dict["LCA"]["quantile"] = lca_quantile  # ? Based on user supplied value
+    parameter_dict["LCA"]["reannotate"] = reannotate  # ? Based on user supplied value
+    parameter_dict["Classification"]["delta_db"] = blast_delta_db or ""  # ? Based on user supplied value
+    parameter_dict["Merge"]["batch_size"] = merge_batch_size  # ? Based on user supplied value
+    parameter_dict["Staging"]["dir"] = db_stage_dir or ""  # ? Based on user supplied value
+    parameter_dict["Staging"]["max_size_gb"] = db_stage_size  # ? Based on user supplied value
+    parameter_dict["Staging"]["warm"] = db_stage_warm  # ? Based on user supplied value
     # ? set proper database paths, if none are given by the user, set default paths based on grid or local compute mode
     cli_db_paths_to_defaultconfig_dict(background, blast_nt, blast_taxdb, mgkit_db, krona_db, virus_host_db, new_taxdump_db)
     parse_and_update_home_dir_env()
@@ -0,0 +1,384 @@
+"""
+Single streaming pass over a coordinate-sorted BAM file that generates all
+per-sample alignment statistics used downstream, replacing the separate
+`count_mapped_reads.sh` (samtools | sort | uniq), BBtools `pileup.sh` and
+Picard `CollectInsertSizeMetrics` invocations.
+Usage:
+  bam_statistics.py -b <bam> -r <ref_fasta> -orf <ORF_NT_fasta> -s <sample_name> \
+      -ps <perScaffold> -po <perORF> -sm <summary> -mr <mapped_read_counts> -is <insert_size_metrics> \
+      [-cov <coverage_bedgraph.gz>]
+Outputs:
+ - per scaffold coverage stats, identical layout to `pileup.sh out=`:
+   #ID, Avg_fold, Length, Ref_GC, Covered_percent, Covered_bases, Plus_reads,
+   Minus_reads, Read_GC, Median_fold, Std_Dev
+ - per ORF coverage stats, same layout as above but keyed on the prodigal ORF ID
+ - a summary of the above, similar to the `pileup.sh` stderr report
+ - the number of PRIMARY mapped reads per scaffold (no secondary and no
+   supplementary alignments), identical to the `count_mapped_reads.sh` output
+ - insert size metrics and histogram in the Picard text format so MultiQC
+   can parse them as before
+ - optionally, the per-base depth as a bgzipped and tabix indexed bedGraph
+   (runs of equal depth, zero depth omitted) for the IGV report
+NB, like `pileup.sh` every non-secondary alignment is counted in the coverage
+metrics, including the ones marked as duplicate. See the `remove_dups` param
+in rule `align_to_scaffolds_RmDup_FragLength` if these should be removed.
+Example:
+  python bam_statistics.py -b data/assembly/filt/[sample]_sorted.bam \
+      -r data/assembly/filt/[sample]_scaffolds_filtered-ge250.fasta \
+      -orf data/assembly/filt/[sample]_ORF_NT.fa -s [sample] \
+      -ps data/assembly/filt/[sample]_perMinLenFiltScaffold.stats \
+      -po data/assembly/filt/[sample]_perORFcoverage.stats \
+      -sm data/assembly/filt/[sample]_MinLenFiltSummary.stats \
+      -mr results/counts/Mapped_read_counts-[sample].tsv \
+      -is data/assembly/filt/[sample]_insert_size_metrics.txt \
+      -cov data/assembly/filt/[sample]_coverage.bedgraph.gz
+"""
+
+import argparse
+import collections
+import datetime
+import os
+
+import numpy as np
+import pysam
+
+#? Same column layout as BBtools' pileup.sh, parsed by name in `merge_data.py` and `blast_lca.py`
+STATS_HEADER = "#ID\tAvg_fold\tLength\tRef_GC\tCovered_percent\tCovered_bases\tPlus_reads\tMinus_reads\tRead_GC\tMedian_fold\tStd_Dev\n"
+STATS_LINE = "{}\t{:.4f}\t{}\t{:.4f}\t{:.4f}\t{}\t{}\t{}\t{:.4f}\t{}\t{:.2f}\n"
+
+#? Same defaults as Picard CollectInsertSizeMetrics
+INSERT_SIZE_DEVIATIONS = 10.0
+INSERT_SIZE_MIN_PCT = 0.05
+
+
+def parse_arguments():
+    """
+    Parse the arguments from the command line
+    """
+    parser = argparse.ArgumentParser(
+        prog="bam statistics",
+        description="Generate coverage, read count and insert size statistics in a single pass over a BAM file",
+        usage="bam_statistics.py -b -r -orf -s -ps -po -sm -mr -is [-cov] [-h / --help]",
+        add_help=False,
+    )
+
+    required = parser.add_argument_group("Required arguments")
+
+    required.add_argument("-b", "--bam", dest="bam", metavar="", required=True, type=str, help="Coordinate sorted and indexed BAM (or CRAM) file")
+    required.add_argument("-r", "--reference", dest="reference", metavar="", required=True, type=str, help="Scaffold fasta the BAM was aligned against")
+    required.add_argument("-orf", "--orf-fasta", dest="orf_fasta", metavar="", required=True, type=str, help="Prodigal ORF nucleotide fasta")
+    required.add_argument("-s", "--sample", dest="sample", metavar="", required=True, type=str, help="Sample name, used in the insert size metrics")
+    required.add_argument("-ps", "--per-scaffold", dest="per_scaffold", metavar="", required=True, type=str, help="Output per scaffold coverage stats")
+    required.add_argument("-po", "--per-orf", dest="per_orf", metavar="", required=True, type=str, help="Output per ORF coverage stats")
+    required.add_argument("-sm", "--summary", dest="summary", metavar="", required=True, type=str, help="Output summary stats")
+    required.add_argument("-mr", "--mapped-reads", dest="mapped_reads", metavar="", required=True, type=str, help="Output primary mapped read counts")
+    required.add_argument("-is", "--insert-size", dest="insert_size", metavar="", required=True, type=str, help="Output insert size metrics")
+
+    optional = parser.add_argument_group("Optional arguments")
+
+    optional.add_argument("-cov", "--coverage", dest="coverage", metavar="", type=str, help="Output per-base depth as bgzipped and tabix indexed bedGraph, should end with .gz")
+    optional.add_argument("-h", "--help", action="help", default=argparse.SUPPRESS, help="Show this help message and exit")
+
+    return parser.parse_args()
+
+
+def gc_fraction(sequence):
+    """
+    Return the number of G/C bases and the number of A/C/G/T bases in a sequence
+    """
+    sequence = sequence.upper()
+    gc = sequence.count("G") + sequence.count("C")
+    return gc, gc + sequence.count("A") + sequence.count("T")
+
+
+def read_reference_gc(fasta):
+    """
+    Return a dict with the reference GC fraction per scaffold
+    """
+    ref_gc = {}
+    with pysam.FastxFile(fasta) as handle:
+        for record in handle:
+            gc, acgt = gc_fraction(record.sequence)
+            ref_gc[record.name] = (gc, acgt)
+    return ref_gc
+
+
+def read_orfs(orf_fasta):
+    """
+    Return a dict of scaffold name --> list of (ORF ID, 0-based start, end, GC, ACGT) based on
+    the prodigal nucleotide fasta headers, i.e. `>{scaffold}_{n} # {start} # {end} # {strand} # ...`
+    """
+    orfs = collections.defaultdict(list)
+    with pysam.FastxFile(orf_fasta) as handle:
+        for record in handle:
+            fields = [field.strip() for field in record.comment.split("#")]
+            start, end = int(fields[1]), int(fields[2])
+            scaffold = record.name.rsplit("_", 1)[0]
+            gc, acgt = gc_fraction(record.sequence)
+            orfs[scaffold].append((record.name, start - 1, end, gc, acgt))
+    return orfs
+
+
+class ScaffoldAccumulator:
+    """
+    Collects the per-read events of a single scaffold; since the BAM is coordinate sorted
+    only one of these is alive at any time so memory is bound by the largest scaffold
+    """
+
+    def __init__(self, length):
+        self.length = length
+        self.starts = []
+        self.ends = []
+        self.strands = []
+        self.read_gc = []
+        self.read_acgt = []
+
+    def add(self, read):
+        gc, acgt = gc_fraction(read.query_sequence or "")
+        self.starts.append(read.reference_start)
+        self.ends.append(read.reference_end)
+        self.strands.append(read.is_reverse)
+        self.read_gc.append(gc)
+        self.read_acgt.append(acgt)
+
+    def finalize(self):
+        """
+        Turn the collected read events into per-base depth and cumulative per-read arrays
+        """
+        length = self.length
+        starts = np.asarray(self.starts, dtype=np.int64)
+        ends = np.asarray(self.ends, dtype=np.int64)
+        reverse = np.asarray(self.strands, dtype=bool)
+
+        diff = np.zeros(length + 1, dtype=np.int64)
+        np.add.at(diff, starts, 1)
+        np.add.at(diff, np.minimum(ends, length), -1)
+        self.depth = np.cumsum(diff[:-1])
+
+        #? Cumulative per-read values indexed by position, used to count the reads overlapping any interval as
+        #? (reads starting before the interval end) - (reads ending before or at the interval start)
+        def cumulative(positions, weights):
+            arr = np.zeros(length + 1, dtype=np.float64)
+            np.add.at(arr, np.minimum(positions, length), weights)
+            return np.cumsum(arr)
+
+        self.cum_plus = (cumulative(starts, ~reverse), cumulative(ends, ~reverse))
+        self.cum_minus = (cumulative(starts, reverse), cumulative(ends, reverse))
+        read_gc = np.asarray(self.read_gc, dtype=np.float64)
+        read_acgt = np.asarray(self.read_acgt, dtype=np.float64)
+        self.cum_gc = (cumulative(starts, read_gc), cumulative(ends, read_gc))
+        self.cum_acgt = (cumulative(starts, read_acgt), cumulative(ends, read_acgt))
+
+    def overlapping(self, cumulative_pair, start, end):
+        cum_starts, cum_ends = cumulative_pair
+        return cum_starts[end - 1] - (cum_ends[start] if start > 0 else 0.0)
+
+    def stats(self, name, start, end, ref_gc, ref_acgt):
+        """
+        Return a formatted stats line for the interval [start, end) of this scaffold
+        """
+        depth = self.depth[start:end]
+        length = end - start
+        covered = int(np.count_nonzero(depth))
+        if self.starts:
+            plus = int(round(self.overlapping(self.cum_plus, start, end)))
+            minus = int(round(self.overlapping(self.cum_minus, start, end)))
+            gc = self.overlapping(self.cum_gc, start, end)
+            acgt = self.overlapping(self.cum_acgt, start, end)
+        else:
+            plus, minus, gc, acgt = 0, 0, 0.0, 0.0
+        return STATS_LINE.format(
+            name,
+            float(depth.mean()) if length else 0.0,
+            length,
+            ref_gc / ref_acgt if ref_acgt else 0.0,
+            100.0 * covered / length if length else 0.0,
+            covered,
+            plus,
+            minus,
+            gc / acgt if acgt else 0.0,
+            int(np.partition(depth, length // 2)[length // 2]) if length else 0,
+            float(depth.std()) if length else 0.0,
+        )
+
+
+def write_coverage(out, name, depth):
+    """
+    Write the runs of equal, non-zero depth of a scaffold as bedGraph records
+    """
+    if not len(depth):
+        return
+    boundaries = np.flatnonzero(np.diff(depth)) + 1
+    starts = np.concatenate(([0], boundaries))
+    ends = np.concatenate((boundaries, [len(depth)]))
+    values = depth[starts]
+    nonzero = values > 0
+    out.writelines(f"{name}\t{start}\t{end}\t{value}\n" for start, end, value in zip(starts[nonzero], ends[nonzero], values[nonzero]))
+
+
+def pair_orientation(read):
+    """
+    Return the pair orientation as defined by htsjdk SamPairUtil.getPairOrientation
+    """
+    if read.is_reverse == read.mate_is_reverse:
+        return "TANDEM"
+    #? pysam positions are 0-based and half-open, htsjdk positions are 1-based and closed
+    positive_five_prime = read.next_reference_start + 1 if read.is_reverse else read.reference_start + 1
+    negative_five_prime = read.reference_end if read.is_reverse else read.reference_start + 1 + read.template_length
+    return "FR" if positive_five_prime < negative_five_prime else "RF"
+
+
+def write_insert_size_metrics(histograms, sample, bam, outfile):
+    """
+    Write insert size metrics and histogram in the Picard CollectInsertSizeMetrics text format
+    """
+    columns = ["MEDIAN_INSERT_SIZE", "MEDIAN_ABSOLUTE_DEVIATION", "MIN_INSERT_SIZE", "MAX_INSERT_SIZE", "MEAN_INSERT_SIZE", "STANDARD_DEVIATION", "READ_PAIRS", "PAIR_ORIENTATION"]
+    columns += [f"WIDTH_OF_{pct}_PERCENT" for pct in (10, 20, 30, 40, 50, 60, 70, 80, 90, 95, 99)]
+    columns += ["SAMPLE", "LIBRARY", "READ_GROUP"]
+
+    total = sum(sum(hist.values()) for hist in histograms.values())
+    kept = [o for o in ("FR", "RF", "TANDEM") if histograms[o] and sum(histograms[o].values()) >= total * INSERT_SIZE_MIN_PCT]
+
+    rows = []
+    for orientation in kept:
+        sizes = np.array(sorted(histograms[orientation]), dtype=np.int64)
+        counts = np.array([histograms[orientation][s] for s in sizes], dtype=np.int64)
+        cum = np.cumsum(counts)
+        median = float(sizes[np.searchsorted(cum, cum[-1] / 2.0)])
+        mad = float(np.median(np.repeat(np.abs(sizes - median), counts)))
+        #? Mean and SD are calculated on the histogram trimmed to median +/- 10 * MAD, like Picard does
+        trim = (sizes <= median + INSERT_SIZE_DEVIATIONS * mad) & (sizes >= median - INSERT_SIZE_DEVIATIONS * mad)
+        t_sizes, t_counts = sizes[trim], counts[trim]
+        mean = float(np.average(t_sizes, weights=t_counts))
+        sd = float(np.sqrt(np.sum(t_counts * (t_sizes - mean) ** 2) / max(t_counts.sum() - 1, 1)))
+        #? Width of the smallest window centered on the median containing X percent of the read pairs, like Picard
+        histogram, widths, covered, low, high = histograms[orientation], [], 0, int(median), int(median)
+        for pct in (10, 20, 30, 40, 50, 60, 70, 80, 90, 95, 99):
+            while covered / cum[-1] < pct / 100.0 and (low >= sizes[0] or high <= sizes[-1]):
+                covered += histogram.get(low, 0) + (histogram.get(high, 0) if high != low else 0)
+                low, high = low - 1, high + 1
+            widths.append(high - low - 1)
+        rows.append(
+            [f"{median:g}", f"{mad:g}", sizes[0], sizes[-1], f"{mean:.6f}", f"{sd:.6f}", cum[-1], orientation] + widths + ["", "", ""]
+        )
+
+    with open(outfile, "w") as out:
+        out.write("## htsjdk.samtools.metrics.StringHeader\n")
+        out.write(f"# bam_statistics.py INPUT={bam} SAMPLE={sample}\n")
+        out.write("## htsjdk.samtools.metrics.StringHeader\n")
+        out.write(f"# Started on: {datetime.datetime.now().strftime('%a %b %d %H:%M:%S %Y')}\n\n")
+        out.write("## METRICS CLASS\tpicard.analysis.InsertSizeMetrics\n")
+        out.write("\t".join(columns) + "\n")
+        for row in rows:
+            out.write("\t".join(str(value) for value in row) + "\n")
+        out.write("\n")
+        if kept:
+            out.write("## HISTOGRAM\tjava.lang.Integer\n")
+            out.write("insert_size\t" + "\t".join(f"All_Reads.{o.lower()}_count" for o in kept) + "\n")
+            all_sizes = sorted(set().union(*(histograms[o].keys() for o in kept)))
+            for size in all_sizes:
+                out.write(f"{size}\t" + "\t".join(str(histograms[o].get(size, 0)) for o in kept) + "\n")
+            out.write("\n")
+
+
+def main():
+    """
+    Main execution of the script
+    """
+    arguments = parse_arguments()
+
+    ref_gc = read_reference_gc(arguments.reference)
+    orfs = read_orfs(arguments.orf_fasta)
+
+    primary_counts = collections.Counter()
+    histograms = {"FR": collections.Counter(), "RF": collections.Counter(), "TANDEM": collections.Counter()}
+    totals = collections.Counter()
+
+    #? The plain bedGraph is compressed and indexed afterwards by `pysam.tabix_index`, which removes the uncompressed file
+    coverage_bedgraph = arguments.coverage[:-3] if arguments.coverage and arguments.coverage.endswith(".gz") else arguments.coverage
+    with pysam.AlignmentFile(arguments.bam, reference_filename=arguments.reference) as bam, open(
+        arguments.per_scaffold, "w"
+    ) as per_scaffold, open(arguments.per_orf, "w") as per_orf, open(coverage_bedgraph or os.devnull, "w") as coverage:
+        per_scaffold.write(STATS_HEADER)
+        per_orf.write(STATS_HEADER)
+
+        references = list(zip(bam.references, bam.lengths))
+        next_ref = 0
+        current = None
+
+        def flush_until(ref_id):
+            """
+            Write the stats of the current scaffold and of all scaffolds without alignments before `ref_id`
+            """
+            nonlocal next_ref, current
+            while next_ref < ref_id:
+                name, length = references[next_ref]
+                accumulator = current if current is not None and current[0] == next_ref else None
+                accumulator = accumulator[1] if accumulator else ScaffoldAccumulator(length)
+                accumulator.finalize()
+                gc, acgt = ref_gc.get(name, (0, 0))
+                per_scaffold.write(accumulator.stats(name, 0, length, gc, acgt))
+                totals["covered_bases"] += int(np.count_nonzero(accumulator.depth))
+                totals["depth_sum"] += int(accumulator.depth.sum())
+                totals["covered_scaffolds"] += int(bool(accumulator.starts))
+                if coverage_bedgraph:
+                    write_coverage(coverage, name, accumulator.depth)
+                for orf_name, start, end, orf_gc, orf_acgt in orfs.get(name, []):
+                    per_orf.write(accumulator.stats(orf_name, start, min(end, length), orf_gc, orf_acgt))
+                next_ref += 1
+            current = None
+
+        for read in bam.fetch(until_eof=True):
+            totals["reads"] += 1
+            if read.is_unmapped or read.is_secondary:
+                continue
+            if current is None or current[0] != read.reference_id:
+                flush_until(read.reference_id)
+                current = (read.reference_id, ScaffoldAccumulator(references[read.reference_id][1]))
+            current[1].add(read)
+            totals["mapped"] += 1
+            totals["mapped_bases"] += read.query_alignment_length
+            if read.is_supplementary:
+                continue
+            primary_counts[read.reference_name] += 1
+            if read.is_proper_pair:
+                totals["proper_pairs"] += 1
+            #? Picard: only one read of a pair (the second), both mates mapped, not a duplicate, non-zero template length
+            if (
+                read.is_paired
+                and read.is_read2
+                and not read.mate_is_unmapped
+                and not read.is_duplicate
+                and read.template_length != 0
+            ):
+                histograms[pair_orientation(read)][abs(read.template_length)] += 1
+        flush_until(len(references))
+
+    if coverage_bedgraph:
+        pysam.tabix_index(coverage_bedgraph, force=True, seq_col=0, start_col=1, end_col=2, zerobased=True)
+
+    #? Identical to the former `samtools view -F 4 -F 256 -F 2048 | cut -f 3 | sort | uniq -c | sed` output
+    with open(arguments.mapped_reads, "w") as out:
+        out.write("mapped_reads\tscaffold_name\n")
+        for scaffold in sorted(primary_counts):
+            out.write(f"{primary_counts[scaffold]:7d} \t{scaffold}\n")
+
+    ref_bases = sum(length for _, length in references)
+    with open(arguments.summary, "w") as out:
+        out.write(f"Reads:                               \t{totals['reads']}\n")
+        out.write(f"Mapped reads:                        \t{totals['mapped']}\n")
+        out.write(f"Mapped bases:                        \t{totals['mapped_bases']}\n")
+        out.write(f"Ref scaffolds:                       \t{len(references)}\n")
+        out.write(f"Ref bases:                           \t{ref_bases}\n")
+        out.write("\n")
+        out.write(f"Percent mapped:                      \t{100.0 * totals['mapped'] / max(totals['reads'], 1):.3f}\n")
+        out.write(f"Percent proper pairs:                \t{100.0 * totals['proper_pairs'] / max(totals['reads'], 1):.3f}\n")
+        out.write(f"Average coverage:                    \t{totals['depth_sum'] / max(ref_bases, 1):.3f}\n")
+        out.write(f"Percent scaffolds with any coverage: \t{100.0 * totals['covered_scaffolds'] / max(len(references), 1):.2f}\n")
+        out.write(f"Percent of reference bases covered:  \t{100.0 * totals['covered_bases'] / max(ref_bases, 1):.2f}\n")
+
+    write_insert_size_metrics(histograms, arguments.sample, arguments.bam, arguments.insert_size)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Summarise the Snakemake benchmark files of the nt BLAST searches, i.e. the
+number of jobs, the wall-clock and CPU time and the data that was read from and
+written to storage (`io_in` and `io_out`, reads that are served from the page
+cache are not counted), to compare runs with and without database-affinity
+scheduling.
+Usage:
+  benchmark_io.py <benchmark_dir> [<baseline_benchmark_dir>]
+All `*.txt` benchmark files in (subfolders of) <benchmark_dir> are summarised.
+With a <baseline_benchmark_dir>, e.g. of an earlier run of the same samples
+without affinity scheduling, the baseline and the relative change are shown as
+well. Writes a tsv to stdout.
+Example:
+  python benchmark_io.py logs/benchmark/Scaffold_classification/ /path/to/earlier/run/logs/benchmark/Scaffold_classification/
+"""
+
+import glob
+import os
+from sys import argv
+
+COLUMNS = ["s", "cpu_time", "io_in", "io_out", "max_rss"]
+
+
+def summarise(benchmark_dir):
+    """
+    Return the number of jobs and the totals (max for max_rss) of `COLUMNS` over all benchmark files in `benchmark_dir`
+    """
+    totals = dict.fromkeys(COLUMNS, 0.0)
+    jobs = 0
+    for path in glob.glob(os.path.join(benchmark_dir, "**", "*.txt"), recursive=True):
+        with open(path) as handle:
+            header = handle.readline().rstrip("\n").split("\t")
+            for line in handle:
+                values = dict(zip(header, line.rstrip("\n").split("\t")))
+                jobs += 1
+                for column in COLUMNS:
+                    value = float(values[column]) if values.get(column, "NA") not in ("NA", "-", "") else 0.0
+                    totals[column] = max(totals[column], value) if column == "max_rss" else totals[column] + value
+    return jobs, totals
+
+
+if __name__ == "__main__":
+    if len(argv) not in (2, 3):
+        raise SystemExit(__doc__)
+    jobs, totals = summarise(argv[1])
+    #? Units as in the benchmark files: seconds and MB
+    rows = [("jobs", jobs)] + [(f"total_{column}" if column != "max_rss" else column, totals[column]) for column in COLUMNS]
+    if len(argv) == 2:
+        print("metric\tvalue")
+        for metric, value in rows:
+            print(f"{metric}\t{value:.2f}" if metric != "jobs" else f"{metric}\t{value}")
+    else:
+        baseline_jobs, baseline_totals = summarise(argv[2])
+        baseline_rows = [baseline_jobs] + [baseline_totals[column] for column in COLUMNS]
+        print("metric\tvalue\tbaseline\tchange_pct")
+        for (metric, value), baseline in zip(rows, baseline_rows):
+            change = f"{100.0 * (value - baseline) / baseline:.1f}" if baseline else "NA"
+            print(f"{metric}\t{value:.2f}\t{baseline:.2f}\t{change}" if metric != "jobs" else f"{metric}\t{value}\t{baseline}\t{change}")
@@ -0,0 +1,199 @@
+"""
+Split/merge helper for batched scaffold classification, i.e. running one BLAST
+search for the scaffolds of many samples so the (nt) database only has to be
+loaded once per batch instead of once per sample, splitting the scaffolds of a
+single large sample over several BLAST jobs, or merging the results of searches
+against separate volume groups of the database.
+Usage:
+  blast_batches.py split <batch_size> <output_dir> <sample_1>=<fasta_1> [<sample_2>=<fasta_2> ...]
+  blast_batches.py demux <manifest> <sample> <output_blastn> [<batch_blastn_1> ...]
+  blast_batches.py chunk <query_fasta> <output_chunk_1> [<output_chunk_2> ...]
+  blast_batches.py merge <query_fasta> <max_target_seqs> <output_blastn> <shard_blastn_1> [<shard_blastn_2> ...]
+split:
+The scaffolds of all samples are concatenated, in the given sample order, and
+cut into batches of at most <batch_size> bases (a single scaffold larger than
+<batch_size> gets a batch of its own). Every scaffold ID is prefixed with a
+per-sample tag (`{sample number}~`) so the BLAST results can be assigned back
+to their sample. Writes `batch-{n}.fasta` files and a `manifest.tsv` with the
+tag, sample name, batch number and the number of scaffolds and bases of every
+sample in every batch to <output_dir>.
+demux:
+Writes the BLAST records of <sample> from the given batch outputs (tabular
+format with the query ID in the first column) to <output_blastn>, with the
+sample tag removed from the query IDs. Only the batch outputs listed for the
+sample in <manifest> are read.
+chunk:
+Splits the scaffolds of a single sample into as many contiguous chunks as
+there are output files, with a roughly equal total length. Since the chunks
+keep the scaffold order, concatenating the BLAST results of the chunks in
+order gives the same output as a single BLAST job. Chunks can be empty when
+there are fewer scaffolds than chunks.
+merge:
+Merges the BLAST results (outfmt 6/7 based, i.e. query ID in the first, e-value
+in the 11th and bitscore in the 12th column) of searches of the same query
+against different volume groups of a database. Per query the subjects are
+ranked on their best e-value and bitscore and only the HSPs of the top
+<max_target_seqs> subjects are kept, as a search against the whole database
+would. The queries are written in the order of <query_fasta>.
+Example:
+  python blast_batches.py split 50000000 data/scaffolds_classified/batches/ sample1=sample1_scaffolds.fasta sample2=sample2_scaffolds.fasta
+  python blast_batches.py demux data/scaffolds_classified/batches/manifest.tsv sample1 sample1.blastn batch-0.blastn batch-1.blastn
+  python blast_batches.py chunk sample1_scaffolds.fasta chunk-0.fasta chunk-1.fasta chunk-2.fasta
+  python blast_batches.py merge sample1_scaffolds.fasta 250 sample1.blastn dbshard-0.blastn dbshard-1.blastn
+"""
+
+import collections
+import os
+from sys import argv
+
+TAG_SEPARATOR = "~"
+
+
+def read_fasta(fasta):
+    """
+    Yield (name, header line without name, sequence lines, length) for every record in a fasta file
+    """
+    record = None
+    with open(fasta) as handle:
+        for line in handle:
+            if line.startswith(">"):
+                if record:
+                    yield record
+                name, _, description = line[1:].rstrip("\n").partition(" ")
+                record = [name, description, [], 0]
+            elif record:
+                record[2].append(line)
+                record[3] += len(line.strip())
+    if record:
+        yield record
+
+
+def read_manifest(manifest):
+    """
+    Return the manifest as a list of dicts
+    """
+    with open(manifest) as handle:
+        header = handle.readline().rstrip("\n").split("\t")
+        return [dict(zip(header, line.rstrip("\n").split("\t"))) for line in handle if line.strip()]
+
+
+def split(batch_size, output_dir, sample_fastas):
+    """
+    Write the scaffolds of all samples to batches of at most `batch_size` bases with sample tagged scaffold IDs
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    manifest = {}
+    batch, batch_bases, out = 0, 0, None
+    for number, sample_fasta in enumerate(sample_fastas):
+        sample, fasta = sample_fasta.split("=", 1)
+        tag = f"{number}{TAG_SEPARATOR}"
+        for name, description, sequence, length in read_fasta(fasta):
+            if out is None or (batch_bases and batch_bases + length > batch_size):
+                if out is not None:
+                    out.close()
+                    batch += 1
+                out = open(os.path.join(output_dir, f"batch-{batch}.fasta"), "w")
+                batch_bases = 0
+            out.write(f">{tag}{name} {description}\n" if description else f">{tag}{name}\n")
+            out.writelines(sequence)
+            batch_bases += length
+            entry = manifest.setdefault((number, batch), [tag, sample, batch, 0, 0])
+            entry[3] += 1
+            entry[4] += length
+    if out is not None:
+        out.close()
+
+    with open(os.path.join(output_dir, "manifest.tsv"), "w") as handle:
+        handle.write("tag\tsample\tbatch\tscaffolds\tbases\n")
+        for key in sorted(manifest):
+            handle.write("\t".join(str(value) for value in manifest[key]) + "\n")
+    n_batches = batch + 1 if out is not None else 0
+    print(f"Split the scaffolds of {len(sample_fastas)} samples into {n_batches} batches of at most {batch_size} bases")
+
+
+def demux(manifest, sample, output_blastn, batch_blastns):
+    """
+    Write the BLAST records of `sample` from the batch outputs, with the sample tag removed from the query IDs
+    """
+    entries = [entry for entry in read_manifest(manifest) if entry["sample"] == sample]
+    tags = {entry["tag"] for entry in entries}
+    batches = {entry["batch"] for entry in entries}
+    records = 0
+    with open(output_blastn, "w") as out:
+        for batch_blastn in batch_blastns:
+            if os.path.basename(batch_blastn).split(".")[0].split("-")[-1] not in batches:
+                continue
+            with open(batch_blastn) as handle:
+                for line in handle:
+                    query = line.split("\t", 1)[0]
+                    tag = query.split(TAG_SEPARATOR, 1)[0] + TAG_SEPARATOR
+                    if tag not in tags:
+                        continue
+                    #? The query ID can occur in several columns depending on the outfmt (e.g. `std` and `qseqid`)
+                    fields = line.rstrip("\n").split("\t")
+                    out.write("\t".join(field[len(tag):] if field == query else field for field in fields) + "\n")
+                    records += 1
+    print(f"Wrote {records} BLAST records of sample {sample} from {len(batches)} batches")
+
+
+def chunk(query_fasta, output_chunks):
+    """
+    Split the scaffolds of `query_fasta` into len(output_chunks) contiguous chunks with a roughly equal total length
+    """
+    records = list(read_fasta(query_fasta))
+    total = sum(record[3] for record in records)
+    n_chunks = len(output_chunks)
+    chunk_bases = [0] * n_chunks
+    number, cumulative = 0, 0
+    out = open(output_chunks[number], "w")
+    for name, description, sequence, length in records:
+        #? Start the next chunk once the current one holds its share of the total length
+        if chunk_bases[number] and number < n_chunks - 1 and cumulative >= total * (number + 1) / n_chunks:
+            out.close()
+            number += 1
+            out = open(output_chunks[number], "w")
+        out.write(f">{name} {description}\n" if description else f">{name}\n")
+        out.writelines(sequence)
+        chunk_bases[number] += length
+        cumulative += length
+    out.close()
+    #? The remaining chunks are written empty so every expected output exists
+    for output_chunk in output_chunks[number + 1 :]:
+        open(output_chunk, "w").close()
+    print(f"Split {len(records)} scaffolds ({total} bases) into {n_chunks} chunks of " + ", ".join(str(bases) for bases in chunk_bases) + " bases")
+
+
+def merge(query_fasta, max_target_seqs, output_blastn, shard_blastns):
+    """
+    Merge the BLAST results of searches against different volume groups, keeping the top `max_target_seqs` subjects per query
+    """
+    records = collections.defaultdict(list)
+    for shard_blastn in shard_blastns:
+        with open(shard_blastn) as handle:
+            for line in handle:
+                fields = line.split("\t")
+                records[fields[0]].append((float(fields[10]), -float(fields[11]), fields[1], line))
+
+    kept = 0
+    with open(output_blastn, "w") as out:
+        for name, _description, _sequence, _length in read_fasta(query_fasta):
+            #? Stable sort, i.e. ties keep the BLAST order within a shard and the shard order
+            hits = sorted(records.get(name, []), key=lambda hit: (hit[0], hit[1]))
+            top_subjects = set(list(dict.fromkeys(hit[2] for hit in hits))[:max_target_seqs])
+            lines = [hit[3] for hit in hits if hit[2] in top_subjects]
+            out.writelines(lines)
+            kept += len(lines)
+    print(f"Merged {sum(len(hits) for hits in records.values())} records of {len(shard_blastns)} database shards into {kept} records")
+
+
+if __name__ == "__main__":
+    if len(argv) > 3 and argv[1] == "split":
+        split(int(argv[2]), argv[3], argv[4:])
+    elif len(argv) > 4 and argv[1] == "demux":
+        demux(argv[2], argv[3], argv[4], argv[5:])
+    elif len(argv) > 3 and argv[1] == "chunk":
+        chunk(argv[2], argv[3:])
+    elif len(argv) > 4 and argv[1] == "merge":
+        merge(argv[2], int(argv[3]), argv[4], argv[5:])
+    else:
+        raise SystemExit(__doc__)
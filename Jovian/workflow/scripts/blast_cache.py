@@ -0,0 +1,185 @@
+"""
+Persistent, content-addressed cache of BLAST results for the scaffold
+classification, so recurring sequences (e.g. phiX, common phages, lab
+contaminants and recurring virus strains) are not searched against nt again in
+every run.
+Results are stored per scaffold in an SQLite database in <cache_dir>, keyed on
+the SHA-256 of the (uppercase) scaffold sequence and a context hash of the BLAST
+database version and the BLAST settings. The database version is derived from
+the names, sizes and modification times of the database files, i.e. updating
+the database or changing any of the settings automatically invalidates all
+cached results. Scaffolds without any BLAST hit are cached as well.
+Usage:
+  blast_cache.py lookup <cache_dir> <blast_db> <settings> <query_fasta> <misses_fasta> <hits_blastn>
+  blast_cache.py store <cache_dir> <blast_db> <settings> <max_size_gb> <query_fasta> <misses_fasta> <misses_blastn> <hits_blastn> <output_blastn>
+lookup:
+Writes the scaffolds of <query_fasta> that are not in the cache to
+<misses_fasta>, and the cached BLAST records of the other scaffolds to
+<hits_blastn>. The hit-rate is reported on stdout. The cache is only read.
+store:
+Adds the BLAST results of the cache misses (<misses_blastn>, tabular format
+with the query ID in the first column) to the cache and writes the records of
+all scaffolds, in the order of <query_fasta>, to <output_blastn>. The cached
+scaffolds (those in <query_fasta> but not in <misses_fasta>) are marked as used
+in the same write. Afterwards the least recently used entries are evicted until
+the cache is smaller than <max_size_gb>.
+Concurrent jobs are serialised by SQLite's file locks, so <cache_dir> has to be
+on a filesystem with working POSIX (fcntl) locks, which some NFS setups lack.
+Example:
+  python blast_cache.py lookup /path/to/blast_cache/ /path/to/nt "6 std|0.05|50|250|1" [sample]_scaffolds.fasta [sample]_cache-misses.fasta [sample]_cache-hits.blastn
+  python blast_cache.py store /path/to/blast_cache/ /path/to/nt "6 std|0.05|50|250|1" 50 [sample]_scaffolds.fasta [sample]_cache-misses.fasta [sample]_cache-misses.blastn [sample]_cache-hits.blastn [sample].blastn
+"""
+
+import collections
+import glob
+import hashlib
+import os
+import sqlite3
+import time
+from sys import argv
+
+CACHE_FILE = "blast_cache.sqlite"
+#? Placeholder for the query ID in the cached records, the query ID can occur in several columns depending on the outfmt
+QUERY_PLACEHOLDER = "<query>"
+#? Evict down to this fraction of the maximum size, so not every run has to evict
+EVICTION_TARGET = 0.9
+
+
+def read_fasta(fasta):
+    """
+    Yield (name, header line, sequence lines, sequence) for every record in a fasta file
+    """
+    record = None
+    with open(fasta) as handle:
+        for line in handle:
+            if line.startswith(">"):
+                if record:
+                    yield record[0], record[1], record[2], "".join(line.strip() for line in record[2])
+                record = [line[1:].split()[0], line, []]
+            elif record:
+                record[2].append(line)
+    if record:
+        yield record[0], record[1], record[2], "".join(line.strip() for line in record[2])
+
+
+def sequence_hash(sequence):
+    return hashlib.sha256(sequence.upper().encode()).hexdigest()
+
+
+def context_hash(blast_db, settings):
+    """
+    Return a hash of the BLAST database version (file names, sizes and modification times) and the BLAST settings
+    """
+    context = hashlib.sha256(settings.encode())
+    for path in sorted(glob.glob(f"{blast_db}.*")):
+        stat = os.stat(path)
+        context.update(f"{os.path.basename(path)}\t{stat.st_size}\t{int(stat.st_mtime)}\n".encode())
+    return context.hexdigest()
+
+
+def connect(cache_dir):
+    """
+    Open (or create) the cache database
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    #? Several jobs can use the cache at the same time, wait for the lock of another job instead of failing
+    connection = sqlite3.connect(os.path.join(cache_dir, CACHE_FILE), timeout=600)
+    connection.execute(
+        "CREATE TABLE IF NOT EXISTS hits (context TEXT, sequence_hash TEXT, records TEXT, size INTEGER, last_used REAL, PRIMARY KEY (context, sequence_hash))"
+    )
+    connection.execute("CREATE INDEX IF NOT EXISTS hits_last_used ON hits (last_used)")
+    return connection
+
+
+def read_blastn(blastn):
+    """
+    Return a dict of query ID --> list of BLAST records
+    """
+    records = collections.defaultdict(list)
+    with open(blastn) as handle:
+        for line in handle:
+            records[line.split("\t", 1)[0]].append(line)
+    return records
+
+
+def to_cache(records, query):
+    return "".join("\t".join(QUERY_PLACEHOLDER if field == query else field for field in line.rstrip("\n").split("\t")) + "\n" for line in records)
+
+
+def from_cache(records, query):
+    return "".join("\t".join(query if field == QUERY_PLACEHOLDER else field for field in line.split("\t")) + "\n" for line in records.splitlines())
+
+
+def lookup(cache_dir, blast_db, settings, query_fasta, misses_fasta, hits_blastn):
+    """
+    Split the scaffolds in cached (written as BLAST records) and not cached (written as fasta) ones
+    """
+    context = context_hash(blast_db, settings)
+    connection = connect(cache_dir)
+    hits, misses = 0, 0
+    #? Only reads, the cache hits are marked as used by `store`, so a job takes the write lock once
+    with open(misses_fasta, "w") as out_misses, open(hits_blastn, "w") as out_hits:
+        for name, header, sequence_lines, sequence in read_fasta(query_fasta):
+            cached = connection.execute("SELECT records FROM hits WHERE context = ? AND sequence_hash = ?", (context, sequence_hash(sequence))).fetchone()
+            if cached is None:
+                out_misses.write(header)
+                out_misses.writelines(sequence_lines)
+                misses += 1
+                continue
+            out_hits.write(from_cache(cached[0], name))
+            hits += 1
+    connection.close()
+    total = hits + misses
+    print(f"BLAST cache lookup: {hits} hits and {misses} misses out of {total} scaffolds (hit-rate {100.0 * hits / total if total else 0.0:.1f}%)")
+
+
+def store(cache_dir, blast_db, settings, max_size_gb, query_fasta, misses_fasta, misses_blastn, hits_blastn, output_blastn):
+    """
+    Cache the BLAST results of the cache misses, mark the cache hits as used, and merge both in the original scaffold order
+    """
+    context = context_hash(blast_db, settings)
+    new_records = read_blastn(misses_blastn)
+    cached_records = read_blastn(hits_blastn)
+    missed = {name: sequence_hash(sequence) for name, _header, _sequence_lines, sequence in read_fasta(misses_fasta)}
+
+    used = []
+    with open(output_blastn, "w") as out:
+        for name, _header, _sequence_lines, sequence in read_fasta(query_fasta):
+            out.writelines(cached_records.get(name) or new_records.get(name, []))
+            if name not in missed:
+                used.append(sequence_hash(sequence))
+
+    #? A single (short) write transaction per job for the new entries and the last_used times of the cache hits
+    connection = connect(cache_dir)
+    now = time.time()
+    with connection:
+        for name, key in missed.items():
+            records = to_cache(new_records.get(name, []), name)
+            connection.execute("INSERT OR REPLACE INTO hits VALUES (?, ?, ?, ?, ?)", (context, key, records, len(records) + 128, now))
+        connection.executemany("UPDATE hits SET last_used = ? WHERE context = ? AND sequence_hash = ?", [(now, context, key) for key in used])
+    stored = len(missed)
+
+    max_size = max_size_gb * 1024**3
+    with connection:
+        size, entries = connection.execute("SELECT COALESCE(SUM(size), 0), COUNT(*) FROM hits").fetchone()
+        evicted = 0
+        if size > max_size:
+            for key_context, key, entry_size in connection.execute("SELECT context, sequence_hash, size FROM hits ORDER BY last_used").fetchall():
+                if size <= max_size * EVICTION_TARGET:
+                    break
+                connection.execute("DELETE FROM hits WHERE context = ? AND sequence_hash = ?", (key_context, key))
+                size -= entry_size
+                evicted += 1
+    if evicted:
+        connection.execute("VACUUM")
+    connection.close()
+    print(f"BLAST cache store: added {stored} scaffolds, evicted {evicted} least recently used entries, {entries - evicted} entries ({size / 1024**2:.1f} MB) in cache")
+
+
+if __name__ == "__main__":
+    if len(argv) == 8 and argv[1] == "lookup":
+        lookup(*argv[2:])
+    elif len(argv) == 11 and argv[1] == "store":
+        store(argv[2], argv[3], argv[4], float(argv[5]), *argv[6:])
+    else:
+        raise SystemExit(__doc__)
@@ -0,0 +1,294 @@
+"""
+Cohort-wide clustering of scaffolds for the scaffold classification, so
+near-identical scaffolds that were assembled in several samples (e.g. the
+outbreak strain, phiX or a lab contaminant) are only searched with BLAST once.
+Usage:
+  blast_clusters.py cluster <min_identity> <min_coverage> <output_dir> <sample_1>=<fasta_1> [<sample_2>=<fasta_2> ...]
+  blast_clusters.py expand <clusters> <sample> <qcov_hsp_perc> <query_fasta> <output_blastn> <sample_1>=<representatives_blastn_1> [...]
+cluster:
+The scaffolds of all samples are processed from long to short. Every scaffold
+is sketched by its (w,k)-minimizers and joins the cluster of an earlier, i.e.
+longer, representative when the sketches show it is contained in that
+representative: the minimizers it shares with the representative on a
+consistent diagonal (either strand) span at least <min_coverage> percent of its
+length and make up at least (<min_identity> / 100) ^ k of its minimizers, the
+expected fraction of conserved k-mers at that identity. Otherwise the scaffold
+becomes a new representative. Writes the representatives of every sample to
+`{sample}_representatives.fasta`, the cluster of every scaffold with its strand
+and offset relative to the representative to `clusters.tsv`, and the reduction
+per sample to `cluster_summary.tsv` in <output_dir>.
+expand:
+Writes the BLAST records (outfmt 6/7 based, i.e. query ID in the first and
+query start and end in the 7th and 8th column) of every scaffold of <sample>,
+in the order of <query_fasta>, to <output_blastn>. Scaffolds that are not a
+representative get the records of their representative, with the query ID
+replaced and the query coordinates translated to the scaffold; for a scaffold
+on the opposite strand the subject start and end (9th and 10th column) are
+swapped as well. Where the alignment extends beyond the scaffold it is clipped:
+the query and subject coordinates by the same number of bases (ignoring gaps)
+and the alignment length (4th column) in proportion. All other columns, e.g.
+identity and bitscore, are those of the representative. Like BLAST's
+`-qcov_hsp_perc`, only the records that cover at least <qcov_hsp_perc> percent
+of the scaffold (the part of the alignment that overlaps the scaffold) are
+kept.
+Example:
+  python blast_clusters.py cluster 99 95 data/scaffolds_classified/clusters/ sample1=sample1_scaffolds.fasta sample2=sample2_scaffolds.fasta
+  python blast_clusters.py expand data/scaffolds_classified/clusters/clusters.tsv sample1 50 sample1_scaffolds.fasta sample1.blastn sample1=sample1_representatives.blastn sample2=sample2_representatives.blastn
+"""
+
+import collections
+import os
+from sys import argv
+
+import numpy as np
+
+K = 21
+W = 20
+#? Minimizers that occur in more representatives than this are repeats, these are not used to find candidate representatives
+MAX_OCCURRENCES = 100
+#? Number of representatives, with the most shared minimizers, that are checked for every scaffold
+CANDIDATES = 3
+#? Maximum difference in diagonal between consistent minimizers, i.e. allows for small indels
+DIAGONAL_TOLERANCE = 10
+
+BASE_CODES = np.full(256, 4, dtype=np.uint8)
+for code, base in enumerate(b"ACGT"):
+    BASE_CODES[base] = code
+    BASE_CODES[ord(chr(base).lower())] = code
+HASH_MULTIPLIER = np.uint64(0x9E3779B97F4A7C15)
+NO_HASH = np.iinfo(np.uint64).max
+
+Sketch = collections.namedtuple("Sketch", ["hashes", "positions", "minus"])
+
+
+def read_fasta(fasta):
+    """
+    Yield (name, header line, sequence lines, sequence) for every record in a fasta file
+    """
+    record = None
+    with open(fasta) as handle:
+        for line in handle:
+            if line.startswith(">"):
+                if record:
+                    yield record[0], record[1], record[2], "".join(line.strip() for line in record[2])
+                record = [line[1:].split()[0], line, []]
+            elif record:
+                record[2].append(line)
+    if record:
+        yield record[0], record[1], record[2], "".join(line.strip() for line in record[2])
+
+
+def sketch(sequence):
+    """
+    Return the canonical (w,k)-minimizers of a sequence, one per distinct hash (the first occurrence), sorted on hash
+    """
+    bases = BASE_CODES[np.frombuffer(sequence.encode(), dtype=np.uint8)]
+    n_kmers = len(bases) - K + 1
+    if n_kmers < 1:
+        return Sketch(np.empty(0, dtype=np.uint64), np.empty(0, dtype=np.int64), np.empty(0, dtype=bool))
+    forward = np.zeros(n_kmers, dtype=np.uint64)
+    reverse = np.zeros(n_kmers, dtype=np.uint64)
+    for offset in range(K):
+        window = (bases[offset : offset + n_kmers] & 3).astype(np.uint64)
+        forward = (forward << np.uint64(2)) | window
+        reverse |= (np.uint64(3) - window) << np.uint64(2 * offset)
+    ambiguous = np.convolve(bases == 4, np.ones(K, dtype=int), "valid") > 0
+    minus = reverse < forward
+    hashes = np.where(minus, reverse, forward) * HASH_MULTIPLIER
+    hashes[ambiguous] = NO_HASH
+
+    if n_kmers > W:
+        windows = np.lib.stride_tricks.as_strided(hashes, shape=(n_kmers - W + 1, W), strides=(hashes.strides[0], hashes.strides[0]))
+        positions = np.unique(np.arange(n_kmers - W + 1) + windows.argmin(axis=1))
+    else:
+        positions = np.array([hashes.argmin()])
+    positions = positions[~ambiguous[positions]]
+    unique_hashes, first = np.unique(hashes[positions], return_index=True)
+    positions = positions[first]
+    return Sketch(unique_hashes, positions, minus[positions])
+
+
+def place(member, length, representative, min_shared, min_coverage):
+    """
+    Return the (strand, offset) of `member` in `representative` if it is contained in it, based on the sketches, else None
+    """
+    _common, member_index, representative_index = np.intersect1d(member.hashes, representative.hashes, assume_unique=True, return_indices=True)
+    member_positions = member.positions[member_index]
+    representative_positions = representative.positions[representative_index]
+    same_strand = member.minus[member_index] == representative.minus[representative_index]
+    best = None
+    for strand, selection, diagonals in (
+        ("+", same_strand, member_positions - representative_positions),
+        ("-", ~same_strand, member_positions + representative_positions),
+    ):
+        if not selection.any():
+            continue
+        diagonal = int(np.median(diagonals[selection]))
+        consistent = selection & (np.abs(diagonals - diagonal) <= DIAGONAL_TOLERANCE)
+        if best is None or consistent.sum() > best[2].sum():
+            best = (strand, diagonal, consistent)
+    if best is None:
+        return None
+    strand, diagonal, consistent = best
+    positions = member_positions[consistent]
+    #? The first and last minimizer can be up to a window from the scaffold ends, so that is not counted as uncovered
+    covered = min(positions.max() - positions.min() + K + 2 * (W - 1), length)
+    if consistent.sum() < min_shared or 100.0 * covered / length < min_coverage:
+        return None
+    #? Member coordinate = representative coordinate + offset on the same strand, or offset - representative coordinate on the opposite strand (0-based)
+    return (strand, diagonal) if strand == "+" else (strand, diagonal + K - 1)
+
+
+def reduction_ratio(bases, representative_bases):
+    if not representative_bases:
+        return "inf" if bases else "1.00"
+    return f"{bases / representative_bases:.2f}"
+
+
+def cluster(min_identity, min_coverage, output_dir, sample_fastas):
+    """
+    Cluster the scaffolds of all samples and write the representatives, the cluster table and the summary
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    samples, scaffolds, sketches = [], [], []
+    for sample_fasta in sample_fastas:
+        sample, fasta = sample_fasta.split("=", 1)
+        samples.append((sample, fasta))
+        for name, _header, _sequence_lines, sequence in read_fasta(fasta):
+            scaffolds.append((len(samples) - 1, name, len(sequence)))
+            sketches.append(sketch(sequence))
+
+    index = collections.defaultdict(list)
+    assignments = {}
+    expected_shared = (min_identity / 100.0) ** K
+    for scaffold in sorted(range(len(scaffolds)), key=lambda scaffold: -scaffolds[scaffold][2]):
+        member = sketches[scaffold]
+        candidates = []
+        for minimizer in member.hashes.tolist():
+            representatives = index.get(minimizer)
+            if representatives and len(representatives) <= MAX_OCCURRENCES:
+                candidates.extend(representatives)
+        counts = collections.Counter(candidates)
+        min_shared = max(1, expected_shared * len(member.hashes))
+        for representative, shared in counts.most_common(CANDIDATES):
+            placement = place(member, scaffolds[scaffold][2], sketches[representative], min_shared, min_coverage) if shared >= min_shared else None
+            if placement:
+                assignments[scaffold] = (representative, *placement)
+                break
+        if scaffold not in assignments:
+            assignments[scaffold] = (scaffold, "+", 0)
+            for minimizer in member.hashes.tolist():
+                index[minimizer].append(scaffold)
+
+    summary = [[0, 0, 0, 0] for _sample in samples]
+    with open(os.path.join(output_dir, "clusters.tsv"), "w") as out:
+        out.write("sample\tscaffold\tlength\trepresentative_sample\trepresentative\tstrand\toffset\n")
+        for scaffold, (sample_index, name, length) in enumerate(scaffolds):
+            representative, strand, offset = assignments[scaffold]
+            representative_sample, representative_name, _length = scaffolds[representative]
+            out.write(f"{samples[sample_index][0]}\t{name}\t{length}\t{samples[representative_sample][0]}\t{representative_name}\t{strand}\t{offset}\n")
+            summary[sample_index][0] += 1
+            summary[sample_index][1] += length
+            if representative == scaffold:
+                summary[sample_index][2] += 1
+                summary[sample_index][3] += length
+
+    representatives = {(scaffolds[scaffold][0], scaffolds[scaffold][1]) for scaffold, assignment in assignments.items() if assignment[0] == scaffold}
+    for sample_index, (sample, fasta) in enumerate(samples):
+        with open(os.path.join(output_dir, f"{sample}_representatives.fasta"), "w") as out:
+            for name, header, sequence_lines, _sequence in read_fasta(fasta):
+                if (sample_index, name) in representatives:
+                    out.write(header)
+                    out.writelines(sequence_lines)
+
+    totals = [sum(column) for column in zip(*summary)] if summary else [0, 0, 0, 0]
+    with open(os.path.join(output_dir, "cluster_summary.tsv"), "w") as out:
+        out.write("sample\tscaffolds\tbases\trepresentatives\trepresentative_bases\tbase_reduction_ratio\n")
+        for (sample, _fasta), counts in zip(samples + [("total", None)], summary + [totals]):
+            out.write("\t".join(str(value) for value in [sample, *counts, reduction_ratio(counts[1], counts[3])]) + "\n")
+    print(
+        f"Clustered {totals[0]} scaffolds ({totals[1]} bases) of {len(samples)} samples into {totals[2]} representatives ({totals[3]} bases), "
+        f"i.e. a base reduction ratio of {reduction_ratio(totals[1], totals[3])}"
+    )
+
+
+def translate(record, representative, name, length, strand, offset, qcov_hsp_perc):
+    """
+    Return a BLAST record of `representative` as a record of the cluster member `name`, or None when the alignment covers
+    less than `qcov_hsp_perc` percent of the member
+    """
+    fields = [name if field == representative else field for field in record.rstrip("\n").split("\t")]
+    query_start, query_end = int(fields[6]), int(fields[7])
+    if strand == "+":
+        query_start, query_end = query_start + offset, query_end + offset
+    else:
+        query_start, query_end = offset + 2 - query_end, offset + 2 - query_start
+        fields[8], fields[9] = fields[9], fields[8]
+    #? The alignment can extend beyond the member, only the part that overlaps it counts
+    clipped_start, clipped_end = max(1 - query_start, 0), max(query_end - length, 0)
+    aligned, query_start, query_end = query_end - query_start + 1, query_start + clipped_start, query_end - clipped_end
+    if query_end < query_start or 100.0 * (query_end - query_start + 1) / length < qcov_hsp_perc:
+        return None
+    #? The subject coordinates are clipped by as many bases, in the direction of the subject strand, and the alignment length in proportion
+    subject_start, subject_end = int(fields[8]), int(fields[9])
+    direction = 1 if subject_end >= subject_start else -1
+    fields[8], fields[9] = str(subject_start + direction * clipped_start), str(subject_end - direction * clipped_end)
+    fields[3] = str(round(int(fields[3]) * (query_end - query_start + 1) / aligned))
+    fields[6], fields[7] = str(query_start), str(query_end)
+    return "\t".join(fields) + "\n"
+
+
+def expand(clusters, sample, qcov_hsp_perc, query_fasta, output_blastn, sample_blastns):
+    """
+    Write the BLAST records of all scaffolds of `sample`, propagated from their representatives
+    """
+    members = {}
+    with open(clusters) as handle:
+        header = handle.readline().rstrip("\n").split("\t")
+        for line in handle:
+            entry = dict(zip(header, line.rstrip("\n").split("\t")))
+            if entry["sample"] == sample:
+                members[entry["scaffold"]] = entry
+    needed = collections.defaultdict(set)
+    for entry in members.values():
+        needed[entry["representative_sample"]].add(entry["representative"])
+
+    records = collections.defaultdict(list)
+    for sample_blastn in sample_blastns:
+        representative_sample, blastn = sample_blastn.split("=", 1)
+        if representative_sample not in needed:
+            continue
+        with open(blastn) as handle:
+            for line in handle:
+                query = line.split("\t", 1)[0]
+                if query in needed[representative_sample]:
+                    records[(representative_sample, query)].append(line)
+
+    propagated, dropped = 0, 0
+    with open(output_blastn, "w") as out:
+        for name, _header, _sequence_lines, _sequence in read_fasta(query_fasta):
+            entry = members[name]
+            representative_records = records.get((entry["representative_sample"], entry["representative"]), [])
+            if entry["representative_sample"] == sample and entry["representative"] == name:
+                out.writelines(representative_records)
+                continue
+            for record in representative_records:
+                translated = translate(record, entry["representative"], name, int(entry["length"]), entry["strand"], int(entry["offset"]), qcov_hsp_perc)
+                if translated is None:
+                    dropped += 1
+                    continue
+                out.write(translated)
+            propagated += 1
+    print(
+        f"Propagated the BLAST records of their representative to {propagated} of the {len(members)} scaffolds of sample {sample}, "
+        f"dropped {dropped} records that cover less than {qcov_hsp_perc}% of the scaffold"
+    )
+
+
+if __name__ == "__main__":
+    if len(argv) > 4 and argv[1] == "cluster":
+        cluster(float(argv[2]), float(argv[3]), argv[4], argv[5:])
+    elif len(argv) > 6 and argv[1] == "expand":
+        expand(argv[2], argv[3], float(argv[4]), argv[5], argv[6], argv[7:])
+    else:
+        raise SystemExit(__doc__)
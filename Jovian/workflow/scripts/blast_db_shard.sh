@@ -0,0 +1,63 @@
+#####################################################################################################################
+### Searches a query fasta against a single volume group of a (multi-volume) BLAST database, e.g. nt.           ###
+###     Usage: bash blast_db_shard.sh {input} {output} {params.nt_db_path} {wildcards.dbshard} {params.db_shards} ###
+###                {threads} {params.outfmt} {params.evalue} {params.qcov_hsp_perc} {params.max_target_seqs}      ###
+###                {params.max_hsps} [{params.stage} {params.stage_args}]                                       ###
+###     The volumes of the database (as listed by `blastdbcmd -info`) are divided over {params.db_shards}        ###
+###     contiguous groups, this searches group {wildcards.dbshard}. `-dbsize` is set to the total length of the  ###
+###     full database so the e-values approximately match those of a search against the whole database (the     ###
+###     length adjustment still depends on the number of sequences in the shard, e-values can differ slightly). ###
+###     With more shards than volumes each volume is a group, the remaining shards and an empty query write an  ###
+###     empty output. Fails when the total length or the volumes of the database cannot be read.                ###
+###     With the (optional) `stage_db.sh` arguments only the volumes of this group are staged on the node.      ###
+#####################################################################################################################
+
+set -euo pipefail
+
+QUERY="$1"
+OUTPUT="$2"
+DB="$3"
+SHARD="$4"
+SHARDS="$5"
+THREADS="$6"
+OUTFMT="$7"
+EVALUE="$8"
+QCOV_HSP_PERC="$9"
+MAX_TARGET_SEQS="${10}"
+MAX_HSPS="${11}"
+STAGE=("${@:12}")
+
+DB_INFO="$(blastdbcmd -db "${DB}" -info)"
+DB_SIZE="$(grep -m 1 "total bases" <<< "${DB_INFO}" | sed -E 's/.*sequences; ([0-9,]+) total bases.*/\1/' | tr -d ',' || true)"
+mapfile -t VOLUMES < <(sed -n '/^Volumes:/,$p' <<< "${DB_INFO}" | tail -n +2 | sed -E 's/^[[:space:]]+//' | grep -v '^$')
+
+#? An empty volume list would silently turn every shard into an empty search, and a wrong size would change the e-values
+if ! [[ "${DB_SIZE}" =~ ^[0-9]+$ ]] || [ "${#VOLUMES[@]}" -eq 0 ]; then
+    echo -e "Could not read the total length and the volumes of ${DB} from \`blastdbcmd -info\`:\n${DB_INFO}" >&2
+    exit 1
+fi
+
+if [ "${SHARD}" -ge "${#VOLUMES[@]}" ] || [ ! -s "${QUERY}" ]; then
+    echo "Shard ${SHARD} of ${SHARDS} has no volumes (${#VOLUMES[@]} in total) or the query is empty, writing an empty output"
+    touch "${OUTPUT}"
+    exit 0
+fi
+
+VOLUME_GROUPS=$(( SHARDS < ${#VOLUMES[@]} ? SHARDS : ${#VOLUMES[@]} ))
+START=$(( ${#VOLUMES[@]} * SHARD / VOLUME_GROUPS ))
+END=$(( ${#VOLUMES[@]} * (SHARD + 1) / VOLUME_GROUPS ))
+SHARD_VOLUMES="${VOLUMES[*]:${START}:$(( END - START ))}"
+
+echo -e "Searching shard ${SHARD} of ${SHARDS}: ${SHARD_VOLUMES}\nTotal database size (-dbsize): ${DB_SIZE}"
+
+if [ "${#STAGE[@]}" -gt 0 ]; then
+    STAGED_VOLUMES=()
+    for VOLUME in ${SHARD_VOLUMES}; do
+        source "${STAGE[@]}" "${VOLUME}" STAGED_VOLUME
+        STAGED_VOLUMES+=("${STAGED_VOLUME}")
+    done
+    SHARD_VOLUMES="${STAGED_VOLUMES[*]}"
+    echo "Searching the volumes: ${SHARD_VOLUMES}"
+fi
+
+blastn -task megablast -outfmt "${OUTFMT}" -query "${QUERY}" -evalue "${EVALUE}" -qcov_hsp_perc "${QCOV_HSP_PERC}" -max_target_seqs "${MAX_TARGET_SEQS}" -max_hsps "${MAX_HSPS}" -db "${SHARD_VOLUMES}" -dbsize "${DB_SIZE}" -num_threads "${THREADS}" -out "${OUTPUT}"
@@ -0,0 +1,449 @@
+"""
+Lowest common ancestor (LCA) analysis of the BLAST hits of a sample in a single
+pass, i.e. a native implementation of the former mgkit chain `blast2gff` -->
+`add-gff-info addtaxa` --> `taxon-utils filter` --> `filter-gff sequence` -->
+`taxon-utils lca` and the `average_logEvalue_no_lca.py` and
+`krona_magnitudes.py` scripts, with the same results.
+Usage:
+  blast_lca.py hits <blastn> <keywords> <hit_table>
+  blast_lca.py lca <hits> <stats> <accession2taxid> <taxonomy> <keywords> <exclude_taxids> <min_bitscore> <quantile> <taxtab> <nolca> <taxMagtab>
+  blast_lca.py compare <taxtab> <nolca> <taxMagtab> <reference_taxtab> <reference_nolca> <reference_taxMagtab>
+  blast_lca.py index <sorted_accession2taxid> <index>
+  blast_lca.py delta <hit_table> <delta_blastn> <delta_db> <evalue> <max_target_seqs> <merged_hit_table>
+hits:
+Stores the hits in <blastn> (outfmt 6 based) that pass the keyword filter (see
+below) in a compact, typed and columnar <hit_table> (`.npz`): the scaffold,
+accession, `staxids` taxon ID (0 for none), e-value and bitscore of every hit,
+in the order of <blastn>. `lca` reads these much faster than <blastn>, so the
+LCA can be redone with other thresholds or another taxonomy without BLAST.
+lca:
+The hits in <hits>, either a <blastn> or a <hit_table>, are filtered, in this
+order, on:
+  - a case-insensitive regex of <keywords> anywhere in the record, e.g.
+    `construct|synthetic` (formerly removed in place from <blastn> by `sed`).
+    A <hit_table> has to be made with the same <keywords>
+  - a bitscore of at least <min_bitscore>
+  - having a taxon ID: the one reported by BLAST (`staxids`) or, for hits
+    without one (or with several), the one of the accession in
+    <accession2taxid>. This is either an <index> made with `index`, or the
+    accession.version and taxon ID columns as text, e.g. mgkit's
+    `nucl_gb.accession2taxid_sliced.tsv` (much slower, it is read entirely)
+  - the taxon ID not being (a descendant of) one of the comma-separated
+    <exclude_taxids>, e.g. `81077,12908`
+  - a bitscore of at least the <quantile> (e.g. .97) of the bitscores of the
+    remaining hits of that scaffold
+The LCA of the remaining hits of every scaffold is determined with the NCBI
+taxonomy (the dump files mgkit's `taxonomy.pickle` is built from) in <taxonomy>,
+see `taxonomy.py`. <taxtab> gets the LCA taxon ID and the log10
+of the mean e-value of every scaffold (-450 on underflow), scaffolds without an
+LCA (hits in unrelated top-level taxa) get taxon ID 1 (root) and a log e-value
+of 1. These are also written to <nolca> with the taxon IDs and phyla of their
+hits. <taxMagtab> adds the scaffolds without hits (taxon ID 0) and the number of
+reads of every scaffold from the per-scaffold <stats>, used as Krona magnitude.
+compare:
+Regression check of the outputs of `lca` against the outputs of the mgkit chain
+(e.g. of an earlier run). The rows of <taxtab> and <taxMagtab> have to be
+identical, the taxon IDs and phyla of <nolca> are compared as sets (mgkit writes
+these in set order). Reports the differences and exits with 1 if there are any.
+index:
+Makes a memory-mapped accession --> taxon ID index (`<index>.accessions.npy`
+and `<index>.taxids.npy`) of <sorted_accession2taxid>, the accession.version
+and taxon ID columns as text sorted on the accession by `LC_ALL=C sort -s -k1,1`.
+Looking up the accessions of a sample is a binary search in this index, that
+only reads the pages it needs.
+delta:
+Incremental reclassification against a newer snapshot of the BLAST database,
+see `nt_delta.sh`. Merges the hits of the same scaffolds against <delta_db>, the
+sequences added since the snapshot of <hit_table>, into <merged_hit_table>. The
+e-values of <hit_table> are scaled to the size of the current snapshot and the
+hits that no longer pass <evalue>, or are of removed sequences, are dropped.
+Per scaffold the subjects are ranked on their best e-value and bitscore and
+only the top <max_target_seqs> are kept, as a search against the whole current
+snapshot would. <merged_hit_table> records the total length of the current
+snapshot (from `<delta_db>.dbsize.tsv`), so the hits of a later delta can be
+merged into it in turn. A <hit_table> that is already against the current
+snapshot is copied unchanged; one against another snapshot than the previous
+snapshot of <delta_db> is refused.
+Example:
+  python blast_lca.py hits [sample].blastn "construct|synthetic" [sample]_hits.npz
+  python blast_lca.py lca [sample]_hits.npz [sample]_perMinLenFiltScaffold.stats mgkit_db/accession2taxid_index new_taxdump/taxonomy/ "construct|synthetic" 81077,12908 100 .97 [sample].taxtab [sample]_nolca_filt.gff [sample].taxMagtab
+  python blast_lca.py lca [sample].blastn [sample]_perMinLenFiltScaffold.stats mgkit_db/nucl_gb.accession2taxid_sliced.tsv new_taxdump/taxonomy/ "construct|synthetic" 81077,12908 100 .97 [sample].taxtab [sample]_nolca_filt.gff [sample].taxMagtab
+  python blast_lca.py lca [sample].blastn [sample]_perMinLenFiltScaffold.stats mgkit_db/accession2taxid_index new_taxdump/taxonomy/ "construct|synthetic" 81077,12908 100 .97 [sample].taxtab [sample]_nolca_filt.gff [sample].taxMagtab
+  python blast_lca.py compare [sample].taxtab [sample]_nolca_filt.gff [sample].taxMagtab /path/to/earlier/run/data/scaffolds_classified/[sample].taxtab /path/to/earlier/run/data/scaffolds_classified/[sample]_nolca_filt.gff /path/to/earlier/run/data/scaffolds_classified/[sample].taxMagtab
+"""
+
+import collections
+import csv
+import itertools
+import os
+import re
+import shutil
+from sys import argv
+
+import numpy as np
+import pandas as pd
+
+from taxonomy import load_taxonomy
+
+#? Ranks used to find the phylum of a taxon, as in mgkit's `Taxonomy.get_ranked_taxon()`
+RANKS = ("superkingdom", "kingdom", "phylum", "class", "subclass", "order", "family", "genus", "species")
+CHUNK_SIZE = 5000000
+#? Column of the `staxids` in the outfmt of the BLAST searches ("6 std qseqid sseqid staxids sscinames stitle")
+STAXIDS_COLUMN = 14
+
+Hit = collections.namedtuple("Hit", ["query", "taxon_id", "evalue", "bitscore"])
+
+
+def is_descendant(taxonomy, taxon_id, ancestors):
+    """
+    Return whether the taxon is (a descendant of) one of the given ancestors
+    """
+    return taxon_id in taxonomy and not ancestors.isdisjoint(taxonomy.lineage(taxon_id))
+
+
+def lowest_common_ancestor(taxonomy, taxon_ids):
+    """
+    Return the LCA of the taxon IDs, or None if they are in different top-level taxa
+    """
+    taxon_ids = sorted(set(taxon_ids))
+    common = taxonomy.lineage(taxon_ids[0])
+    for taxon_id in taxon_ids[1:]:
+        ancestors = set(taxonomy.lineage(taxon_id))
+        common = next((common[index:] for index, ancestor in enumerate(common) if ancestor in ancestors), [])
+        if not common:
+            return None
+    return common[0]
+
+
+def phylum(taxonomy, taxon_id):
+    """
+    Return the taxon ID of the phylum of a taxon, or of its first ancestor with a higher rank or of its top-level taxon
+    """
+    higher = {taxonomy.rank_names.index(rank) for rank in RANKS[: RANKS.index("phylum") + 1] if rank in taxonomy.rank_names}
+    while taxonomy.ranks[taxon_id] not in higher and taxonomy.parents[taxon_id] >= 0:
+        taxon_id = int(taxonomy.parents[taxon_id])
+    return taxon_id
+
+
+def read_blastn(blastn, keywords):
+    """
+    Return the (query, accession, evalue, bitscore, taxon ID) of the hits that pass the keyword filter, the taxon ID is
+    None if BLAST did not report a single taxon ID (`N/A`, `0` or several)
+    """
+    keywords = re.compile(keywords, re.IGNORECASE)
+    hits = []
+    with open(blastn) as handle:
+        for line in handle:
+            if keywords.search(line) or line.startswith("#") or not line.strip():
+                continue
+            fields = line.strip().split("\t")
+            taxon_id = fields[STAXIDS_COLUMN] if len(fields) > STAXIDS_COLUMN else ""
+            taxon_id = int(taxon_id) if taxon_id.isdigit() and int(taxon_id) != 0 else None
+            hits.append((fields[0], fields[1], float(fields[10]), float(fields[11]), taxon_id))
+    return hits
+
+
+def save_hit_table(hits, keywords, hit_table, dbsize=0):
+    """
+    Save the hits in a hit table, with the snapshot size they are against (0 if unknown), returns the number of scaffolds
+    """
+    query_codes, queries = pd.factorize(pd.Series([hit[0] for hit in hits], dtype=object))
+    accession_codes, accessions = pd.factorize(pd.Series([hit[1] for hit in hits], dtype=object))
+    with open(hit_table, "wb") as out:
+        np.savez_compressed(
+            out,
+            keywords=np.array(keywords),
+            queries=np.array(queries, dtype=str),
+            query=query_codes.astype(np.int32),
+            accessions=np.array(accessions, dtype=str),
+            accession=accession_codes.astype(np.int32),
+            evalue=np.array([hit[2] for hit in hits], dtype=np.float64),
+            bitscore=np.array([hit[3] for hit in hits], dtype=np.float64),
+            taxid=np.array([hit[4] or 0 for hit in hits], dtype=np.int64),
+            dbsize=np.array(dbsize, dtype=np.int64),
+        )
+    return len(queries)
+
+
+def write_hit_table(blastn, keywords, hit_table):
+    """
+    Store the hits of a BLAST output in a hit table, without the hits of subjects with the given keywords
+    """
+    hits = read_blastn(blastn, keywords)
+    queries = save_hit_table(hits, keywords, hit_table)
+    print(f"Stored {len(hits)} hits of {queries} scaffolds of {blastn} in {hit_table}")
+
+
+def read_hit_table(hit_table, keywords):
+    """
+    Return the hits of a hit table made by `hits` as `read_blastn()` does
+    """
+    table = np.load(hit_table)
+    if str(table["keywords"]) != keywords:
+        raise SystemExit(f'{hit_table} was made with the keyword filter "{table["keywords"]}" instead of "{keywords}", make it again with `hits`')
+    return list(
+        zip(
+            table["queries"][table["query"]].tolist(),
+            table["accessions"][table["accession"]].tolist(),
+            table["evalue"].tolist(),
+            table["bitscore"].tolist(),
+            [taxon_id or None for taxon_id in table["taxid"].tolist()],
+        )
+    )
+
+
+def merge_delta(hit_table, delta_blastn, delta_db, evalue, max_target_seqs, merged_hit_table):
+    """
+    Merge the hits of a search against a delta database (see `nt_delta.sh`) into the hits of a hit table of a search
+    against the previous database snapshot, as if the current snapshot was searched
+    """
+    table = np.load(hit_table)
+    keywords = str(table["keywords"])
+    #? Total length of the snapshot the hits are against, recorded by earlier merges (0 for hit tables of a search against nt itself)
+    snapshot = int(table["dbsize"]) if "dbsize" in table.files else 0
+    sizes = pd.read_csv(f"{delta_db}.dbsize.tsv", sep="\t")
+    previous_size, current_size = int(sizes["previous"][0]), int(sizes["current"][0])
+    if snapshot == current_size:
+        shutil.copyfile(hit_table, merged_hit_table)
+        print(f"The hits in {hit_table} are already against the current snapshot (total length {current_size}) of {delta_db}, copied these unchanged")
+        return
+    if snapshot and snapshot != previous_size:
+        raise SystemExit(
+            f"The hits in {hit_table} are against a snapshot with a total length of {snapshot}, but {delta_db} holds the sequences added since "
+            f"a snapshot with a total length of {previous_size}, use the delta database of that snapshot (or reclassify with BLAST)"
+        )
+    if not snapshot:
+        print(f"The snapshot of the hits in {hit_table} is not recorded, assuming these are against the previous snapshot of {delta_db}")
+    #? E-values scale with the size of the database (the delta is searched with `-dbsize` of the current snapshot)
+    scale = current_size / previous_size
+    removed = set(read_lines(f"{delta_db}.removed.txt"))
+    stored = read_hit_table(hit_table, keywords)
+    previous = [
+        (query, accession, hit_evalue * scale, bitscore, taxon_id)
+        for query, accession, hit_evalue, bitscore, taxon_id in stored
+        if accession not in removed and hit_evalue * scale <= evalue
+    ]
+    added = read_blastn(delta_blastn, keywords)
+
+    records = collections.defaultdict(list)
+    for hit in previous + added:
+        records[hit[0]].append(hit)
+    hits = []
+    for query_hits in records.values():
+        #? As `blast_batches.py merge`: the subjects are ranked on their best e-value and bitscore, only the top `max_target_seqs` are kept
+        query_hits.sort(key=lambda hit: (hit[2], -hit[3]))
+        top_subjects = set(list(dict.fromkeys(hit[1] for hit in query_hits))[:max_target_seqs])
+        hits += [hit for hit in query_hits if hit[1] in top_subjects]
+    queries = save_hit_table(hits, keywords, merged_hit_table, dbsize=current_size)
+    affected = {hit[0] for hit in added} | {hit[0] for hit in stored if hit[1] in removed}
+    print(
+        f"Merged {len(previous)} previous hits (e-values scaled by {scale}) and {len(added)} hits of {delta_db} into {len(hits)} hits "
+        f"of {queries} scaffolds, the hits of {len(affected)} scaffolds were added or removed"
+    )
+
+
+def read_hits(hits, keywords, min_bitscore):
+    """
+    Return the hits of a BLAST output or hit table that pass the keyword and bitscore filters, see `read_blastn()`
+    """
+    records = read_hit_table(hits, keywords) if hits.endswith(".npz") else read_blastn(hits, keywords)
+    return [record for record in records if record[3] >= min_bitscore]
+
+
+def load_accession_taxa(accession2taxid, accessions):
+    """
+    Return a dict of accession --> taxon ID for the given accessions, taxon ID 0 (no taxon) is skipped
+    """
+    if os.path.exists(f"{accession2taxid}.accessions.npy"):
+        return lookup_accession_taxa(accession2taxid, accessions)
+    taxa = {}
+    for chunk in pd.read_csv(
+        accession2taxid, sep="\t", header=None, usecols=[0, 1], dtype=str, quoting=csv.QUOTE_NONE, keep_default_na=False, chunksize=CHUNK_SIZE
+    ):
+        chunk = chunk[chunk[0].isin(accessions)]
+        for accession, taxon_id in zip(chunk[0], chunk[1]):
+            if accession.lower() != "na" and int(taxon_id) != 0:
+                taxa[accession] = int(taxon_id)
+    return taxa
+
+
+def lookup_accession_taxa(index, accessions):
+    """
+    Return a dict of accession --> taxon ID for the given accessions from a memory-mapped index made by `index`
+    """
+    index_accessions = np.load(f"{index}.accessions.npy", mmap_mode="r")
+    index_taxa = np.load(f"{index}.taxids.npy", mmap_mode="r")
+    #? Longer accessions cannot be in the index, and would be truncated to a (wrong) match
+    keys = np.array(sorted(accession.encode() for accession in accessions if len(accession.encode()) <= index_accessions.dtype.itemsize), dtype=index_accessions.dtype)
+    if not len(keys) or not len(index_accessions):
+        return {}
+    positions = np.minimum(np.searchsorted(index_accessions, keys), len(index_accessions) - 1)
+    found = index_accessions[positions] == keys
+    return dict(zip((key.decode() for key in keys[found]), (int(taxon_id) for taxon_id in index_taxa[positions[found]])))
+
+
+def sorted_accession_taxa(accession2taxid):
+    """
+    Yield chunks of unique accessions and their taxon IDs of a sorted accession --> taxon ID table, the last one of
+    duplicate accessions is used (as in mgkit) and taxon ID 0 (no taxon) is skipped
+    """
+    previous = None
+    for chunk in pd.read_csv(
+        accession2taxid, sep="\t", header=None, usecols=[0, 1], names=["accession", "taxid"], dtype={"accession": str, "taxid": str}, quoting=csv.QUOTE_NONE, keep_default_na=False, chunksize=CHUNK_SIZE
+    ):
+        #? The header line (`accession.version`) is sorted in between the accessions
+        chunk = chunk[~chunk["accession"].str.startswith("accession") & (chunk["accession"].str.lower() != "na")]
+        if previous is not None:
+            chunk = pd.concat([previous, chunk])
+        if (chunk["accession"].values[1:] < chunk["accession"].values[:-1]).any():
+            raise SystemExit(f"{accession2taxid} is not sorted on the accession, sort it with `LC_ALL=C sort -s -k1,1`")
+        previous, chunk = chunk.iloc[-1:], chunk.iloc[:-1]
+        chunk = chunk[chunk["accession"].values != np.append(chunk["accession"].values[1:], previous["accession"].values)]
+        yield chunk[chunk["taxid"].astype(np.int64) != 0]
+    if previous is not None:
+        yield previous[previous["taxid"].astype(np.int64) != 0]
+
+
+def build_index(accession2taxid, index):
+    """
+    Write the memory-mapped accession index of a sorted accession2taxid table
+    """
+    size, width = 0, 1
+    for chunk in sorted_accession_taxa(accession2taxid):
+        size += len(chunk)
+        width = max(width, int(chunk["accession"].str.len().max()) if len(chunk) else 0)
+    accessions = np.lib.format.open_memmap(f"{index}.accessions.npy.tmp", mode="w+", dtype=f"S{width}", shape=(size,))
+    taxa = np.lib.format.open_memmap(f"{index}.taxids.npy.tmp", mode="w+", dtype=np.uint32, shape=(size,))
+    start = 0
+    for chunk in sorted_accession_taxa(accession2taxid):
+        accessions[start : start + len(chunk)] = chunk["accession"].str.encode("ascii").values.astype(f"S{width}")
+        taxa[start : start + len(chunk)] = chunk["taxid"].astype(np.uint32).values
+        start += len(chunk)
+    accessions.flush()
+    taxa.flush()
+    del accessions, taxa
+    os.rename(f"{index}.accessions.npy.tmp", f"{index}.accessions.npy")
+    os.rename(f"{index}.taxids.npy.tmp", f"{index}.taxids.npy")
+    print(f"Indexed {size} accessions (of at most {width} characters) of {accession2taxid} in {index}.accessions.npy and {index}.taxids.npy")
+
+
+def quantile_filter(hits, quantile):
+    """
+    Yield the hits with a bitscore of at least the quantile of the bitscores of their scaffold (per run of hits of the same scaffold)
+    """
+    for _query, group in itertools.groupby(hits, key=lambda hit: hit.query):
+        group = list(group)
+        threshold = np.percentile([hit.bitscore for hit in group], quantile * 100)
+        for hit in group:
+            if hit.bitscore >= threshold:
+                yield hit
+
+
+def format_float(value):
+    """
+    Return the shortest notation of a float that reads back as the same value, e.g. `-120.0` and `1.0`, as in the mgkit outputs
+    """
+    return repr(float(value))
+
+
+def lca(hits, stats, accession2taxid, taxonomy, keywords, exclude_taxids, min_bitscore, quantile, taxtab, nolca, taxmagtab):
+    """
+    Write the LCA of the hits of every scaffold, and the scaffolds without an LCA, see the module docstring
+    """
+    records = read_hits(hits, keywords, min_bitscore)
+    accession_taxa = load_accession_taxa(accession2taxid, {accession for _query, accession, _evalue, _bitscore, taxon_id in records if taxon_id is None})
+    taxonomy = load_taxonomy(taxonomy)
+    exclude = {taxon_id for taxon_id in exclude_taxids if taxon_id in taxonomy}
+
+    hits = (
+        Hit(query, taxon_id or accession_taxa.get(accession), evalue, bitscore) for query, accession, evalue, bitscore, taxon_id in records
+    )
+    hits = (hit for hit in hits if hit.taxon_id is not None and not is_descendant(taxonomy, hit.taxon_id, exclude))
+    hits = list(quantile_filter(hits, quantile))
+
+    evalues = collections.defaultdict(list)
+    for hit in hits:
+        evalues[hit.query].append(hit.evalue)
+
+    lca_rows, nolca_rows = [], []
+    for query, group in itertools.groupby((hit for hit in hits if hit.taxon_id in taxonomy), key=lambda hit: hit.query):
+        taxon_ids = [hit.taxon_id for hit in group]
+        taxon_id = lowest_common_ancestor(taxonomy, taxon_ids)
+        if taxon_id is None:
+            nolca_rows.append((query, taxon_ids))
+            continue
+        mean_evalue = sum(evalues[query]) / len(evalues[query])
+        log_evalue = np.log10(mean_evalue) if mean_evalue > 0 else -450.0  #? Underflow, i.e. a mean e-value of 0
+        lca_rows.append((query, taxon_id, np.round(log_evalue, 1)))
+
+    phyla = {taxon_id: taxonomy.name(phylum(taxonomy, taxon_id)) for _query, taxon_ids in nolca_rows for taxon_id in taxon_ids}
+    with open(nolca, "w") as out:
+        for query, taxon_ids in nolca_rows:
+            phylum_set = {phyla[taxon_id] for taxon_id in taxon_ids}
+            out.write(f"{query}\t{','.join(str(taxon_id) for taxon_id in sorted(set(taxon_ids)))}\t{','.join(sorted(phylum_set))}\n")
+
+    rows = [(query, str(taxon_id), format_float(log_evalue)) for query, taxon_id, log_evalue in lca_rows]
+    rows += [(query, "1", format_float(1)) for query in dict.fromkeys(query for query, _taxon_ids in nolca_rows)]
+    with open(taxtab, "w") as out:
+        out.write("#queryID\ttaxID\tAvg. log e-value\n")
+        out.writelines("\t".join(row) + "\n" for row in rows)
+
+    reads = pd.read_csv(stats, sep="\t", usecols=["#ID", "Plus_reads", "Minus_reads"], dtype={"#ID": str})
+    classified = {row[0] for row in rows}
+    rows += [(query, "0", "1") for query in reads["#ID"] if query not in classified]  #? Scaffolds without (remaining) hits
+    reads = dict(zip(reads["#ID"], reads["Plus_reads"] + reads["Minus_reads"]))
+    #? Like a pandas left join: the read counts become floats as soon as one of the scaffolds is missing in the stats
+    read_format = str if all(row[0] in reads for row in rows) else format_float
+    with open(taxmagtab, "w") as out:
+        out.write("#queryID\ttaxID\tAvg. log e-value\tNr_of_reads\n")
+        out.writelines("\t".join(row + (read_format(reads[row[0]]) if row[0] in reads else "",)) + "\n" for row in rows)
+
+    print(
+        f"{len(records)} hits passed the keyword and bitscore filters, {len(hits)} the taxonomy and quantile filters. "
+        f"{len(lca_rows)} scaffolds with an LCA, {len(nolca_rows)} without an LCA, {len(rows) - len(lca_rows) - len(nolca_rows)} without hits"
+    )
+
+
+def read_lines(path):
+    """
+    Return the lines of a text file without their line ends
+    """
+    with open(path) as handle:
+        return [line.rstrip("\n") for line in handle]
+
+
+def compare(outputs, references):
+    """
+    Report the differences between the outputs and the reference outputs, return the number of differences
+    """
+    differences = 0
+    for output, reference in zip(outputs, references):
+        if output is outputs[1]:
+            #? Taxon IDs and phyla are written in (Python 2) set order by mgkit
+            lines, reference_lines = [
+                [(fields[0],) + tuple(frozenset(field.split(",")) for field in fields[1:]) for fields in (line.split("\t") for line in read_lines(path))]
+                for path in (output, reference)
+            ]
+        else:
+            lines, reference_lines = read_lines(output), read_lines(reference)
+        different = [(index, line, reference_line) for index, (line, reference_line) in enumerate(itertools.zip_longest(lines, reference_lines)) if line != reference_line]
+        differences += len(different)
+        print(f"{output}: {len(lines)} rows, {reference}: {len(reference_lines)} rows, {len(different)} different")
+        for index, line, reference_line in different[:10]:
+            print(f"  row {index + 1}:\n    {line}\n    {reference_line}")
+    return differences
+
+
+if __name__ == "__main__":
+    if len(argv) == 5 and argv[1] == "hits":
+        write_hit_table(*argv[2:5])
+    elif len(argv) == 13 and argv[1] == "lca":
+        lca(*argv[2:6], argv[6], [int(taxon_id) for taxon_id in argv[7].split(",") if taxon_id], float(argv[8]), float(argv[9]), *argv[10:13])
+    elif len(argv) == 8 and argv[1] == "compare":
+        raise SystemExit(1 if compare(argv[2:5], argv[5:8]) else 0)
+    elif len(argv) == 4 and argv[1] == "index":
+        build_index(argv[2], argv[3])
+    elif len(argv) == 8 and argv[1] == "delta":
+        merge_delta(*argv[2:5], float(argv[5]), int(argv[6]), argv[7])
+    else:
+        raise SystemExit(__doc__)
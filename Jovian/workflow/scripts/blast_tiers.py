@@ -0,0 +1,108 @@
+"""
+Split/combine helper for tiered scaffold classification, i.e. searching the
+scaffolds against a small targeted database (e.g. the viral RefSeq genomes)
+first and only searching the unresolved scaffolds against the full nt database.
+Usage:
+  blast_tiers.py split <query_fasta> <tier1_blastn> <min_bitscore> <min_qcov> <resolved_blastn> <unresolved_fasta>
+  blast_tiers.py combine <query_fasta> <output_blastn> <tier_blastn_1> [<tier_blastn_2> ...]
+split:
+A scaffold is resolved in tier one when at least one of its hits in
+<tier1_blastn> (outfmt 6/7 based, i.e. query ID in the first, query start and
+end in the 7th and 8th and bitscore in the 12th column) has a bitscore of at
+least <min_bitscore> and covers at least <min_qcov> percent of the scaffold
+length. All hits of the resolved scaffolds are written to <resolved_blastn>,
+the unresolved scaffolds are written to <unresolved_fasta>. The fraction of the
+query length that was resolved in tier one is reported on stdout.
+combine:
+Writes the BLAST records of every scaffold of <query_fasta>, in that order,
+from the given tier outputs to <output_blastn>. Every scaffold is expected in
+at most one of the tier outputs.
+Example:
+  python blast_tiers.py split [sample]_scaffolds.fasta [sample]_tier1_hits.blastn 200 80 [sample]_tier1_resolved.blastn [sample]_tier1_unresolved.fasta
+  python blast_tiers.py combine [sample]_scaffolds.fasta [sample].blastn [sample]_tier1_resolved.blastn [sample]_tier1_unresolved.blastn
+"""
+
+import collections
+from sys import argv
+
+
+def read_fasta(fasta):
+    """
+    Yield (name, header line, sequence lines, length) for every record in a fasta file
+    """
+    record = None
+    with open(fasta) as handle:
+        for line in handle:
+            if line.startswith(">"):
+                if record:
+                    yield record
+                record = [line[1:].split()[0], line, [], 0]
+            elif record:
+                record[2].append(line)
+                record[3] += len(line.strip())
+    if record:
+        yield record
+
+
+def read_blastn(blastn):
+    """
+    Return a dict of query ID --> list of BLAST records
+    """
+    records = collections.defaultdict(list)
+    with open(blastn) as handle:
+        for line in handle:
+            records[line.split("\t", 1)[0]].append(line)
+    return records
+
+
+def is_confident(record, length, min_bitscore, min_qcov):
+    fields = record.split("\t")
+    query_start, query_end = int(fields[6]), int(fields[7])
+    return float(fields[11]) >= min_bitscore and 100.0 * (abs(query_end - query_start) + 1) / length >= min_qcov
+
+
+def split(query_fasta, tier1_blastn, min_bitscore, min_qcov, resolved_blastn, unresolved_fasta):
+    """
+    Split the scaffolds in resolved (written as BLAST records) and unresolved (written as fasta) ones based on their tier one hits
+    """
+    records = read_blastn(tier1_blastn)
+    scaffolds, resolved, bases, resolved_bases = 0, 0, 0, 0
+    with open(resolved_blastn, "w") as out_resolved, open(unresolved_fasta, "w") as out_unresolved:
+        for name, header, sequence_lines, length in read_fasta(query_fasta):
+            scaffolds += 1
+            bases += length
+            hits = records.get(name, [])
+            if length and any(is_confident(record, length, min_bitscore, min_qcov) for record in hits):
+                out_resolved.writelines(hits)
+                resolved += 1
+                resolved_bases += length
+                continue
+            out_unresolved.write(header)
+            out_unresolved.writelines(sequence_lines)
+    print(
+        f"Tier 1 resolved {resolved} of {scaffolds} scaffolds (bitscore >= {min_bitscore} and query coverage >= {min_qcov}%), "
+        f"{resolved_bases} of {bases} bases, i.e. {100.0 * resolved_bases / bases if bases else 0.0:.1f}% of the query length"
+    )
+
+
+def combine(query_fasta, output_blastn, tier_blastns):
+    """
+    Write the BLAST records of all tiers in the order of `query_fasta`
+    """
+    records = collections.defaultdict(list)
+    for tier_blastn in tier_blastns:
+        for name, lines in read_blastn(tier_blastn).items():
+            records[name].extend(lines)
+    with open(output_blastn, "w") as out:
+        for name, _header, _sequence_lines, _length in read_fasta(query_fasta):
+            out.writelines(records.get(name, []))
+    print(f"Combined {sum(len(lines) for lines in records.values())} BLAST records of {len(tier_blastns)} tiers")
+
+
+if __name__ == "__main__":
+    if len(argv) == 8 and argv[1] == "split":
+        split(argv[2], argv[3], float(argv[4]), float(argv[5]), argv[6], argv[7])
+    elif len(argv) > 3 and argv[1] == "combine":
+        combine(argv[2], argv[3], argv[4:])
+    else:
+        raise SystemExit(__doc__)
@@ -0,0 +1,93 @@
+"""
+Build a depth-normalized BAM file by capping the per-position coverage at a
+maximum depth. Used as input for variant calling only, the full BAM remains
+the source for IGV and the read count/coverage statistics.
+Reads are processed in coordinate order and kept or dropped per pair: the
+first mate of a pair is kept when fewer than <max_depth> already kept reads
+cover its start position, and its mate follows that decision, so pairs are
+never broken up and callers that count overlapping mates once (e.g. LoFreq)
+see the same pairs as in the full BAM. Since every read that covers a position
+also covers the start of the last kept first mate overlapping that position,
+only the mates of kept reads can push a position beyond <max_depth> (by at most
+the number of pairs that overlap it). Reads starting at the same position are
+shuffled with a seeded random generator, so the selection is unbiased towards
+the BAM order but fully reproducible for the same seed. Secondary and
+supplementary alignments follow the decision of their pair when it is still
+pending, otherwise they are capped like first mates. Unmapped reads are passed
+through untouched. The input can be either BAM or
+CRAM (decoded with <reference_fasta>), the output is always BAM.
+Usage:
+  cap_bam_depth.py <input_bam> <reference_fasta> <output_bam> <output_stats> <max_depth> <seed>
+<output_stats> is a tab separated file with the number of kept and dropped
+reads per scaffold and in total.
+Example:
+  python cap_bam_depth.py [sample]_sorted.bam [sample]_scaffolds_filtered-ge250.fasta [sample]_SNP-calling_capped.bam [sample]_SNP-calling_capped.stats 1000 42
+"""
+
+import heapq
+import random
+from sys import argv
+
+import pysam
+
+SCRIPT, INPUT_BAM, REFERENCE_FASTA, OUTPUT_BAM, OUTPUT_STATS, MAX_DEPTH, SEED = argv
+MAX_DEPTH = int(MAX_DEPTH)
+
+rng = random.Random(int(SEED))
+kept, dropped = {}, {}
+#? Decision (kept or not) of the first mate of a pair, by read name, until its mate is seen
+pending = {}
+
+
+def process_group(group, active_ends, outfile):
+    """
+    Write the reads of a group of reads sharing the same start position until the depth cap is reached
+    """
+    rng.shuffle(group)
+    start = group[0].reference_start
+    while active_ends and active_ends[0] <= start:
+        heapq.heappop(active_ends)
+    for read in group:
+        name = read.reference_name
+        if read.query_name in pending:
+            keep = pending[read.query_name] if read.is_secondary or read.is_supplementary else pending.pop(read.query_name)
+        else:
+            keep = len(active_ends) < MAX_DEPTH
+            if read.is_paired and not read.mate_is_unmapped and not read.is_secondary and not read.is_supplementary:
+                pending[read.query_name] = keep
+        if keep:
+            heapq.heappush(active_ends, read.reference_end)
+            outfile.write(read)
+            kept[name] = kept.get(name, 0) + 1
+        else:
+            dropped[name] = dropped.get(name, 0) + 1
+
+
+with pysam.AlignmentFile(INPUT_BAM, "r", reference_filename=REFERENCE_FASTA) as infile, pysam.AlignmentFile(OUTPUT_BAM, "wb", template=infile) as outfile:
+    group, active_ends, current_ref = [], [], None
+    for read in infile.fetch(until_eof=True):
+        if read.is_unmapped:
+            if group:
+                process_group(group, active_ends, outfile)
+                group = []
+            outfile.write(read)
+            continue
+        if group and (read.reference_id != group[0].reference_id or read.reference_start != group[0].reference_start):
+            process_group(group, active_ends, outfile)
+            group = []
+        if read.reference_id != current_ref:
+            active_ends, current_ref = [], read.reference_id
+        group.append(read)
+    if group:
+        process_group(group, active_ends, outfile)
+
+pysam.index(OUTPUT_BAM)
+
+with open(OUTPUT_STATS, "w") as out:
+    out.write("scaffold_name\tkept_reads\tdropped_reads\n")
+    for name in sorted(set(kept) | set(dropped)):
+        out.write(f"{name}\t{kept.get(name, 0)}\t{dropped.get(name, 0)}\n")
+    total_kept, total_dropped = sum(kept.values()), sum(dropped.values())
+    out.write(f"Total\t{total_kept}\t{total_dropped}\n")
+
+print(f"Capped depth at {MAX_DEPTH} (seed {SEED}): kept {total_kept} and dropped {total_dropped} mapped reads")
@@ -0,0 +1,150 @@
+"""
+Columnar tables, stored as a numpy array per column in a folder:
+  - columns.npy: the column names of the table
+  - text_columns.npy: whether the column holds text
+  - column-<n>.npy: the values of column n, for text columns as indices into
+    the strings, -1 for empty fields
+  - strings.npy and string_offsets.npy: all (unique) text, UTF-8 encoded
+Reading a column only reads its own file, and a selection of rows only the
+pages of these rows. A folder of such tables in subfolders (e.g. one per
+sample) is read as a single (partitioned) table.
+The per-sample results of merge_data.py are stored this way in
+`results/tables/{taxClassified,taxUnclassified,virusHost}/[sample_name]/`,
+without the scaffold sequences, which are looked up by scaffold name in the
+faidx-indexed `results/scaffolds/[sample_name]_scaffolds.fasta` instead.
+Usage:
+  columnar.py show <table> [<column> ...]
+  columnar.py sequences <fasta> <name> ...
+Prints (the given columns of) a table as tab-separated text, or the sequences
+of the given names in the fasta as fasta.
+Example:
+  python columnar.py show results/tables/taxClassified/ Sample_name scaffold_name tax_name
+"""
+
+import os
+import shutil
+from sys import argv, stdout
+
+import numpy as np
+import pandas as pd
+
+from taxonomy import decode_string, encode_strings
+
+
+def write_table(table, folder):
+    """
+    Write the table to the given folder, see the module docstring
+    """
+    text_columns = np.array([table[column].dtype == object for column in table.columns], dtype=bool)
+    #? One table of all (unique) text, referred to by the text columns
+    text = [table[column].map(str, na_action="ignore") for column in table.columns[text_columns]]
+    string_codes, strings = pd.factorize(pd.concat(text)) if text else (np.array([], dtype=np.int64), [])
+    arrays = {"columns": np.array(table.columns, dtype=str), "text_columns": text_columns}
+    text_index = 0
+    for index, column in enumerate(table.columns):
+        if text_columns[index]:
+            arrays[f"column-{index}"] = string_codes[text_index * len(table) : (text_index + 1) * len(table)].astype(np.int32)
+            text_index += 1
+        else:
+            arrays[f"column-{index}"] = table[column].values
+    arrays["strings"], arrays["string_offsets"] = encode_strings(strings)
+
+    #? Written next to an existing table and swapped in when complete, so readers never see a partial one
+    folder = os.path.normpath(folder)
+    shutil.rmtree(f"{folder}.tmp", ignore_errors=True)
+    os.makedirs(f"{folder}.tmp")
+    for array, values in arrays.items():
+        np.save(os.path.join(f"{folder}.tmp", f"{array}.npy"), values)
+    shutil.rmtree(folder, ignore_errors=True)
+    os.rename(f"{folder}.tmp", folder)
+
+
+def is_table(folder):
+    """
+    Return whether the given folder holds a (completely written) columnar table
+    """
+    return os.path.exists(os.path.join(folder, "string_offsets.npy"))
+
+
+class ColumnarTable:
+    """
+    Lookups in a memory-mapped columnar table, see the module docstring
+    """
+
+    def __init__(self, folder):
+        self.columns = list(np.load(os.path.join(folder, "columns.npy")))
+        self.text_columns = np.load(os.path.join(folder, "text_columns.npy"))
+        self.values = [np.load(os.path.join(folder, f"column-{position}.npy"), mmap_mode="r") for position in range(len(self.columns))]
+        self.strings = np.load(os.path.join(folder, "strings.npy"), mmap_mode="r")
+        self.string_offsets = np.load(os.path.join(folder, "string_offsets.npy"), mmap_mode="r")
+
+    def __len__(self):
+        """
+        Return the number of rows of the table
+        """
+        return len(self.values[0]) if self.values else 0
+
+    def column(self, column):
+        """
+        Return the memory-mapped values of the given column, for text columns the indices into the strings
+        """
+        return self.values[self.columns.index(column)]
+
+    def read(self, columns=None, rows=None):
+        """
+        Return a DataFrame with (the given columns of) the given rows of the table, all rows by default
+        """
+        table = pd.DataFrame(index=range(len(self) if rows is None else len(rows)))
+        for column in self.columns if columns is None else columns:
+            position = self.columns.index(column)
+            values = self.values[position] if rows is None else self.values[position][rows]
+            if self.text_columns[position]:
+                table[column] = pd.Series([decode_string(self.strings, self.string_offsets, string_id) if string_id >= 0 else np.nan for string_id in values], dtype=object)
+            else:
+                table[column] = np.array(values)
+        return table
+
+
+def read_table(path, columns=None):
+    """
+    Return (the given columns of) a columnar table, of all columnar tables in the subfolders of the given folder (in the
+    order of their names), or of a tab-separated file
+    """
+    if not os.path.isdir(path):
+        table = pd.read_csv(path, sep="\t", header=0, usecols=columns)
+        return table if columns is None else table[columns]
+    if is_table(path):
+        return ColumnarTable(path).read(columns)
+    parts = [ColumnarTable(os.path.join(path, part)).read(columns) for part in sorted(os.listdir(path)) if is_table(os.path.join(path, part))]
+    if not parts:
+        return pd.DataFrame(columns=columns)
+    return pd.concat(parts, ignore_index=True)[parts[0].columns]
+
+
+def read_sequences(fasta, names):
+    """
+    Return a dict of the given names and their sequences, read from the fasta by the offsets in its faidx index
+    """
+    index = pd.read_csv(
+        f"{fasta}.fai", sep="\t", header=None, names=["name", "length", "offset", "line_bases", "line_width"], usecols=range(5), dtype={"name": str}
+    ).set_index("name")
+    sequences = {}
+    with open(fasta, "rb") as handle:
+        for name in names:
+            length, offset, line_bases, line_width = index.loc[name, ["length", "offset", "line_bases", "line_width"]]
+            handle.seek(offset)
+            #? The sequence spans full lines of line_bases bases (and line_width - line_bases line end characters) and a partial last line
+            lines, rest = divmod(length, line_bases)
+            data = handle.read(lines * line_width + rest).decode()
+            sequences[name] = "".join(data.split())
+    return sequences
+
+
+if __name__ == "__main__":
+    if len(argv) >= 3 and argv[1] == "show":
+        read_table(argv[2], argv[3:] or None).to_csv(stdout, sep="\t", index=False)
+    elif len(argv) >= 4 and argv[1] == "sequences":
+        for name, sequence in read_sequences(argv[2], argv[3:]).items():
+            print(f">{name}\n{sequence}")
+    else:
+        raise SystemExit(__doc__)
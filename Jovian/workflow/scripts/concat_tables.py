@@ -0,0 +1,125 @@
+"""
+Concatenate the per-sample tables of merge_data.py and the per-sample
+noLCA files of the LCA analysis into the all_* tables of a run.
+The per-sample tables are written in the sort order of the all_* tables (see
+`sort_table`), so these are merged line by line (a streaming k-way merge)
+instead of sorted again, i.e. only one line per sample is kept in memory. The
+four tables are merged in parallel.
+Usage:
+  concat_tables.py <tables_folder> <noLCA_folder> <output_classified> <output_unclassified> <output_virusHost> <output_noLCA> <processes>
+<tables_folder> is the folder with the [sample_name]_taxClassified.tsv,
+[sample_name]_taxUnclassified.tsv and [sample_name]_virusHost.tsv tables.
+<noLCA_folder> is the folder with the [sample_name]_nolca_filt.gff files.
+Example:
+  python concat_tables.py data/tables/ data/scaffolds_classified/ \
+    results/all_taxClassified.tsv results/all_taxUnclassified.tsv \
+    results/all_virusHost.tsv results/all_noLCA.tsv 4
+"""
+
+import glob
+import heapq
+import os
+from contextlib import ExitStack
+from multiprocessing import Pool
+from sys import argv
+
+#? The all_* tables are sorted by sample and then by these columns, `True` for a numeric, descending order
+SORT_COLUMNS = {
+    "taxClassified": [("Length", True)],
+    "taxUnclassified": [("Length", True)],
+    "virusHost": [("scaffold_name", False)],
+}
+NOLCA_HEADER = ["Sample_name", "Scaffold_name", "Constituent_taxIDs", "Constituent_tax_names"]
+
+
+def sort_table(table, name):
+    """
+    Return the (per-sample) DataFrame of the given table in the sort order of the all_* tables, keeping the order of ties
+    """
+    columns = [column for column, _ in SORT_COLUMNS[name]]
+    ascending = [not descending for _, descending in SORT_COLUMNS[name]]
+    if len(columns) == 1:
+        return table.sort_values(columns[0], ascending=ascending[0], kind="mergesort")
+    return table.sort_values(columns, ascending=ascending)
+
+
+def numeric_descending(value):
+    """
+    Return the sort key of a numeric field in descending order, empty fields sort as 0
+    """
+    return -float(value) if value else 0.0
+
+
+def line_key(header, name):
+    """
+    Return the sort key of the lines of the given table, i.e. the sample name followed by the SORT_COLUMNS
+    """
+    positions = [header.index("Sample_name")] + [header.index(column) for column, _ in SORT_COLUMNS[name]]
+    converters = [str] + [numeric_descending if descending else str for _, descending in SORT_COLUMNS[name]]
+
+    def key(line):
+        fields = line.rstrip("\n").split("\t")
+        return tuple(convert(fields[position]) for position, convert in zip(positions, converters))
+
+    return key
+
+
+def merge_tables(name, tables, output):
+    """
+    Merge the sorted per-sample tables (with identical headers) into the output
+    """
+    with ExitStack() as stack, open(output, "w") as out:
+        handles = [stack.enter_context(open(table)) for table in tables]
+        headers = [handle.readline() for handle in handles]
+        if not handles:
+            return 0
+        out.write(headers[0])
+        lines = 0
+        for line in heapq.merge(*handles, key=line_key(headers[0].rstrip("\n").split("\t"), name)):
+            out.write(line)
+            lines += 1
+    return lines
+
+
+def concat_nolca(files, folder, output):
+    """
+    Concatenate the noLCA files, prefixed with their sample names, in the order of the sample names
+    """
+    samples = {os.path.relpath(path, folder)[: -len("_nolca_filt.gff")]: path for path in files}
+    lines = 0
+    with open(output, "w") as out:
+        out.write("\t".join(NOLCA_HEADER) + "\n")
+        for sample in sorted(samples):
+            with open(samples[sample]) as gff:
+                for line in gff:
+                    out.write(sample + "\t" + line.rstrip("\n") + "\n")
+                    lines += 1
+    return lines
+
+
+def concat(job):
+    """
+    Write one all_* table from its per-sample files, returns a message with the number of lines written
+    """
+    name, files, folder, output = job
+    if name == "noLCA":
+        lines = concat_nolca(files, folder, output)
+    else:
+        lines = merge_tables(name, sorted(files), output)
+    return f"Wrote {lines} lines of {len(files)} {name} files to {output}"
+
+
+if __name__ == "__main__":
+    if len(argv) != 8:
+        raise SystemExit(__doc__)
+    tables_folder, nolca_folder, processes = argv[1], argv[2], int(argv[7])
+    jobs = [
+        (name, glob.glob(os.path.join(tables_folder, f"*_{name}.tsv")), tables_folder, output)
+        for name, output in zip(["taxClassified", "taxUnclassified", "virusHost"], argv[3:6])
+    ] + [("noLCA", glob.glob(os.path.join(nolca_folder, "*_nolca_filt.gff")), nolca_folder, argv[6])]
+    if processes > 1:
+        with Pool(min(processes, len(jobs))) as pool:
+            messages = pool.map(concat, jobs)
+    else:
+        messages = [concat(job) for job in jobs]
+    print("\n".join(messages))
@@ -27,6 +27,8 @@ from bokeh.plotting import figure, output_file, save
 from bokeh.models import HoverTool, ColumnDataSource
 from bokeh.models.widgets import Tabs, Panel
 
+from columnar import read_table
+
 
 # Set global VARIABLES-------------------------------------
 RANKS = ["superkingdom", "phylum", "class", "order", "family", "genus", "species"]
@@ -88,7 +90,7 @@ def parse_arguments():
         metavar="",
         required=True,
         type=str,
-        help="Table with taxonomic classifications.",
+        help="Table with taxonomic classifications, tab-separated or columnar (see columnar.py).",
     )
 
     required.add_argument(
@@ -234,21 +236,16 @@ def read_numbers(infile):
 
 def read_classifications(infile):
     """
-    Input: Tabulers text file (.tsv) with output from PZN analysis: 
+    Input: Tabulers text file (.tsv) or columnar table with output from PZN analysis: 
       classifications for scaffolds and quantitative information of mapped-back reads,
       for _all samples analysed in the same run_
     Output: Pandas Dataframe with the information of the classified scaffolds
     """
     # Initialise the dataframe with taxonomic classifications
     # and numbers of reads mapped to the scaffolds (i.e.
-    # the result/output of the pipeline).
-    classifications_df = pd.read_csv(infile, delimiter="\t")
-
-    # Check column names for debugging:
-    # print(classifications_df.columns)
-
-    # Select only relevant columns:
-    classifications_df = classifications_df[
+    # the result/output of the pipeline), reading only the relevant columns:
+    classifications_df = read_table(
+        infile,
         [
             "Sample_name",
             "scaffold_name",
@@ -267,8 +264,8 @@ def read_classifications(infile):
             "Avg_fold",
             "Length",
             "Nr_ORFs",
-        ]
-    ]
+        ],
+    )
 
     # Calculate the number of read pairs matched to each scaffold
     # by averaging the plus and minus reads.
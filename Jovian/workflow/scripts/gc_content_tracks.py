@@ -0,0 +1,61 @@
+"""
+Calculate the GC-content of a scaffold fasta in fixed size windows and write
+these as bgzipped and tabix indexed bedGraph tracks, one per window size, so
+a genome browser only has to fetch the region that is in view.
+All window sizes are derived from a single cumulative GC count per scaffold,
+i.e. every scaffold is read once regardless of the number of resolutions. The
+values are identical to `bedtools makewindows -w <size>` followed by `bedtools
+nuc` (column `pct_gc`): the number of G/C bases divided by the window length,
+with a shorter last window at the end of every scaffold.
+Usage:
+  gc_content_tracks.py <input_fasta> <window_sizes> <output_bedgraph_1> [<output_bedgraph_2> ...]
+<window_sizes> is a comma separated list with one window size per output file.
+The output files should end with `.gz`; the `.tbi` index is written alongside.
+Example:
+  python gc_content_tracks.py [sample]_scaffolds_filtered-ge250.fasta 50,500 [sample]_GC.bedgraph.gz [sample]_GC-500bp.bedgraph.gz
+"""
+
+from sys import argv
+
+import numpy as np
+import pysam
+
+SCRIPT, INPUT_FASTA, WINDOW_SIZES = argv[:3]
+OUTPUT_BEDGRAPHS = argv[3:]
+WINDOW_SIZES = [int(size) for size in WINDOW_SIZES.split(",")]
+
+if len(WINDOW_SIZES) != len(OUTPUT_BEDGRAPHS) or not all(output.endswith(".gz") for output in OUTPUT_BEDGRAPHS):
+    raise SystemExit(__doc__)
+
+GC_BASES = np.zeros(256, dtype=bool)
+GC_BASES[list(b"GCgc")] = True
+
+
+def gc_windows(cumulative_gc, window_size):
+    """
+    Return the window starts, ends and GC fractions of a scaffold based on its cumulative GC count
+    """
+    length = len(cumulative_gc) - 1
+    starts = np.arange(0, length, window_size)
+    ends = np.minimum(starts + window_size, length)
+    return starts, ends, (cumulative_gc[ends] - cumulative_gc[starts]) / (ends - starts)
+
+
+#? The plain bedGraphs are compressed and indexed afterwards by `pysam.tabix_index`, which removes the uncompressed file
+plain_bedgraphs = [output[:-3] for output in OUTPUT_BEDGRAPHS]
+handles = [open(path, "w") for path in plain_bedgraphs]
+try:
+    with pysam.FastxFile(INPUT_FASTA) as fasta:
+        for record in fasta:
+            bases = np.frombuffer(record.sequence.encode(), dtype=np.uint8)
+            cumulative_gc = np.concatenate(([0], np.cumsum(GC_BASES[bases])))
+            for window_size, out in zip(WINDOW_SIZES, handles):
+                starts, ends, fractions = gc_windows(cumulative_gc, window_size)
+                out.writelines(f"{record.name}\t{start}\t{end}\t{fraction:.6f}\n" for start, end, fraction in zip(starts, ends, fractions))
+finally:
+    for out in handles:
+        out.close()
+
+for path, window_size in zip(plain_bedgraphs, WINDOW_SIZES):
+    pysam.tabix_index(path, force=True, seq_col=0, start_col=1, end_col=2, zerobased=True)
+    print(f"Wrote GC-content track with {window_size} bp windows to {path}.gz")
@@ -1,6 +1,7 @@
 # shellcheck shell=bash
 # This script (part 2) this script writes the various div elements for the samples
 # this script should be called for every sample individually.
+# The IGV browser is only created in the inner div when the tab of the sample is opened, see 7_js_end.html
 
 INPUT="$1"
 OUTPUT_HTML="$2"
@@ -9,6 +10,7 @@ SAMPLE="sample_${INPUT//-/_}"
 
 cat << EOF >> ${OUTPUT_HTML}
 <div id="${SAMPLE}">
-    <div id="${SAMPLE}"></div>
+    <button id="${SAMPLE}_full_alignment" type="button">Load full alignment</button>
+    <div id="${SAMPLE}_igv"></div>
 </div>
 EOF
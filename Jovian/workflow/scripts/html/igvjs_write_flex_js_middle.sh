@@ -1,6 +1,7 @@
 # shellcheck shell=bash
 # This script (part 3) this script writes the flexible part of the required JavaScript
 # this script should be called for every sample.
+# Only the browser options are registered here, the browser itself is created when the tab of the sample is opened.
 
 INPUT="$1"
 OUTPUT_HTML="$2"
@@ -9,14 +10,25 @@ INPUT_REF_GC_BEDGRAPH="$4"
 INPUT_REF_ZIPPED_ORF_GFF="$5"
 INPUT_ZIPPED_SNP_VCF="$6"
 INPUT_SORTED_BAM="$7"
-NGINX_IP="$8"
-NGINX_PORT="$9"
+INPUT_COVERAGE_BEDGRAPH="$8"
+INPUT_DISPLAY_BAM="$9"
+NGINX_IP="${10}"
+NGINX_PORT="${11}"
+INPUT_REF_GC_COARSE_BEDGRAPH="${12}"
+GC_VISIBILITY_WINDOW="${13}"
 
 
 SAMPLE="sample_${INPUT//-/_}"
 
+# The alignment is either a BAM (.bai index) or a reference-compressed CRAM (.crai index) file
+ALIGNMENT_FORMAT="${INPUT_SORTED_BAM##*.}"
+if [ "${ALIGNMENT_FORMAT}" == "cram" ]; then
+    ALIGNMENT_INDEX_EXT="crai"
+else
+    ALIGNMENT_INDEX_EXT="bai"
+fi
+
 cat << EOF >> ${OUTPUT_HTML}
-        ${SAMPLE} = document.getElementById("${SAMPLE}");
         options =
             {
                 reference:
@@ -28,8 +40,20 @@ cat << EOF >> ${OUTPUT_HTML}
                         {
                             type: "wig",
                             name: "GC contents",
-                            format: "bedGraph",
+                            format: "bedgraph",
                             url: "${NGINX_IP}:${NGINX_PORT}/${INPUT_REF_GC_BEDGRAPH}",
+                            indexURL: "${NGINX_IP}:${NGINX_PORT}/${INPUT_REF_GC_BEDGRAPH}.tbi",
+                            visibilityWindow: ${GC_VISIBILITY_WINDOW},
+                            min: "0",
+                            max: "1",
+                            order: Number.MAX_VALUE
+                        },
+                        {
+                            type: "wig",
+                            name: "GC contents (coarse)",
+                            format: "bedgraph",
+                            url: "${NGINX_IP}:${NGINX_PORT}/${INPUT_REF_GC_COARSE_BEDGRAPH}",
+                            indexURL: "${NGINX_IP}:${NGINX_PORT}/${INPUT_REF_GC_COARSE_BEDGRAPH}.tbi",
                             min: "0",
                             max: "1",
                             order: Number.MAX_VALUE
@@ -43,17 +67,27 @@ cat << EOF >> ${OUTPUT_HTML}
                             displayMode: "SQUISHED",
                             order: 2
                         },
+                        {
+                            type: "wig",
+                            name: "Coverage",
+                            format: "bedgraph",
+                            url: "${NGINX_IP}:${NGINX_PORT}/${INPUT_COVERAGE_BEDGRAPH}",
+                            indexURL: "${NGINX_IP}:${NGINX_PORT}/${INPUT_COVERAGE_BEDGRAPH}.tbi",
+                            color: "rgb(150, 150, 150)",
+                            order: 3
+                        },
                         {
                             type: "alignment",
                             format: "bam",
                             colorBy: "strand",
-                            url: "${NGINX_IP}:${NGINX_PORT}/${INPUT_SORTED_BAM}",
-                            indexURL: "${NGINX_IP}:${NGINX_PORT}/${INPUT_SORTED_BAM}.bai",
+                            url: "${NGINX_IP}:${NGINX_PORT}/${INPUT_DISPLAY_BAM}",
+                            indexURL: "${NGINX_IP}:${NGINX_PORT}/${INPUT_DISPLAY_BAM}.bai",
                             indexed: "true",
-                            name: "Alignment",
+                            name: "Alignment (downsampled)",
                             showSoftClips: false,
                             viewAsPairs: true,
-                            order: 3
+                            showCoverage: false,
+                            order: 4
                         },
                         {
                             type: "annotation",
@@ -67,5 +101,18 @@ cat << EOF >> ${OUTPUT_HTML}
                     ]
                 },
             };
-        igv.createBrowser(${SAMPLE}, options);
+        sampleOptions["${SAMPLE}"] = options;
+        // The full alignment is only streamed when explicitly requested
+        fullAlignmentTracks["${SAMPLE}"] = {
+            type: "alignment",
+            format: "${ALIGNMENT_FORMAT}",
+            colorBy: "strand",
+            url: "${NGINX_IP}:${NGINX_PORT}/${INPUT_SORTED_BAM}",
+            indexURL: "${NGINX_IP}:${NGINX_PORT}/${INPUT_SORTED_BAM}.${ALIGNMENT_INDEX_EXT}",
+            indexed: "true",
+            name: "Alignment (full)",
+            showSoftClips: false,
+            viewAsPairs: true,
+            order: 5
+        };
 EOF
@@ -61,6 +61,16 @@ def cli_args(given_args: list[str]) -> argparse.Namespace:
         help="Timestamp required for the NCBI nt and taxdb databases. List available time-stamps with `aws s3 ls --no-sign-request s3://ncbi-blast-databases/`, e.g., `2024-07-20-01-05-03`.",
     )
 
+    parser.add_argument(
+        "-p",
+        "--previous-nt",
+        action="store",
+        type=str,
+        metavar="Path",
+        default=None,
+        help="NT database of a previous snapshot, e.g. `/path/to/nt/nt`. When given, a BLAST database of the sequences added since is made for the incremental reclassification of earlier runs (`--blast-delta-db`).",
+    )
+
     if given_args:
         return parser.parse_args(given_args)
     print("Trying to install databases, but no arguments were given. Exiting...")
@@ -134,7 +144,27 @@ def main(args=sys.argv[1:]):
     ]
     run_commands(commands)
 
-    # 3. Set up mgkit and download taxonomy
+    # 2c. Download the NCBI viral RefSeq reference genomes, the (optional) tier one database for tiered classification (NB, timestamp identical to nt and taxdb)
+    print("\tViral RefSeq database setup...")
+    viral_refseq_path = make_database_dir_and_move_there(base_path, "viral_refseq")
+    commands = [
+        f'aws s3 sync --no-sign-request s3://ncbi-blast-databases/{timestamp}/ . --exclude "*" --include "ref_viruses_rep_genomes*"',
+    ]
+    run_commands(commands)
+
+    # 2d. Make the BLAST database of the sequences added to NT since the previous snapshot, the (optional) database for incremental reclassification of earlier runs
+    if args.previous_nt:
+        print("\tNT delta database setup...")
+        nt_delta_path = make_database_dir_and_move_there(base_path, "nt_delta")
+        previous_nt_folder = os.path.dirname(os.path.abspath(args.previous_nt))
+        commands = [
+            "singularity pull --arch amd64 library://ds_bioinformatics/jovian/scaffold_classification:2.0.0",
+            f'singularity exec --bind "${{PWD}}" --bind {nt_path}:{nt_path} --bind {previous_nt_folder}:{previous_nt_folder} --bind {os.path.dirname(os.path.abspath(__file__))}:/Jovian/scripts scaffold_classification_2.0.0.sif bash /Jovian/scripts/nt_delta.sh {os.path.abspath(args.previous_nt)} {nt_path}/nt nt_delta',
+            "rm scaffold_classification_2.0.0.sif",
+        ]
+        run_commands(commands)
+
+    # 3. Set up mgkit, download taxonomy and index the accession --> taxid table (memory-mapped, for the BLAST hits without `staxids` in the LCA analysis)
     print("\tMgkit database setup...")
     mgkit_path = make_database_dir_and_move_there(base_path, "mgkit")
     commands = [
@@ -147,22 +177,34 @@ def main(args=sys.argv[1:]):
         "gunzip -c nucl_gb.accession2taxid.gz | cut -f2,3 > nucl_gb.accession2taxid_sliced.tsv",
         "rm nucl_gb.accession2taxid.gz*",
         "rm mgkit_lca_2.0.0.sif",
+        "LC_ALL=C sort -s -k1,1 -T . nucl_gb.accession2taxid_sliced.tsv > nucl_gb.accession2taxid_sorted.tsv",
+        "singularity pull --arch amd64 library://ds_bioinformatics/jovian/data_wrangling:2.0.0",
+        f'singularity exec --bind "${{PWD}}" --bind {os.path.dirname(os.path.abspath(__file__))}:/Jovian/scripts data_wrangling_2.0.0.sif python /Jovian/scripts/blast_lca.py index nucl_gb.accession2taxid_sorted.tsv accession2taxid_index',
+        "rm nucl_gb.accession2taxid_sorted.tsv data_wrangling_2.0.0.sif",
     ]
     run_commands(commands)
 
-    # 4. Download the Virus-Host DB
+    # 4. Download the Virus-Host DB and build the columnar index of it that is used by the post-processing scripts
     print("\tVirus-host database setup...")
     virus_host_db_path = make_database_dir_and_move_there(base_path, "virus_host_db")
-    commands = "wget -O virushostdb.tsv ftp://ftp.genome.jp/pub/db/virushostdb/virushostdb.tsv"
+    commands = [
+        "wget -O virushostdb.tsv ftp://ftp.genome.jp/pub/db/virushostdb/virushostdb.tsv",
+        "singularity pull --arch amd64 library://ds_bioinformatics/jovian/data_wrangling:2.0.0",
+        f'singularity exec --bind "${{PWD}}" --bind {os.path.dirname(os.path.abspath(__file__))}:/Jovian/scripts data_wrangling_2.0.0.sif python /Jovian/scripts/virus_host.py build virushostdb.tsv',
+        "rm data_wrangling_2.0.0.sif",
+    ]
     run_commands(commands)
 
-    # 5. Download and process the new taxdump
+    # 5. Download and process the new taxdump, and build the memory-mapped taxonomy of it that is shared by the post-processing scripts
     print("\tNew_taxdump database setup...")
     new_taxdump_path = make_database_dir_and_move_there(base_path, "new_taxdump")
     commands = [
         "wget -O new_taxdump.tar.gz https://ftp.ncbi.nlm.nih.gov/pub/taxonomy/new_taxdump/new_taxdump.tar.gz",
         "wget -O new_taxdump.tar.gz.md5 https://ftp.ncbi.nlm.nih.gov/pub/taxonomy/new_taxdump/new_taxdump.tar.gz.md5",
         'if md5sum -c new_taxdump.tar.gz.md5; then tar -xzf new_taxdump.tar.gz; for file in *.dmp; do gawk \'{gsub("\\t"," "); if(substr($0,length($0),length($0))=="|") print substr($0,0,length($0)-1); else print $0}\' < ${file} > ${file}.delim; done; else echo "The md5sum does not match new_taxdump.tar.gz! Please try downloading again."; fi',
+        "singularity pull --arch amd64 library://ds_bioinformatics/jovian/data_wrangling:2.0.0",
+        f'singularity exec --bind "${{PWD}}" --bind {os.path.dirname(os.path.abspath(__file__))}:/Jovian/scripts data_wrangling_2.0.0.sif python /Jovian/scripts/taxonomy.py build ./ taxonomy/',
+        "rm data_wrangling_2.0.0.sif",
     ]
     run_commands(commands)
 
@@ -179,6 +221,9 @@ def main(args=sys.argv[1:]):
     run_commands(commands)
 
     print("Installer finished...")
+    print(f"Use `--blast-tier1-db {viral_refseq_path}/ref_viruses_rep_genomes` to enable tiered classification against the viral RefSeq genomes")
+    if args.previous_nt:
+        print(f"Use `--reannotate --blast-delta-db {nt_delta_path}/nt_delta` to incrementally reclassify runs that were classified against {args.previous_nt}")
 
     # based on runconfigs.py default suffixes
     database_paths = {
@@ -2,19 +2,21 @@
 scaffold metrics, taxonomic classification after LCA,
 virus host and disease information.
 Usage:
-  merge_data.py <sample_name> <scaffold_metrics> <Krona_LCA_taxonomy> <input_scaffolds> <scaffold_ORF_count> <path_virushost_db> <path_rankedlineage_taxdump> <path_host_taxdump> <output_classified_scaffolds> <output_unclassified_scaffolds> <output_scaffolds_host>
+  merge_data.py <sample_name> <scaffold_metrics> <Krona_LCA_taxonomy> <input_scaffolds> <scaffold_ORF_count> <path_virushost_db> <path_taxonomy> <output_classified_scaffolds> <output_unclassified_scaffolds> <output_scaffolds_host> <output_tables>
+  merge_data.py batch <path_virushost_db> <path_taxonomy> <output_folder> <output_tables> <processes> <sample_name>=<scaffold_metrics>,<Krona_LCA_taxonomy>,<input_scaffolds>,<scaffold_ORF_count> ...
 <sample_name> is how you want to call this sample (in plain text).
-<scaffold_metrics> is the BBtools generated scaffold metrics file.
+<scaffold_metrics> is the per scaffold metrics file generated by `bam_statistics.py`.
 <Krona_LCA_taxonomy> is the taxtab file generated by Krona after
 the LCA analysis.
 <input_scaffolds> is the input scaffold fasta file.
 <scaffold_ORF_count> is the input per scaffold ORF count list.
 <path_virushost_db> is the location on your filesystem where the
-virus-host database can be found (Mihara et al. 2016).
-<path_rankedlineage_taxdump> is the location on your filesystem
-where the NCBI "new_taxdump" file called "rankedlineage" can be found.
-<path_host_taxdump> is the location on your filesystem
-where the NCBI "new_taxdump" file called "host" can be found.
+virus-host database can be found (Mihara et al. 2016), its rows
+are looked up in its index if built (see `virus_host.py`).
+<path_taxonomy> is the location on your filesystem where the
+memory-mapped NCBI "new_taxdump" taxonomy (see `taxonomy.py`) can be
+found, its "rankedlineage" is added to the LCA taxa and its "host"
+to the viral taxa.
 <output_classified_scaffolds> is the output file containing
 the scaffolds with taxonomic classification data, i.e.
 "classified" scaffolds.
@@ -24,6 +26,14 @@ the scaffolds without taxonomic classification data, i.e.
 <output_scaffolds_host> is the output file containing the host
 and disease information generated by cross-referencing the 
 virus-host database (Mihara et al. 2016) and NCBI "host" database.
+<output_tables> is the folder of the columnar tables (see `columnar.py`),
+the same three tables, without the scaffold sequences, are also written
+to <output_tables>/{taxClassified,taxUnclassified,virusHost}/<sample_name>/.
+In batch mode many samples are merged by a single process, that loads the
+virus-host database and taxonomy once, with <processes> worker processes.
+The outputs of every sample are written to <output_folder> as
+<sample_name>_taxClassified.tsv, <sample_name>_taxUnclassified.tsv and
+<sample_name>_virusHost.tsv.
 Example:
   python bin/merge_data.py [sample_name] \
     data/scaffolds_filtered/[sample_name]_perMinLenFiltScaffold.stats \
@@ -31,136 +41,100 @@ Example:
     data/scaffolds_filtered/[sample_name]_scaffolds_ge500nt.fasta \
     data/scaffolds_filtered/[sample_name]_contig_ORF_count_list.txt \
     [path_to_virushost_DB] \
-    [path_to_NCBI_newTaxdump_rankedlineage] \
-    [path_to_NCBI_newTaxdump_host] \
+    [path_to_NCBI_newTaxdump_taxonomy] \
     data/tables/[sample_name]_taxClassified.tsv \
     data/tables/[sample_name]_taxUnclassified.tsv \
-    data/tables/[sample_name]_virusHost.tsv
+    data/tables/[sample_name]_virusHost.tsv \
+    results/tables/
+
+  python bin/merge_data.py batch \
+    [path_to_virushost_DB] \
+    [path_to_NCBI_newTaxdump_taxonomy] \
+    data/tables/ \
+    results/tables/ \
+    4 \
+    [sample_name]=data/scaffolds_filtered/[sample_name]_perMinLenFiltScaffold.stats,data/taxonomic_classification/[sample_name].taxtab,data/scaffolds_filtered/[sample_name]_scaffolds_ge500nt.fasta,data/scaffolds_filtered/[sample_name]_contig_ORF_count_list.txt \
+    [...]
 """
 
-import pandas as pd
+import os
+from multiprocessing import Pool
 from sys import argv
+
+import pandas as pd
 from Bio import SeqIO
 
-(
-    SCRIPT,
+from columnar import write_table
+from concat_tables import sort_table
+from taxonomy import load_taxonomy
+from virus_host import load_virus_host
+
+#? The reference databases, loaded once per process (and shared with the workers of a batch)
+taxonomy = None
+virus_host = None
+
+
+def merge_sample(
     SAMPLENAME,
     INPUTBBTOOLS,
     INPUTKRONA,
     INPUTSCAFFOLDS,
     CONTIG_ORF_COUNT_LIST,
-    VIRUSHOSTDB,
-    PATH_TAXDUMP_RANKEDLINEAGE,
-    PATH_TAXDUMP_HOST,
     OUTPUTFILE_CLASSIFIED_SCAFFOLDS_TAX_TABLE,
     OUTPUTFILE_UNCLASSIFIED_SCAFFOLDS_TAX_TABLE,
     OUTPUTFILE_VIRAL_SCAFFOLDS_HOSTS_TABLE,
-) = argv
-
-# Import scaffold statistics to df
-perScaffoldStats = pd.read_csv(INPUTBBTOOLS, sep="\t", header=0)
-# Import Krona LCA results to df and replace spaces with underscores
-kronaTaxLCA = pd.read_csv(INPUTKRONA, sep="\t", header=0)
-kronaTaxLCA.columns = kronaTaxLCA.columns.str.replace("\s+", "_")
-# Import virus-host DB and replace spaces with underscores
-virusHostDB = pd.read_csv(VIRUSHOSTDB, sep="\t", header=0)
-virusHostDB.columns = virusHostDB.columns.str.replace("\s+", "_")
-# Import assembled scaffold fasta
-scaffolds_dict = {"scaffold_name": [], "scaffold_seq": []}
-for seq_record in SeqIO.parse(INPUTSCAFFOLDS, "fasta"):
-    scaffolds_dict["scaffold_name"].append(seq_record.id)
-    scaffolds_dict["scaffold_seq"].append(str(seq_record.seq))
-scaffoldsFasta = pd.DataFrame.from_dict(scaffolds_dict)
-# Import new_taxdump rankedlineage
-colnames_rankedlineage = [
-    "tax_id",
-    "tax_name",
-    "species",
-    "genus",
-    "family",
-    "order",
-    "class",
-    "phylum",
-    "kingdom",
-    "superkingdom",
-]
-taxdump_rankedlineage = pd.read_csv(
-    PATH_TAXDUMP_RANKEDLINEAGE,
-    sep="|",
-    header=None,
-    names=colnames_rankedlineage,
-    low_memory=False,
-)
-# Import new_taxdump host
-colnames_host = ["tax_id", "potential_hosts"]
-taxdump_host = pd.read_csv(
-    PATH_TAXDUMP_HOST, sep="|", header=None, names=colnames_host, low_memory=False
-)
-# Import per scaffold ORF counts
-colnames_scaffold_orf_count_list = ["Nr_ORFs", "scaffold_name"]
-contig_orf_count_list = pd.read_csv(
-    CONTIG_ORF_COUNT_LIST,
-    sep="\s+",
-    header=None,
-    names=colnames_scaffold_orf_count_list,
-    low_memory=False,
-)
-
-
-# Merge Krona LCA with scaffold metrics
-df1 = pd.merge(
-    perScaffoldStats, kronaTaxLCA, how="left", left_on="#ID", right_on="#queryID"
-).drop("#queryID", axis=1)
-# Merge above df with rankedlineage
-df2 = pd.merge(
-    df1, taxdump_rankedlineage, how="left", left_on="taxID", right_on="tax_id"
-).drop("tax_id", axis=1)
-# Merge above df with ORF counts
-df3 = pd.merge(
-    df2, contig_orf_count_list, how="left", left_on="#ID", right_on="scaffold_name"
-).drop("scaffold_name", axis=1)
-# Merge above df with fasta
-df4 = pd.merge(
-    df3, scaffoldsFasta, how="left", left_on="#ID", right_on="scaffold_name"
-).drop("#ID", axis=1)
+    OUTPUTFOLDER_TABLES,
+):
+    # Import scaffold statistics to df
+    perScaffoldStats = pd.read_csv(INPUTBBTOOLS, sep="\t", header=0)
+    # Import Krona LCA results to df and replace spaces with underscores
+    kronaTaxLCA = pd.read_csv(INPUTKRONA, sep="\t", header=0)
+    kronaTaxLCA.columns = kronaTaxLCA.columns.str.replace("\s+", "_")
+    # Look up the virus-host DB rows of the LCA taxa and replace spaces with underscores
+    virusHostDB = virus_host.rows(kronaTaxLCA["taxID"].dropna())
+    virusHostDB.columns = virusHostDB.columns.str.replace("\s+", "_")
+    # Import assembled scaffold fasta
+    scaffolds_dict = {"scaffold_name": [], "scaffold_seq": []}
+    for seq_record in SeqIO.parse(INPUTSCAFFOLDS, "fasta"):
+        scaffolds_dict["scaffold_name"].append(seq_record.id)
+        scaffolds_dict["scaffold_seq"].append(str(seq_record.seq))
+    scaffoldsFasta = pd.DataFrame.from_dict(scaffolds_dict)
+    # Look up the new_taxdump rankedlineage of the LCA taxa (columns "tax_id", "tax_name", "species", ..., "superkingdom")
+    taxdump_rankedlineage = taxonomy.ranked_lineages(kronaTaxLCA["taxID"].dropna())
+    # Look up the new_taxdump host of the LCA taxa (columns "tax_id", "potential_hosts")
+    taxdump_host = taxonomy.hosts_of(kronaTaxLCA["taxID"].dropna())
+    # Import per scaffold ORF counts
+    colnames_scaffold_orf_count_list = ["Nr_ORFs", "scaffold_name"]
+    contig_orf_count_list = pd.read_csv(
+        CONTIG_ORF_COUNT_LIST,
+        sep="\s+",
+        header=None,
+        names=colnames_scaffold_orf_count_list,
+        low_memory=False,
+    )
 
-# Add sample name as first column, then reorder df as desired, then replace any spaces with underscores
-df4["Sample_name"] = SAMPLENAME
-colnames = [
-    "Sample_name",
-    "scaffold_name",
-    "taxID",
-    "tax_name",
-    "Avg._log_e-value",
-    "species",
-    "genus",
-    "family",
-    "order",
-    "class",
-    "phylum",
-    "kingdom",
-    "superkingdom",
-    "Avg_fold",
-    "Length",
-    "Ref_GC",
-    "Nr_ORFs",
-    "Covered_percent",
-    "Covered_bases",
-    "Plus_reads",
-    "Minus_reads",
-    "Read_GC",
-    "Median_fold",
-    "Std_Dev",
-    "scaffold_seq",
-]
-df4 = df4.reindex(columns=colnames)
+    # Merge Krona LCA with scaffold metrics
+    df1 = pd.merge(
+        perScaffoldStats, kronaTaxLCA, how="left", left_on="#ID", right_on="#queryID"
+    ).drop("#queryID", axis=1)
+    # Merge above df with rankedlineage
+    df2 = pd.merge(
+        df1, taxdump_rankedlineage, how="left", left_on="taxID", right_on="tax_id"
+    ).drop("tax_id", axis=1)
+    # Merge above df with ORF counts
+    df3 = pd.merge(
+        df2, contig_orf_count_list, how="left", left_on="#ID", right_on="scaffold_name"
+    ).drop("scaffold_name", axis=1)
+    # Merge above df with fasta
+    df4 = pd.merge(
+        df3, scaffoldsFasta, how="left", left_on="#ID", right_on="scaffold_name"
+    ).drop("#ID", axis=1)
 
-# Slice into classified scaffolds, print to file. A selections is made that captures anything where taxID is not "1", i.e. anything that LCA doesn't assign to 'Root' and where the taxID not empty, which are records where BLAST could not identify any hits to even perform LCA on.
-taxClassified = df4.loc[(df4["taxID"] != 1 ) & (df4["taxID"].notnull())]
-taxClassified.to_csv(OUTPUTFILE_CLASSIFIED_SCAFFOLDS_TAX_TABLE, index=False, sep="\t")
-# Slice into unclassified scaffolds, print to file. Vice versa as above. `Root` LCA assignment usually happens for bacterial seqs with integrated prophages.
-taxUnclassified = df4.loc[(df4["taxID"] == 1 ) | (df4["taxID"].isnull())].drop(
-    [
+    # Add sample name as first column, then reorder df as desired, then replace any spaces with underscores
+    df4["Sample_name"] = SAMPLENAME
+    colnames = [
+        "Sample_name",
+        "scaffold_name",
         "taxID",
         "tax_name",
         "Avg._log_e-value",
@@ -172,33 +146,99 @@ taxUnclassified = df4.loc[(df4["taxID"] == 1 ) | (df4["taxID"].isnull())].drop(
         "phylum",
         "kingdom",
         "superkingdom",
-    ],
-    axis=1,
-)
-taxUnclassified.to_csv(
-    OUTPUTFILE_UNCLASSIFIED_SCAFFOLDS_TAX_TABLE, index=False, sep="\t"
-)
-# Slice into virus scaffolds with added host/disease information, print to file
-virus_taxa_with_NCBIhosts = (
-    pd.merge(
-        taxClassified.loc[taxClassified["superkingdom"] == "Viruses"].iloc[
-            :, [0, 1, 2]
+        "Avg_fold",
+        "Length",
+        "Ref_GC",
+        "Nr_ORFs",
+        "Covered_percent",
+        "Covered_bases",
+        "Plus_reads",
+        "Minus_reads",
+        "Read_GC",
+        "Median_fold",
+        "Std_Dev",
+        "scaffold_seq",
+    ]
+    df4 = df4.reindex(columns=colnames)
+
+    # Slice into classified scaffolds, print to file. A selections is made that captures anything where taxID is not "1", i.e. anything that LCA doesn't assign to 'Root' and where the taxID not empty, which are records where BLAST could not identify any hits to even perform LCA on.
+    taxClassified = sort_table(df4.loc[(df4["taxID"] != 1 ) & (df4["taxID"].notnull())], "taxClassified")
+    taxClassified.to_csv(OUTPUTFILE_CLASSIFIED_SCAFFOLDS_TAX_TABLE, index=False, sep="\t")
+    # Slice into unclassified scaffolds, print to file. Vice versa as above. `Root` LCA assignment usually happens for bacterial seqs with integrated prophages.
+    taxUnclassified = sort_table(df4.loc[(df4["taxID"] == 1 ) | (df4["taxID"].isnull())], "taxUnclassified").drop(
+        [
+            "taxID",
+            "tax_name",
+            "Avg._log_e-value",
+            "species",
+            "genus",
+            "family",
+            "order",
+            "class",
+            "phylum",
+            "kingdom",
+            "superkingdom",
         ],
-        taxdump_host,
+        axis=1,
+    )
+    taxUnclassified.to_csv(
+        OUTPUTFILE_UNCLASSIFIED_SCAFFOLDS_TAX_TABLE, index=False, sep="\t"
+    )
+    # Slice into virus scaffolds with added host/disease information, print to file
+    virus_taxa_with_NCBIhosts = (
+        pd.merge(
+            taxClassified.loc[taxClassified["superkingdom"] == "Viruses"].iloc[
+                :, [0, 1, 2]
+            ],
+            taxdump_host,
+            how="left",
+            left_on="taxID",
+            right_on="tax_id",
+        )
+        .drop("tax_id", axis=1)
+        .rename(columns={"potential_hosts": "NCBI_potential_hosts"})
+    )
+    virusHost_table_raw = pd.merge(
+        virus_taxa_with_NCBIhosts,
+        virusHostDB,
         how="left",
         left_on="taxID",
-        right_on="tax_id",
+        right_on="virus_tax_id",
+    ).drop("virus_tax_id", axis=1)
+    virusHost_table_raw = sort_table(virusHost_table_raw, "virusHost")
+    virusHost_table_raw.to_csv(
+        OUTPUTFILE_VIRAL_SCAFFOLDS_HOSTS_TABLE, index=False, sep="\t"
     )
-    .drop("tax_id", axis=1)
-    .rename(columns={"potential_hosts": "NCBI_potential_hosts"})
-)
-virusHost_table_raw = pd.merge(
-    virus_taxa_with_NCBIhosts,
-    virusHostDB,
-    how="left",
-    left_on="taxID",
-    right_on="virus_tax_id",
-).drop("virus_tax_id", axis=1)
-virusHost_table_raw.to_csv(
-    OUTPUTFILE_VIRAL_SCAFFOLDS_HOSTS_TABLE, index=False, sep="\t"
-)
\ No newline at end of file
+    # Store the same tables as columnar tables, the scaffold sequences are looked up in the (indexed) scaffold fasta instead
+    write_table(taxClassified.drop("scaffold_seq", axis=1), os.path.join(OUTPUTFOLDER_TABLES, "taxClassified", SAMPLENAME))
+    write_table(taxUnclassified.drop("scaffold_seq", axis=1), os.path.join(OUTPUTFOLDER_TABLES, "taxUnclassified", SAMPLENAME))
+    write_table(virusHost_table_raw, os.path.join(OUTPUTFOLDER_TABLES, "virusHost", SAMPLENAME))
+
+
+def merge_batch(output_folder, output_tables, processes, samples):
+    jobs = []
+    for sample in samples:
+        sample_name, inputs = sample.split("=", 1)
+        outputs = [os.path.join(output_folder, f"{sample_name}_{table}.tsv") for table in ["taxClassified", "taxUnclassified", "virusHost"]]
+        jobs.append((sample_name, *inputs.split(","), *outputs, output_tables))
+    if processes > 1 and len(jobs) > 1:
+        #? Forked after the databases are loaded, so the workers share them
+        with Pool(min(processes, len(jobs))) as pool:
+            pool.starmap(merge_sample, jobs)
+    else:
+        for job in jobs:
+            merge_sample(*job)
+    print(f"Merged the tables of {len(jobs)} samples")
+
+
+if __name__ == "__main__":
+    if len(argv) >= 7 and argv[1] == "batch":
+        virus_host = load_virus_host(argv[2])
+        taxonomy = load_taxonomy(argv[3])
+        merge_batch(argv[4], argv[5], int(argv[6]), argv[7:])
+    elif len(argv) == 12:
+        virus_host = load_virus_host(argv[6])
+        taxonomy = load_taxonomy(argv[7])
+        merge_sample(*argv[1:6], *argv[8:])
+    else:
+        raise SystemExit(__doc__)
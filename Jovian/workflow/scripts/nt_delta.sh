@@ -0,0 +1,37 @@
+#####################################################################################################################
+### Makes a BLAST database of the sequences that were added to a (nt) BLAST database since an earlier snapshot. ###
+###     Usage: bash nt_delta.sh {previous_db} {current_db} {delta_db}                                             ###
+###     The added (and removed) sequences are the set difference of the accession.versions of both snapshots.    ###
+###     Writes the {delta_db} BLAST database (with the taxon IDs of the current snapshot) of the added sequences, ###
+###     {delta_db}.added.txt and {delta_db}.removed.txt with their accession.versions and {delta_db}.dbsize.tsv  ###
+###     with the total length of both snapshots, used to rescale the e-values of the previous snapshot's hits.   ###
+###     See `blast_lca.py delta` and the `--blast-delta-db` flag.                                                ###
+#####################################################################################################################
+
+set -euo pipefail
+
+PREVIOUS="$1"
+CURRENT="$2"
+DELTA="$3"
+WORKDIR="$(dirname "${DELTA}")"
+
+db_size() {
+    blastdbcmd -db "$1" -info | grep -m 1 "total bases" | sed -E 's/.*sequences; ([0-9,]+) total bases.*/\1/' | tr -d ','
+}
+
+echo "Listing the accessions of ${PREVIOUS} and ${CURRENT}..."
+blastdbcmd -db "${PREVIOUS}" -entry all -outfmt "%a" | LC_ALL=C sort -u -T "${WORKDIR}" > "${DELTA}.previous.tmp"
+blastdbcmd -db "${CURRENT}" -entry all -outfmt "%a" | LC_ALL=C sort -u -T "${WORKDIR}" > "${DELTA}.current.tmp"
+LC_ALL=C comm -13 "${DELTA}.previous.tmp" "${DELTA}.current.tmp" > "${DELTA}.added.txt"
+LC_ALL=C comm -23 "${DELTA}.previous.tmp" "${DELTA}.current.tmp" > "${DELTA}.removed.txt"
+rm "${DELTA}.previous.tmp" "${DELTA}.current.tmp"
+echo "$(wc -l < "${DELTA}.added.txt") sequences were added and $(wc -l < "${DELTA}.removed.txt") removed"
+
+if [ -s "${DELTA}.added.txt" ]; then
+    blastdbcmd -db "${CURRENT}" -entry_batch "${DELTA}.added.txt" -outfmt "%a %T" > "${DELTA}.taxid_map.tmp"
+    blastdbcmd -db "${CURRENT}" -entry_batch "${DELTA}.added.txt" > "${DELTA}.fasta.tmp"
+    makeblastdb -in "${DELTA}.fasta.tmp" -dbtype nucl -parse_seqids -taxid_map "${DELTA}.taxid_map.tmp" -out "${DELTA}" -title "Sequences added to ${CURRENT} since ${PREVIOUS}"
+    rm "${DELTA}.taxid_map.tmp" "${DELTA}.fasta.tmp"
+fi
+
+echo -e "previous\tcurrent\n$(db_size "${PREVIOUS}")\t$(db_size "${CURRENT}")" > "${DELTA}.dbsize.tsv"
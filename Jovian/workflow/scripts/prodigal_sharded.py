@@ -0,0 +1,145 @@
+"""
+Run prodigal ORF prediction in parallel on length-balanced shards of a scaffold
+fasta and merge the results into the same outputs as a single prodigal run.
+The scaffolds are split into <threads> contiguous shards with roughly equal total
+length, so the merged outputs keep the order of the input fasta. Prodigal numbers
+its ORFs as `ID={sequence number}_{ORF number}` per input file, during the merge
+these sequence numbers are offset by the number of scaffolds in the preceding
+shards; i.e. the ORF IDs are identical to those of a single-threaded prodigal run
+on the full fasta. The per scaffold ORF counts (former `egrep | sed | cut | uniq -c`
+pipeline) are counted while merging and written in the same `uniq -c` layout.
+Usage:
+  prodigal_sharded.py <input_fasta> <threads> <procedure> <output_AA_fasta> <output_NT_fasta> <output_gff> <output_ORF_counts>
+Example:
+  python prodigal_sharded.py [sample]_scaffolds_filtered-ge250.fasta 4 meta [sample]_ORF_AA.fa [sample]_ORF_NT.fa [sample]_annotation.gff [sample]_contig_ORF_count_list.txt
+"""
+
+import concurrent.futures
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+from sys import argv
+
+SCRIPT, INPUT_FASTA, THREADS, PROCEDURE, OUTPUT_AA, OUTPUT_NT, OUTPUT_GFF, OUTPUT_COUNTS = argv
+
+ORF_ID = re.compile(r"ID=(\d+)_(\d+)")
+SEQNUM = re.compile(r"seqnum=(\d+)")
+
+
+def read_fasta(fasta):
+    """
+    Return a list of (header line, sequence lines, sequence length) of all records in a fasta file
+    """
+    records = []
+    with open(fasta) as handle:
+        for line in handle:
+            if line.startswith(">"):
+                records.append([line, [], 0])
+            elif records:
+                records[-1][1].append(line)
+                records[-1][2] += len(line.strip())
+    return records
+
+
+def split_records(records, n_shards):
+    """
+    Split the records in at most `n_shards` contiguous shards with a roughly equal total sequence length
+    """
+    total = sum(record[2] for record in records)
+    shards, current, current_length = [], [], 0
+    for record in records:
+        current.append(record)
+        current_length += record[2]
+        if current_length >= total * (len(shards) + 1) / n_shards and len(shards) < n_shards - 1:
+            shards.append(current)
+            current = []
+    if current:
+        shards.append(current)
+    return shards
+
+
+def run_prodigal(shard_dir):
+    """
+    Run prodigal on the shard fasta in `shard_dir`
+    """
+    with open(os.path.join(shard_dir, "prodigal.log"), "w") as log:
+        subprocess.check_call(
+            [
+                "prodigal",
+                "-q",
+                "-i", os.path.join(shard_dir, "scaffolds.fasta"),
+                "-a", os.path.join(shard_dir, "ORF_AA.fa"),
+                "-d", os.path.join(shard_dir, "ORF_NT.fa"),
+                "-o", os.path.join(shard_dir, "annotation.gff"),
+                "-p", PROCEDURE,
+                "-f", "gff",
+            ],
+            stdout=log,
+            stderr=subprocess.STDOUT,
+        )
+
+
+def offset_ids(line, offset):
+    "Offset the prodigal sequence number in the `ID=` and `seqnum=` fields of a line"
+    line = ORF_ID.sub(lambda match: f"ID={int(match.group(1)) + offset}_{match.group(2)}", line)
+    return SEQNUM.sub(lambda match: f"seqnum={int(match.group(1)) + offset}", line)
+
+
+def main():
+    """
+    Main execution of the script
+    """
+    records = read_fasta(INPUT_FASTA)
+    shards = split_records(records, max(1, int(THREADS)))
+    print(f"Split {len(records)} scaffolds into {len(shards)} shards")
+
+    tmpdir = tempfile.mkdtemp(prefix="prodigal_shards_", dir=os.path.dirname(os.path.abspath(OUTPUT_GFF)))
+    try:
+        shard_dirs = []
+        for i, shard in enumerate(shards):
+            shard_dir = os.path.join(tmpdir, str(i))
+            os.makedirs(shard_dir)
+            with open(os.path.join(shard_dir, "scaffolds.fasta"), "w") as out:
+                for header, sequence, _length in shard:
+                    out.write(header)
+                    out.writelines(sequence)
+            shard_dirs.append(shard_dir)
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, int(THREADS))) as executor:
+            list(executor.map(run_prodigal, shard_dirs))
+
+        orf_counts = []
+        with open(OUTPUT_AA, "w") as out_aa, open(OUTPUT_NT, "w") as out_nt, open(OUTPUT_GFF, "w") as out_gff:
+            offset = 0
+            for i, shard_dir in enumerate(shard_dirs):
+                with open(os.path.join(shard_dir, "ORF_AA.fa")) as handle:
+                    out_aa.writelines(offset_ids(line, offset) if line.startswith(">") else line for line in handle)
+                with open(os.path.join(shard_dir, "ORF_NT.fa")) as handle:
+                    for line in handle:
+                        if line.startswith(">"):
+                            line = offset_ids(line, offset)
+                            #? ORF names are `{scaffold name}_{ORF number}`, count consecutive ORFs per scaffold like `uniq -c`
+                            scaffold = line[1:].split(" ", 1)[0].rsplit("_", 1)[0]
+                            if orf_counts and orf_counts[-1][1] == scaffold:
+                                orf_counts[-1][0] += 1
+                            else:
+                                orf_counts.append([1, scaffold])
+                        out_nt.write(line)
+                with open(os.path.join(shard_dir, "annotation.gff")) as handle:
+                    for line in handle:
+                        if line.startswith("##gff-version") and i > 0:
+                            continue
+                        out_gff.write(offset_ids(line, offset) if line.startswith("#") or "ID=" in line else line)
+                offset += len(shards[i])
+
+        with open(OUTPUT_COUNTS, "w") as out:
+            for count, scaffold in orf_counts:
+                out.write(f"{count:7d} {scaffold}\n")
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+if __name__ == "__main__":
+    main()
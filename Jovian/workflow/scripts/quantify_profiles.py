@@ -50,6 +50,8 @@ from bokeh.models.widgets import Tabs, Panel
 from bokeh.models import ColumnDataSource
 import concurrent.futures
 
+from columnar import read_table
+
 ### Define global variables --------------------------------------
 FASTQ_COUNT_WARINING_MESSAGE = """
 Now counting the number of lines in the fastq files from which
@@ -135,7 +137,7 @@ def parse_arguments():
         metavar="",
         required=True,
         type=str,
-        help="Table with taxonomic classifications",
+        help="Table with taxonomic classifications, tab-separated or columnar (see columnar.py)",
     )
 
     required.add_argument(
@@ -145,7 +147,7 @@ def parse_arguments():
         metavar="",
         required=True,
         type=str,
-        help="Table with unclassified contigs",
+        help="Table with unclassified contigs, tab-separated or columnar (see columnar.py)",
     )
 
     required.add_argument(
@@ -343,7 +345,7 @@ def sum_superkingdoms(classified_file, mapped_reads_file):
         superkindgom per sample, also taking into account reads
         that were not assigned a superkingdom ("not classified")
     """
-    clas_df = pd.read_csv(classified_file, delimiter="\t")
+    clas_df = read_table(classified_file, ["Sample_name", "scaffold_name", "superkingdom"])
 
     counts_df = pd.read_csv(mapped_reads_file, delimiter="\t")
     clas_df = pd.merge(
@@ -412,7 +414,7 @@ def sum_unclassified(unclassified_file, mapped_reads_file):
         dataframe with the number of reads assigned to 
         unclassified scaffolds per sample
     """
-    unclas_df = pd.read_csv(unclassified_file, delimiter="\t")
+    unclas_df = read_table(unclassified_file, ["Sample_name", "scaffold_name"])
 
     counts_df = pd.read_csv(mapped_reads_file, delimiter="\t")
     unclas_df = pd.merge(
@@ -0,0 +1,130 @@
+"""
+Scatter/gather helper for region-sharded SNP calling.
+Usage:
+  snp_calling_shards.py scatter <idxstats> <output_bed_1> [<output_bed_2> ...]
+  snp_calling_shards.py gather <fasta_fai> <output_vcf> <shard_vcf_1> [<shard_vcf_2> ...]
+  snp_calling_shards.py bonferroni <fasta_fai>
+scatter:
+<idxstats> is the output of `samtools idxstats`, i.e. the number of mapped
+reads per scaffold as stored in the BAM index. These are used as a proxy for
+the coverage, and thus lofreq runtime, per scaffold. Scaffolds that are heavier
+than the average shard are split into equally sized windows of a quarter
+shard, after which all regions are distributed over the shards with a greedy
+longest-processing-time approach. One BED file is written per shard, the
+number of shards is the number of given output files.
+gather:
+Concatenates the per-shard VCF files into a single VCF, the header is taken
+from the first shard that contains one and the records are sorted on the
+scaffold order of <fasta_fai> and position.
+bonferroni:
+Prints the Bonferroni factor of lofreq (`--bonf`) for the whole assembly, i.e.
+three tests (one per alternative base) per position of the scaffolds in
+<fasta_fai>. With lofreq's default dynamic factor each shard would only count
+the tests in its own regions, so a sharded call would be less strict than a
+single call; with this factor both modes call the same SNPs.
+Example:
+  samtools idxstats [sample]_sorted.bam > [sample].idxstats
+  python snp_calling_shards.py scatter [sample].idxstats shard-0.bed shard-1.bed shard-2.bed
+  python snp_calling_shards.py gather [sample]_scaffolds.fasta.fai [sample]_scaffolds_raw.vcf shard-0_raw.vcf shard-1_raw.vcf shard-2_raw.vcf
+  python snp_calling_shards.py bonferroni [sample]_scaffolds.fasta.fai
+"""
+
+import heapq
+import math
+from sys import argv
+
+
+def read_idxstats(idxstats):
+    """
+    Return a list of (scaffold, length, mapped reads) from `samtools idxstats` output, the unmapped `*` record is skipped
+    """
+    scaffolds = []
+    with open(idxstats) as handle:
+        for line in handle:
+            if not line.strip():
+                continue
+            name, length, mapped, _unmapped = line.rstrip("\n").split("\t")
+            if name == "*":
+                continue
+            scaffolds.append((name, int(length), int(mapped)))
+    return scaffolds
+
+
+def scatter(idxstats, output_beds):
+    """
+    Split the scaffolds into len(output_beds) coverage balanced shards and write these as BED files
+    """
+    scaffolds = read_idxstats(idxstats)
+    n_shards = len(output_beds)
+    #? Scaffolds without any mapped reads still cost a little; weigh them by length (Mb) so these are spread evenly too
+    total_weight = sum(mapped for _, _, mapped in scaffolds) or 1
+    target = total_weight / n_shards
+
+    regions = []
+    for order, (name, length, mapped) in enumerate(scaffolds):
+        weight = mapped if mapped else length / 1e6
+        #? Heavy scaffolds are split in windows of a quarter of the average shard to leave room for balancing
+        n_windows = min(math.ceil(4 * weight / target), length) if weight > target else 1
+        window_size = math.ceil(length / n_windows)
+        for start in range(0, length, window_size):
+            end = min(start + window_size, length)
+            regions.append((weight * (end - start) / length, order, name, start, end))
+
+    shards = [(0.0, i, []) for i in range(n_shards)]
+    heapq.heapify(shards)
+    for region in sorted(regions, key=lambda region: (-region[0], region[1], region[3])):
+        load, i, members = heapq.heappop(shards)
+        members.append(region)
+        heapq.heappush(shards, (load + region[0], i, members))
+
+    for load, i, members in sorted(shards, key=lambda shard: shard[1]):
+        with open(output_beds[i], "w") as out:
+            for _weight, _order, name, start, end in sorted(members, key=lambda region: (region[1], region[3])):
+                out.write(f"{name}\t{start}\t{end}\n")
+        print(f"Shard {i}: {len(members)} regions, {load:.0f} mapped reads")
+
+
+def gather(fasta_fai, output_vcf, shard_vcfs):
+    """
+    Concatenate the shard VCF files into one VCF sorted on scaffold order and position
+    """
+    with open(fasta_fai) as handle:
+        scaffold_order = {line.split("\t")[0]: i for i, line in enumerate(handle)}
+
+    header, records = [], []
+    for shard_vcf in shard_vcfs:
+        shard_header = []
+        with open(shard_vcf) as handle:
+            for line in handle:
+                if line.startswith("#"):
+                    shard_header.append(line)
+                else:
+                    fields = line.split("\t", 2)
+                    records.append((scaffold_order.get(fields[0], len(scaffold_order)), int(fields[1]), line))
+        if not header:
+            header = shard_header
+
+    records.sort(key=lambda record: (record[0], record[1]))
+    with open(output_vcf, "w") as out:
+        out.writelines(header)
+        out.writelines(record[2] for record in records)
+    print(f"Gathered {len(records)} records from {len(shard_vcfs)} shards")
+
+
+def bonferroni(fasta_fai):
+    """
+    Return the number of tests of lofreq for all scaffolds in the fasta index, three per position
+    """
+    with open(fasta_fai) as handle:
+        return 3 * sum(int(line.split("\t")[1]) for line in handle if line.strip())
+
+
+if __name__ == "__main__":
+    if argv[1] == "scatter":
+        scatter(argv[2], argv[3:])
+    elif argv[1] == "gather":
+        gather(argv[2], argv[3], argv[4:])
+    elif argv[1] == "bonferroni":
+        print(bonferroni(argv[2]))
+    else:
+        raise SystemExit(__doc__)
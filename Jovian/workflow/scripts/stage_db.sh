@@ -0,0 +1,133 @@
+#####################################################################################################################
+### Stages a database on node-local scratch, so a job reads it from local disk instead of the shared filesystem. ###
+###     Usage: source stage_db.sh {params.stage_args} DATABASE VARIABLE                                         ###
+###     DATABASE is a path prefix, e.g. a BLAST database (`/path/to/nt`) or a single file, all files starting   ###
+###     with it are staged. A path ending with `/` stages all files in that folder. VARIABLE is set to the      ###
+###     path of the local copy, or to DATABASE itself when staging is disabled (an empty stage folder) or       ###
+###     not possible, e.g. when it does not fit on the scratch disk. Must be sourced: the job keeps a shared    ###
+###     lock on the local copy until it finishes, so it cannot be evicted while in use.                         ###
+###     The first job on a node copies the files under an exclusive lock, checksums them while copying and     ###
+###     verifies the local copy against this manifest. The copy is reused as long as the names, sizes and       ###
+###     modification times of the source files are unchanged. When the scratch disk is full, or the total       ###
+###     size of all copies would exceed the maximum size in GB (0 is no limit), the least recently used copies  ###
+###     that are not in use are evicted. With the warm argument set to `True` the files are read once per boot  ###
+###     to pre-warm the page cache. {params.stage_args} is the stage folder, maximum size and warm argument.     ###
+#####################################################################################################################
+
+jovian_stage_db_list() {
+    #? Name, size and modification time of the files of a database, excluding our own hidden bookkeeping files
+    find "$1" -maxdepth 1 -type f -name "$2*" ! -name ".*" -printf '%f\t%s\t%T@\n' | sort
+}
+
+jovian_stage_db_valid() {
+    local unit_dir="$1" prefix="$2" signature="$3"
+    [ -f "${unit_dir}/.complete" ] && [ "$(cat "${unit_dir}/.signature")" == "${signature}" ] &&
+        [ "$(jovian_stage_db_list "${unit_dir}" "${prefix}" | cut -f1,2)" == "$(echo "${signature}" | cut -f1,2)" ]
+}
+
+jovian_stage_db_evict() {
+    #? Evict least recently used copies (that are not in use) until `size` bytes fit on the scratch disk and within the size limit
+    local stage_dir="$1" unit="$2" size="$3" max_size_gb="$4"
+    local evict_fd unit_dir candidate candidate_fd used free evicted max_size
+    max_size=$(awk -v size="${max_size_gb}" 'BEGIN {printf "%d", size * 1000 ^ 3}')
+    exec {evict_fd}>"${stage_dir}/.evict.lock"
+    flock -x "${evict_fd}"
+    while true; do
+        used=$(du -sb --exclude="${unit}" "${stage_dir}" | cut -f1)
+        free=$(df --output=avail -B1 "${stage_dir}" | tail -n 1)
+        if (( size < free )) && (( max_size == 0 || used + size <= max_size )); then
+            break
+        fi
+        evicted=""
+        #? Copies without a `.last_used` file are left-overs of interrupted stagings and are evicted first
+        for candidate in $(for unit_dir in "${stage_dir}"/*/; do
+            echo "$(stat -c %Y "${unit_dir}.last_used" 2>/dev/null || echo 0) $(basename "${unit_dir}")"
+        done | sort -n | cut -d " " -f2); do
+            [ "${candidate}" == "${unit}" ] && continue
+            exec {candidate_fd}>"${stage_dir}/${candidate}.lock"
+            if flock -n -x "${candidate_fd}"; then
+                echo "Evicting the least recently used database copy ${stage_dir}/${candidate}" >&2
+                rm -rf "${stage_dir:?}/${candidate}"
+                evicted="${candidate}"
+            fi
+            exec {candidate_fd}>&-
+            [ -n "${evicted}" ] && break
+        done
+        if [ -z "${evicted}" ]; then
+            exec {evict_fd}>&-
+            return 1
+        fi
+    done
+    exec {evict_fd}>&-
+}
+
+jovian_stage_db_copy() {
+    local source_dir="$1" unit_dir="$2" signature="$3" name status
+    rm -rf "${unit_dir}"
+    mkdir -p "${unit_dir}" || return 1
+    #? Checksum the files while they are read from the shared filesystem, so they only have to be read once
+    while IFS=$'\t' read -r name _size _mtime; do
+        cat "${source_dir}/${name}" | tee "${unit_dir}/${name}" | sha256sum | sed "s|-\$|${name}|" >> "${unit_dir}/.manifest.sha256"
+        status=("${PIPESTATUS[@]}")
+        [ "${status[*]}" == "0 0 0 0" ] || return 1
+    done <<< "${signature}"
+    (cd "${unit_dir}" && sha256sum --quiet -c .manifest.sha256) >&2 || return 1
+    echo "${signature}" > "${unit_dir}/.signature"
+    touch "${unit_dir}/.complete"
+}
+
+jovian_stage_db() {
+    local stage_dir="$1" max_size_gb="$2" warm="$3" database="$4" variable="$5"
+    local source_dir prefix unit unit_dir signature size lock_fd
+    printf -v "${variable}" '%s' "${database}"
+    [ -n "${stage_dir}" ] || return 0
+
+    if [[ "${database}" == */ ]]; then
+        source_dir="${database%/}"
+        prefix=""
+    else
+        source_dir="$(dirname "${database}")"
+        prefix="$(basename "${database}")"
+    fi
+    unit="$(basename "${database%/}")-$(echo -n "${database}" | sha256sum | cut -c1-12)"
+    unit_dir="${stage_dir}/${unit}"
+    #? Checked before listing it, as a failing `find` would end the (`set -euo pipefail`) job that sources this script
+    if [ ! -d "${source_dir}" ]; then
+        echo "Not staging ${database}, ${source_dir} does not exist" >&2
+        return 0
+    fi
+    signature="$(jovian_stage_db_list "${source_dir}" "${prefix}")"
+    if [ -z "${signature}" ] || ! mkdir -p "${stage_dir}"; then
+        echo "Not staging ${database}, using it from its original location" >&2
+        return 0
+    fi
+    size=$(echo "${signature}" | awk -F'\t' '{size += $2} END {printf "%d", size}')
+
+    exec {lock_fd}>"${stage_dir}/${unit}.lock"
+    flock -s "${lock_fd}"
+    if ! jovian_stage_db_valid "${unit_dir}" "${prefix}" "${signature}"; then
+        #? Wait until no other job uses an outdated copy, and check again since another job may have staged it in the meantime
+        flock -x "${lock_fd}"
+        if ! jovian_stage_db_valid "${unit_dir}" "${prefix}" "${signature}"; then
+            echo "Staging ${database} to ${unit_dir}" >&2
+            mkdir -p "${unit_dir}"
+            if ! jovian_stage_db_evict "${stage_dir}" "${unit}" "${size}" "${max_size_gb}" || ! jovian_stage_db_copy "${source_dir}" "${unit_dir}" "${signature}"; then
+                echo "Could not stage ${database} to ${unit_dir}, using it from its original location" >&2
+                rm -rf "${unit_dir}"
+                exec {lock_fd}>&-
+                return 0
+            fi
+        fi
+        flock -s "${lock_fd}"
+    fi
+    touch "${unit_dir}/.last_used"
+
+    if [ "${warm}" == "True" ] && [ "$(cat "${unit_dir}/.warm" 2>/dev/null)" != "$(cat /proc/sys/kernel/random/boot_id)" ]; then
+        echo "Pre-warming the page cache with ${unit_dir}" >&2
+        cat "${unit_dir}/${prefix}"* > /dev/null
+        cat /proc/sys/kernel/random/boot_id > "${unit_dir}/.warm"
+    fi
+    printf -v "${variable}" '%s' "${unit_dir}/${prefix}"
+}
+
+jovian_stage_db "$@"
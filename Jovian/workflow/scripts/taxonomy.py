@@ -0,0 +1,196 @@
+"""
+Compact, memory-mapped NCBI taxonomy shared by the post-processing scripts, e.g.
+`blast_lca.py` and `merge_data.py`. The taxonomy is stored as numpy arrays
+indexed by taxon ID in a folder, e.g. `new_taxdump/taxonomy/`:
+  - parents.npy: the parent taxon ID, -1 for the root and the top-level taxa
+    (the children of the root) and -2 for taxon IDs that are not in it
+  - ranks.npy: the rank, as an index into rank_names.npy
+  - names.npy: the scientific name, as an index into the strings
+  - lineages.npy: the tax_name, species, genus, family, order, class, phylum,
+    kingdom and superkingdom of rankedlineage.dmp, as indices into the
+    strings, -1 for the taxon IDs that are not in rankedlineage.dmp
+  - hosts.npy: the potential hosts of host.dmp, as an index into the strings,
+    -1 for the taxon IDs that are not in host.dmp
+  - strings.npy and string_offsets.npy: all names, UTF-8 encoded
+Merged taxon IDs (merged.dmp) are separate taxa with the parent, rank and name
+of the taxon they were merged into, as in mgkit. All jobs on a node share the
+pages of these files and a lookup only reads the pages it needs, so there is
+nothing to parse when a job starts.
+Usage:
+  taxonomy.py build <new_taxdump> <taxonomy>
+Builds <taxonomy> from nodes.dmp, names.dmp, merged.dmp, rankedlineage.dmp and
+host.dmp in the <new_taxdump> folder. Scripts load it with
+`load_taxonomy(<taxonomy>)`, when <taxonomy> has not been built (e.g. for
+databases installed without it, or with an older version of it) the taxonomy is
+built in memory from the dump files in its parent folder.
+Example:
+  python taxonomy.py build /path/to/new_taxdump/ /path/to/new_taxdump/taxonomy/
+"""
+
+import csv
+import os
+import shutil
+from sys import argv
+
+import numpy as np
+import pandas as pd
+
+LINEAGE_COLUMNS = ["tax_name", "species", "genus", "family", "order", "class", "phylum", "kingdom", "superkingdom"]
+ARRAYS = ["parents", "ranks", "rank_names", "names", "lineages", "hosts", "strings", "string_offsets"]
+
+
+def read_dmp(dmp, columns, dtype):
+    """
+    Return the given (0-based, i.e. not counting the `|` separators) columns of an NCBI taxonomy dump file as a DataFrame
+    """
+    return pd.read_csv(
+        dmp, sep="\t", header=None, usecols=[column * 2 for column in columns], names=None, dtype=dtype, quoting=csv.QUOTE_NONE, keep_default_na=False
+    ).rename(columns={column * 2: column for column in columns})
+
+
+def encode_strings(strings):
+    """
+    Return the UTF-8 encoded strings as a single array and the offsets of the strings in it
+    """
+    encoded = [string.encode() for string in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(string) for string in encoded])
+    return np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets
+
+
+def decode_string(strings, offsets, string_id):
+    return bytes(strings[offsets[string_id] : offsets[string_id + 1]]).decode()
+
+
+def build_arrays(new_taxdump):
+    """
+    Return the arrays of the taxonomy from the dump files in the new_taxdump folder
+    """
+    nodes = read_dmp(os.path.join(new_taxdump, "nodes.dmp"), [0, 1, 2], {0: np.int64, 2: np.int64, 4: str})
+    names = read_dmp(os.path.join(new_taxdump, "names.dmp"), [0, 1, 3], {0: np.int64, 2: str, 6: str})
+    names = names[names[3] == "scientific name"]
+    merged = read_dmp(os.path.join(new_taxdump, "merged.dmp"), [0, 1], {0: np.int64, 2: np.int64})
+    merged = merged[merged[1].isin(nodes[0])]
+    lineages = read_dmp(os.path.join(new_taxdump, "rankedlineage.dmp"), range(len(LINEAGE_COLUMNS) + 1), {0: np.int64, **{column * 2: str for column in range(1, len(LINEAGE_COLUMNS) + 1)}})
+    hosts = read_dmp(os.path.join(new_taxdump, "host.dmp"), [0, 1], {0: np.int64, 2: str})
+
+    size = int(max(nodes[0].max(), names[0].max(), merged[0].max() if len(merged) else 0, lineages[0].max(), hosts[0].max() if len(hosts) else 0)) + 1
+    parents = np.full(size, -2, dtype=np.int32)
+    parents[nodes[0].values] = np.where(nodes[1].values == 1, -1, nodes[1].values)
+    rank_names = pd.Categorical(nodes[2].str.lower())
+    ranks = np.full(size, -1, dtype=np.int16)
+    ranks[nodes[0].values] = rank_names.codes
+
+    #? One table of all (unique) names, referred to by the names and lineages
+    string_codes, strings = pd.factorize(pd.concat([names[1]] + [lineages[column] for column in range(1, len(LINEAGE_COLUMNS) + 1)] + [hosts[1]]).str.strip())
+    name_ids = np.full(size, -1, dtype=np.int32)
+    name_ids[names[0].values] = string_codes[: len(names)]
+    lineage_ids = np.full((size, len(LINEAGE_COLUMNS)), -1, dtype=np.int32)
+    lineage_ids[lineages[0].values] = string_codes[len(names) : len(names) + len(LINEAGE_COLUMNS) * len(lineages)].reshape(len(LINEAGE_COLUMNS), len(lineages)).T
+    host_ids = np.full(size, -1, dtype=np.int32)
+    host_ids[hosts[0].values] = string_codes[len(names) + len(LINEAGE_COLUMNS) * len(lineages) :]
+
+    parents[merged[0].values] = parents[merged[1].values]
+    ranks[merged[0].values] = ranks[merged[1].values]
+    name_ids[merged[0].values] = name_ids[merged[1].values]
+
+    strings, string_offsets = encode_strings(strings)
+    return {
+        "parents": parents,
+        "ranks": ranks,
+        "rank_names": np.array(rank_names.categories, dtype=str),
+        "names": name_ids,
+        "lineages": lineage_ids,
+        "hosts": host_ids,
+        "strings": strings,
+        "string_offsets": string_offsets,
+    }
+
+
+class Taxonomy:
+    """
+    Lookups in the arrays of the taxonomy, see the module docstring
+    """
+
+    def __init__(self, arrays):
+        for array in ARRAYS:
+            setattr(self, array, arrays[array])
+        self.rank_names = list(self.rank_names)
+
+    def __contains__(self, taxon_id):
+        return 0 <= taxon_id < len(self.parents) and self.parents[taxon_id] != -2
+
+    def string(self, string_id):
+        return decode_string(self.strings, self.string_offsets, string_id)
+
+    def name(self, taxon_id):
+        """
+        Return the scientific name of a taxon, an empty string if it has none
+        """
+        return self.string(self.names[taxon_id]) if taxon_id in self and self.names[taxon_id] >= 0 else ""
+
+    def lineage(self, taxon_id):
+        """
+        Return the taxon ID followed by all its ancestors up to the top-level taxon
+        """
+        taxa = [taxon_id]
+        while self.parents[taxa[-1]] >= 0:
+            taxa.append(int(self.parents[taxa[-1]]))
+        return taxa
+
+    def ranked_lineages(self, taxon_ids):
+        """
+        Return a DataFrame with the `tax_id` and the rankedlineage.dmp `LINEAGE_COLUMNS` of the given taxon IDs that are in
+        rankedlineage.dmp
+        """
+        taxon_ids = np.unique(np.asarray(taxon_ids, dtype=np.int64))
+        taxon_ids = taxon_ids[(taxon_ids >= 0) & (taxon_ids < len(self.lineages))]
+        lineage_ids = self.lineages[taxon_ids]
+        found = lineage_ids[:, 0] >= 0
+        taxon_ids, lineage_ids = taxon_ids[found], lineage_ids[found]
+        strings = {string_id: self.string(string_id) for string_id in np.unique(lineage_ids)}
+        lineages = pd.DataFrame({"tax_id": taxon_ids})
+        for index, column in enumerate(LINEAGE_COLUMNS):
+            lineages[column] = [strings[string_id] for string_id in lineage_ids[:, index]]
+        return lineages
+
+    def hosts_of(self, taxon_ids):
+        """
+        Return a DataFrame with the `tax_id` and the host.dmp `potential_hosts` of the given taxon IDs that are in host.dmp
+        """
+        taxon_ids = np.unique(np.asarray(taxon_ids, dtype=np.int64))
+        taxon_ids = taxon_ids[(taxon_ids >= 0) & (taxon_ids < len(self.hosts))]
+        host_ids = self.hosts[taxon_ids]
+        found = host_ids >= 0
+        return pd.DataFrame({"tax_id": taxon_ids[found], "potential_hosts": [self.string(string_id) for string_id in host_ids[found]]}, columns=["tax_id", "potential_hosts"])
+
+
+def load_taxonomy(taxonomy):
+    """
+    Return the memory-mapped taxonomy in the given folder, or build it in memory from the dump files in its parent folder
+    when it does not exist
+    """
+    if all(os.path.exists(os.path.join(taxonomy, f"{array}.npy")) for array in ARRAYS):
+        return Taxonomy({array: np.load(os.path.join(taxonomy, f"{array}.npy"), mmap_mode="r") for array in ARRAYS})
+    print(f"No taxonomy in {taxonomy}, reading it from the dump files (build it with `taxonomy.py build` to speed this up)")
+    return Taxonomy(build_arrays(os.path.dirname(os.path.normpath(taxonomy))))
+
+
+def build(new_taxdump, taxonomy):
+    taxonomy = os.path.normpath(taxonomy)
+    arrays = build_arrays(new_taxdump)
+    #? Written next to an existing taxonomy and swapped in when complete, so running jobs never read a partial one
+    shutil.rmtree(f"{taxonomy}.tmp", ignore_errors=True)
+    os.makedirs(f"{taxonomy}.tmp")
+    for array, values in arrays.items():
+        np.save(os.path.join(f"{taxonomy}.tmp", f"{array}.npy"), values)
+    shutil.rmtree(taxonomy, ignore_errors=True)
+    os.rename(f"{taxonomy}.tmp", taxonomy)
+    print(f"Built the taxonomy of {new_taxdump} in {taxonomy}: {int((arrays['parents'] != -2).sum())} taxa, {len(arrays['string_offsets']) - 1} names")
+
+
+if __name__ == "__main__":
+    if len(argv) == 4 and argv[1] == "build":
+        build(argv[2], argv[3])
+    else:
+        raise SystemExit(__doc__)
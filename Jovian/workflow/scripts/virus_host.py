@@ -0,0 +1,107 @@
+"""
+Columnar index of the virus-host database (Mihara et al. 2016).
+merge_data.py only needs the rows of the viruses found in a sample, but reading
+the whole tab-separated file (and parsing all of its text columns) took most of
+its run time. The index is the table sorted by "virus tax id", as a columnar
+table (see `columnar.py`) in a folder named after it (e.g. `virushostdb/` next
+to `virushostdb.tsv`). All jobs on a node share the pages of its files and a
+lookup only reads the rows of the requested viruses.
+Usage:
+  virus_host.py build <virushostdb>
+Builds the index of the <virushostdb> table. Scripts look up rows with
+`load_virus_host(<virushostdb>).rows(<taxon_ids>)`, when the index has not been
+built, or is older than the table, the rows are read from the table itself.
+Example:
+  python virus_host.py build /path/to/virus_host_db/virushostdb.tsv
+"""
+
+import os
+from sys import argv
+
+import numpy as np
+import pandas as pd
+
+from columnar import ColumnarTable, is_table, write_table
+
+TAXID_COLUMN = "virus tax id"
+
+
+def index_folder(virushostdb):
+    """
+    Return the folder of the index of the given virus-host database, i.e. its path without the extension
+    """
+    return os.path.splitext(os.path.normpath(virushostdb))[0]
+
+
+def read_table(virushostdb):
+    """
+    Return the virus-host database itself, read from its tab-separated file
+    """
+    return pd.read_csv(virushostdb, sep="\t", header=0)
+
+
+def build(virushostdb):
+    """
+    Write the index of the given virus-host database, i.e. the table sorted by virus taxon ID as a columnar table
+    """
+    table = read_table(virushostdb)
+    table = table.iloc[np.argsort(table[TAXID_COLUMN].values, kind="mergesort")]
+    index = index_folder(virushostdb)
+    write_table(table, index)
+    print(f"Built the index of {virushostdb} in {index}: {len(table)} rows")
+
+
+class VirusHost:
+    """
+    Lookups in the index of the virus-host database, see the module docstring
+    """
+
+    def __init__(self, index):
+        self.table = ColumnarTable(index)
+
+    def rows(self, taxon_ids):
+        """
+        Return the rows of the virus-host database of the given (virus) taxon IDs
+        """
+        taxon_ids = np.unique(np.asarray(taxon_ids, dtype=np.int64))
+        virus_taxon_ids = self.table.column(TAXID_COLUMN)
+        rows = np.concatenate(
+            [np.arange(start, end) for start, end in zip(np.searchsorted(virus_taxon_ids, taxon_ids, side="left"), np.searchsorted(virus_taxon_ids, taxon_ids, side="right"))]
+            + [np.array([], dtype=np.int64)]
+        )
+        rows.sort()
+        return self.table.read(rows=rows)
+
+
+class VirusHostTable:
+    """
+    The same lookups in the virus-host database itself, for when it has not been indexed
+    """
+
+    def __init__(self, virushostdb):
+        self.table = read_table(virushostdb)
+
+    def rows(self, taxon_ids):
+        """
+        Return the rows of the virus-host database of the given (virus) taxon IDs
+        """
+        return self.table.loc[self.table[TAXID_COLUMN].isin(np.asarray(taxon_ids, dtype=np.int64))].reset_index(drop=True)
+
+
+def load_virus_host(virushostdb):
+    """
+    Return the memory-mapped index of the given virus-host database, or the database itself when the index does not exist
+    or is older than the database
+    """
+    index = index_folder(virushostdb)
+    if is_table(index) and os.path.getmtime(index) >= os.path.getmtime(virushostdb):
+        return VirusHost(index)
+    print(f"No (up to date) index in {index}, reading {virushostdb} (build it with `virus_host.py build` to speed this up)")
+    return VirusHostTable(virushostdb)
+
+
+if __name__ == "__main__":
+    if len(argv) == 3 and argv[1] == "build":
+        build(argv[2])
+    else:
+        raise SystemExit(__doc__)
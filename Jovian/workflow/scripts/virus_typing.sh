@@ -128,8 +128,15 @@ extract_fasta() {
     local output="${2}"
     local capture_name="${3}"
     local capture_field="${4}"
-    # Extract the scaffold name and sequence of a certain taxonomic rank from the complete Jovian taxonomic output and write it as a fasta
-    gawk -F "\t" -v name="${capture_name}" -v field="${capture_field}" '$field == name {print ">" $2 "\n" $25}' < ${input} > ${output}
+    local scaffolds_fasta="${5}"
+    local columnar_py="${6}"
+    # Select the names of the scaffolds of a certain taxonomic rank from the complete Jovian taxonomic output, and write their sequences (looked up in the faidx-indexed scaffolds fasta) as a fasta
+    local scaffold_names=($(gawk -F "\t" -v name="${capture_name}" -v field="${capture_field}" '$field == name {print $2}' < ${input}))
+    if [ ${#scaffold_names[@]} -gt 0 ]; then
+        python ${columnar_py} sequences "${scaffolds_fasta}" "${scaffold_names[@]}" > ${output}
+    else
+        : > ${output}
+    fi
 }
 submit_query_fasta() {
     local input="${1}"
@@ -208,7 +215,7 @@ typingtool() {
     #TODO this will need to be changed if we remove the tt_csv output in the snakemake script (remove temp chunk/onsuccess)
     if [ ! -e "${tt_csv}" ] || [ ! -z "${FORCE_FLAG}" ]; then
         # Extract taxonomic slice fasta, send to TT, parse the results XML into csv
-        extract_fasta "${file_path}" "${query_fasta}" "${extract_name}" "${extract_field}"
+        extract_fasta "${file_path}" "${query_fasta}" "${extract_name}" "${extract_field}" "results/scaffolds/${sample_name}_scaffolds.fasta" "${srcdir}scripts/columnar.py"
         if [ -s "${query_fasta}" ]
         then
             echo -e "Sample:\t${sample_name}\tScaffolds compatible with the ${which_tt} tool found, sent to typingtool service, waiting for results... This may take a while..."
@@ -0,0 +1,58 @@
+"""
+Check that `blast_clusters.py expand` clips the records of a representative
+that extend beyond a cluster member consistently: the query and subject
+coordinates by the same number of bases and the alignment length in proportion.
+"""
+
+import os
+import subprocess
+import sys
+
+SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Jovian", "workflow", "scripts", "blast_clusters.py")
+#? Scaffold, length, representative, strand and offset relative to the representative (s1 `rep`, 300 bp)
+CLUSTERS = [("rep", 300, "rep", "+", 0), ("plus", 100, "rep", "+", -50), ("minus", 100, "rep", "-", 100)]
+#? Query ID, subject ID, identity, alignment length, mismatches, gap opens, query start and end, subject start and end, e-value and bitscore
+RECORDS = [
+    ("rep", "subject_minus", 99.0, 170, 1, 0, 31, 200, 9000, 8831, 1e-80, 300.0),
+    ("rep", "subject_plus", 99.0, 100, 1, 0, 51, 150, 5001, 5100, 1e-50, 180.0),
+]
+
+
+def expand(tmp_path, qcov_hsp_perc):
+    with open(tmp_path / "clusters.tsv", "w") as out:
+        out.write("sample\tscaffold\tlength\trepresentative_sample\trepresentative\tstrand\toffset\n")
+        out.writelines(f"s1\t{name}\t{length}\ts1\t{representative}\t{strand}\t{offset}\n" for name, length, representative, strand, offset in CLUSTERS)
+    with open(tmp_path / "s1.fasta", "w") as out:
+        out.writelines(f">{name}\n{'A' * length}\n" for name, length, *_cluster in CLUSTERS)
+    with open(tmp_path / "s1_representatives.blastn", "w") as out:
+        out.writelines("\t".join(str(field) for field in record) + "\n" for record in RECORDS)
+    result = subprocess.run(
+        [sys.executable, SCRIPT, "expand", str(tmp_path / "clusters.tsv"), "s1", str(qcov_hsp_perc), str(tmp_path / "s1.fasta"), str(tmp_path / "s1.blastn"), f"s1={tmp_path / 's1_representatives.blastn'}"],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        universal_newlines=True,
+    )
+    assert result.returncode == 0, result.stdout
+    with open(tmp_path / "s1.blastn") as handle:
+        return {(fields[0], fields[1]): fields for fields in (line.rstrip("\n").split("\t") for line in handle)}
+
+
+def test_clipped_members(tmp_path):
+    records = expand(tmp_path, 50)
+
+    #? The representative keeps its own records
+    assert records[("rep", "subject_minus")][3:10] == ["170", "1", "0", "31", "200", "9000", "8831"]
+    #? Member positions 1-100 are representative positions 51-150: 20 bases are clipped at the start and 50 at the end, the subject is on the minus strand
+    assert records[("plus", "subject_minus")][3:10] == ["100", "1", "0", "1", "100", "8980", "8881"]
+    assert records[("plus", "subject_plus")][3:10] == ["100", "1", "0", "1", "100", "5001", "5100"]
+    #? Member positions 1-100 are representative positions 101-2 on the opposite strand: the alignments cover member positions 1-51 and 1-71
+    assert records[("minus", "subject_plus")][3:10] == ["51", "1", "0", "1", "51", "5051", "5001"]
+    assert records[("minus", "subject_minus")][3:10] == ["71", "1", "0", "1", "71", "8930", "9000"]
+
+
+def test_coverage_after_clipping(tmp_path):
+    records = expand(tmp_path, 60)
+
+    #? Only 51% of the `minus` member is covered by the alignment against `subject_plus`
+    assert ("minus", "subject_plus") not in records
+    assert ("minus", "subject_minus") in records
@@ -0,0 +1,105 @@
+"""
+Regression test of `blast_lca.py` against the outputs of the mgkit chain it
+replaces, on a small synthetic taxdump and BLAST result in `data/blast_lca/`.
+The references in `data/blast_lca/mgkit/` were made with mgkit 0.3.4 by the
+former rules (with `taxonomy.pickle` built from the same dump files):
+  sed -i "/construct\\|synthetic/Id" sample.blastn
+  blast2gff blastdb -b 100 -n sample.blastn raw.gff
+  add-gff-info addtaxa -t nucl_gb.accession2taxid_sliced.tsv -e raw.gff tax.gff
+  taxon-utils filter -e 81077 -e 12908 -t taxonomy.pickle tax.gff taxfilt.gff
+  filter-gff sequence -t -a bitscore -f quantile -l .97 -c ge taxfilt.gff filt.gff
+  taxon-utils lca -b 100 -s -p -n sample_nolca_filt.gff -t taxonomy.pickle filt.gff sample.taxtab
+followed by `average_logEvalue_no_lca.py` and `krona_magnitudes.py`.
+"""
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "blast_lca")
+SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Jovian", "workflow", "scripts", "blast_lca.py")
+KEYWORDS = "construct|synthetic"
+OUTPUTS = ["sample.taxtab", "sample_nolca_filt.gff", "sample.taxMagtab"]
+
+
+def run(*args):
+    result = subprocess.run([sys.executable, SCRIPT, *args], stdout=subprocess.PIPE, stderr=subprocess.STDOUT, universal_newlines=True)
+    assert result.returncode == 0, result.stdout
+    return result.stdout
+
+
+def read_rows(path):
+    with open(path) as handle:
+        return {line.split("\t", 1)[0]: line.rstrip("\n").split("\t") for line in handle}
+
+
+def scaffold(rows, number):
+    """
+    Return the row of the scaffold with the given node number
+    """
+    return next(row for name, row in rows.items() if name.startswith(f"NODE_{number}_"))
+
+
+@pytest.fixture(scope="module")
+def accession_index(tmp_path_factory):
+    """
+    The memory-mapped accession index, made as the installer does (on the table sorted with `LC_ALL=C sort -s -k1,1`)
+    """
+    folder = tmp_path_factory.mktemp("index")
+    with open(os.path.join(DATA, "nucl_gb.accession2taxid_sliced.tsv")) as handle:
+        lines = sorted(handle, key=lambda line: line.split("\t", 1)[0].encode())
+    with open(folder / "sorted.tsv", "w") as out:
+        out.writelines(lines)
+    run("index", str(folder / "sorted.tsv"), str(folder / "accession2taxid_index"))
+    return str(folder / "accession2taxid_index")
+
+
+@pytest.mark.parametrize("hits", ["blastn", "hit_table"])
+@pytest.mark.parametrize("accession2taxid", ["tsv", "index"])
+def test_lca_matches_mgkit(tmp_path, accession_index, hits, accession2taxid):
+    if hits == "hit_table":
+        hits = str(tmp_path / "sample_hits.npz")
+        run("hits", os.path.join(DATA, "sample.blastn"), KEYWORDS, hits)
+    else:
+        hits = os.path.join(DATA, "sample.blastn")
+    accession2taxid = accession_index if accession2taxid == "index" else os.path.join(DATA, "nucl_gb.accession2taxid_sliced.tsv")
+    outputs = [str(tmp_path / output) for output in OUTPUTS]
+    #? The taxonomy folder does not exist, so the taxonomy is read from the dump files next to it
+    taxonomy = os.path.join(DATA, "new_taxdump", "taxonomy", "")
+    run("lca", hits, os.path.join(DATA, "sample.stats"), accession2taxid, taxonomy, KEYWORDS, "81077,12908", "100", ".97", *outputs)
+
+    result = subprocess.run(
+        [sys.executable, SCRIPT, "compare", *outputs, *[os.path.join(DATA, "mgkit", output) for output in OUTPUTS]],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        universal_newlines=True,
+    )
+    assert result.returncode == 0, result.stdout
+
+
+def test_fixture_covers_edge_cases():
+    """
+    The scaffolds NODE_101 to NODE_109 of the fixture are made for the cases below, check the references still cover them
+    """
+    taxtab = read_rows(os.path.join(DATA, "mgkit", "sample.taxtab"))
+    nolca = read_rows(os.path.join(DATA, "mgkit", "sample_nolca_filt.gff"))
+    with open(os.path.join(DATA, "new_taxdump", "merged.dmp")) as handle:
+        merged = {line.split("\t", 1)[0] for line in handle}
+
+    #? Merged taxon IDs (via the accession and via staxids) are kept as separate taxa
+    assert set(scaffold(nolca, 101)[1].split(",")) <= merged
+    #? Hits in the excluded subtrees (81077 and 12908) are dropped, the remaining hit decides the LCA, or there is none
+    assert scaffold(taxtab, 102)[1:] == ["100005", "-120.0"]
+    assert not any(name.startswith("NODE_103_") for name in taxtab)
+    #? All hits with the bitscore of the .97 quantile are kept
+    assert scaffold(taxtab, 104)[1:] == ["10239", "-80.0"]
+    assert len(scaffold(nolca, 105)[1].split(",")) == 2
+    #? Hits in unrelated top-level taxa have no LCA
+    assert scaffold(taxtab, 106)[1:] == ["1", "1.0"]
+    assert scaffold(taxtab, 107)[1:] == ["1", "1.0"]
+    #? A mean e-value of 0 underflows to a log e-value of -450
+    assert scaffold(taxtab, 108)[1:] == ["10239", "-450.0"]
+    #? Scaffolds with hits below the bitscore threshold only are not classified
+    assert not any(name.startswith("NODE_109_") for name in taxtab)
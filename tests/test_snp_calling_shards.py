@@ -0,0 +1,75 @@
+"""
+Check that sharded SNP calling (`--snp-shards`) calls the same SNPs as a single
+call: the shards of `snp_calling_shards.py scatter` test every position of the
+assembly exactly once, every shard uses the Bonferroni factor of the whole
+assembly, and `gather` puts the shard VCFs back together as a single call would
+have written them.
+"""
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Jovian", "workflow", "scripts", "snp_calling_shards.py")
+#? Scaffold name, length and mapped reads; NODE_1 is heavier than the average shard and is split in windows
+SCAFFOLDS = [("NODE_1", 5000, 90000), ("NODE_2", 1200, 3000), ("NODE_3", 800, 0), ("NODE_4", 300, 1500)]
+HEADER = "##fileformat=VCFv4.0\n##source=lofreq call\n#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\n"
+
+
+def run(*args):
+    result = subprocess.run([sys.executable, SCRIPT, *args], stdout=subprocess.PIPE, stderr=subprocess.STDOUT, universal_newlines=True)
+    assert result.returncode == 0, result.stdout
+    return result.stdout
+
+
+@pytest.fixture
+def assembly(tmp_path):
+    """
+    The fasta index and `samtools idxstats` output of a small assembly
+    """
+    with open(tmp_path / "scaffolds.fasta.fai", "w") as out:
+        out.writelines(f"{name}\t{length}\t0\t60\t61\n" for name, length, _mapped in SCAFFOLDS)
+    with open(tmp_path / "idxstats.tsv", "w") as out:
+        out.writelines(f"{name}\t{length}\t{mapped}\t0\n" for name, length, mapped in SCAFFOLDS)
+        out.write("*\t0\t0\t12\n")
+    return tmp_path
+
+
+@pytest.mark.parametrize("shards", [2, 3, 8])
+def test_shards_test_every_position_once(assembly, shards):
+    beds = [str(assembly / f"shard-{shard}.bed") for shard in range(shards)]
+    run("scatter", str(assembly / "idxstats.tsv"), *beds)
+
+    tested = {name: [0] * length for name, length, _mapped in SCAFFOLDS}
+    for bed in beds:
+        with open(bed) as handle:
+            for line in handle:
+                name, start, end = line.rstrip("\n").split("\t")
+                for position in range(int(start), int(end)):
+                    tested[name][position] += 1
+    assert all(count == 1 for counts in tested.values() for count in counts)
+
+    #? The factor does not depend on the shards, it is that of the single call
+    assert int(run("bonferroni", str(assembly / "scaffolds.fasta.fai"))) == 3 * sum(length for _name, length, _mapped in SCAFFOLDS)
+
+
+def test_gather_matches_single_call(assembly):
+    beds = [str(assembly / f"shard-{shard}.bed") for shard in range(3)]
+    run("scatter", str(assembly / "idxstats.tsv"), *beds)
+    records = [f"{name}\t{position}\t.\tA\tG\t100\tPASS\tDP=100\n" for name, length, _mapped in SCAFFOLDS for position in range(1, length + 1, 97)]
+
+    #? Each shard reports the records in its own regions, as `lofreq call -l` does
+    shard_vcfs = []
+    for shard, bed in enumerate(beds):
+        with open(bed) as handle:
+            regions = [(name, int(start), int(end)) for name, start, end in (line.rstrip("\n").split("\t") for line in handle)]
+        shard_vcfs.append(str(assembly / f"shard-{shard}_raw.vcf"))
+        with open(shard_vcfs[-1], "w") as out:
+            out.write(HEADER)
+            out.writelines(record for record in records if any(record.split("\t")[0] == name and start < int(record.split("\t")[1]) <= end for name, start, end in regions))
+
+    run("gather", str(assembly / "scaffolds.fasta.fai"), str(assembly / "raw.vcf"), *shard_vcfs)
+    with open(assembly / "raw.vcf") as handle:
+        assert handle.read() == HEADER + "".join(records)